@@ -0,0 +1,75 @@
+# admins.py - кто администратор: ADMIN_IDS из конфигурации и таблица admins
+#
+# Права проверяются один раз на апдейт фильтром IsAdmin на роутере handlers.admin:
+# апдейт сотрудника отсекается им целиком, не проходя по фильтрам админских
+# хендлеров. Сама проверка - поиск в frozenset в памяти; таблица admins
+# перечитывается не чаще раза в ttl секунд (при запуске и по первому апдейту
+# после истечения срока), а не на каждом сообщении.
+import logging
+import time
+from typing import Callable, FrozenSet, Iterable, Optional
+
+from aiogram.filters import BaseFilter
+from aiogram.types import TelegramObject, User
+
+import repository
+
+logger = logging.getLogger(__name__)
+
+
+class AdminRegistry:
+    """ID администраторов: configured() (Config.ADMIN_IDS) и таблица admins"""
+
+    def __init__(self, configured: Callable[[], Iterable[int]], ttl: float = 60,
+                 clock: Callable[[], float] = time.monotonic):
+        self.configured = configured
+        self.ttl = ttl
+        self.clock = clock
+        self.ids: FrozenSet[int] = frozenset(configured())
+        self._stored: FrozenSet[int] = frozenset()
+        self._loaded_at: Optional[float] = None
+
+    def __contains__(self, user_id: int) -> bool:
+        """Проверка без обращения к базе - по последнему загруженному множеству"""
+        return user_id in self.ids
+
+    def _stale(self) -> bool:
+        return self._loaded_at is None or self.clock() - self._loaded_at >= self.ttl
+
+    async def reload(self) -> FrozenSet[int]:
+        """Перечитывает таблицу admins; при ошибке базы остаются прежние ID из нее"""
+        try:
+            self._stored = frozenset(await repository.list_admin_ids())
+        except Exception:
+            logger.exception("Не удалось прочитать таблицу admins")
+        self.ids = frozenset(self.configured()) | self._stored
+        self._loaded_at = self.clock()
+        return self.ids
+
+    def invalidate(self) -> None:
+        """Следующая проверка перечитает список (после изменения ADMIN_IDS или таблицы)"""
+        self._loaded_at = None
+
+    async def current(self) -> FrozenSet[int]:
+        """ID администраторов, перечитанные, если срок ttl истек (кому слать уведомления)"""
+        # Одновременные апдейты после истечения срока могут перечитать таблицу
+        # несколько раз - это один короткий SELECT, блокировка дороже
+        if self._stale():
+            await self.reload()
+        return self.ids
+
+    async def check(self, user_id: int) -> bool:
+        return user_id in await self.current()
+
+
+class IsAdmin(BaseFilter):
+    """Фильтр роутера: пропускает апдейты администраторов.
+
+    Реестр берется из данных диспетчера (admins в workflow_data, см. bot.create_app).
+    """
+
+    async def __call__(self, event: TelegramObject, event_from_user: Optional[User] = None,
+                       admins: Optional[AdminRegistry] = None) -> bool:
+        if event_from_user is None or admins is None:
+            return False
+        return await admins.check(event_from_user.id)
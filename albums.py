@@ -0,0 +1,68 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import Message
+
+from metrics import add_idle_time
+
+# Альбом (media group) приходит в Telegram отдельными сообщениями с общим
+# media_group_id - по апдейту на фото/видео, без признака "последний".
+#
+# AlbumMiddleware (inner-middleware сообщений) держит первое сообщение альбома,
+# пока новые части приходят чаще, чем раз в window секунд, а остальные части
+# только складывает к нему. Хендлер вызывается один раз - для первой части, со
+# всеми частями по порядку в аргументе album. Так альбом из пяти фото - это
+# одно превью и одна отправка, а не пять переходов FSM.
+
+# Больше 10 файлов в одном альбоме Telegram не присылает
+ALBUM_LIMIT = 10
+
+class AlbumMiddleware(BaseMiddleware):
+    """Собирает части альбома и передает их хендлеру списком album"""
+
+    def __init__(self, window: float = 0.7):
+        self.window = window
+        self._albums: Dict[Tuple[int, str], List[Message]] = {}
+        self._touched: Dict[Tuple[int, str], float] = {}
+        self._flushed: Dict[Tuple[int, str], asyncio.Event] = {}
+
+    def flush(self) -> None:
+        """Отдает собираемые альбомы хендлерам сразу, не дожидаясь конца окна"""
+        for flushed in self._flushed.values():
+            flushed.set()
+
+    async def __call__(self, handler: Callable[..., Awaitable[Any]], event: Message, data: Dict[str, Any]) -> Any:
+        if not event.media_group_id:
+            return await handler(event, data)
+
+        loop = asyncio.get_running_loop()
+        key = (event.chat.id, event.media_group_id)
+        album = self._albums.get(key)
+        if album is not None:
+            # Часть уже собираемого альбома: ее обработает первая
+            if len(album) < ALBUM_LIMIT:
+                album.append(event)
+            self._touched[key] = loop.time()
+            return None
+
+        album = self._albums[key] = [event]
+        self._touched[key] = started = loop.time()
+        flushed = self._flushed[key] = asyncio.Event()
+        try:
+            # Окно отсчитывается от последней пришедшей части
+            while (delay := self._touched[key] + self.window - loop.time()) > 0:
+                try:
+                    await asyncio.wait_for(flushed.wait(), delay)
+                    break
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            del self._albums[key]
+            del self._touched[key]
+            del self._flushed[key]
+        # Ожидание частей - не работа хендлера, в /perf и гистограммы оно не идет
+        add_idle_time(loop.time() - started)
+
+        data['album'] = sorted(album, key=lambda message: message.message_id)
+        return await handler(event, data)
@@ -0,0 +1,97 @@
+# authors.py - разбор строки "о себе" по шаблону Config.INFO_TEMPLATE
+#
+# "Флот 3, БПО Ноябрьск, июнь 2025, мастер КИПиА Иванов И.И." ->
+# fleet='3', base='Ноябрьск', period='2025-06', role='мастер КИПиА', name='Иванов И.И.'
+#
+# Разбирается один раз при создании отправки (и миграцией для старых строк),
+# результат хранится в колонках submissions. Модуль без зависимостей от базы:
+# его импортирует migrations.py.
+import re
+from typing import NamedTuple, Optional
+
+
+class AuthorInfo(NamedTuple):
+    """Поля автора; None - поле не удалось распознать"""
+    fleet: Optional[str] = None
+    base: Optional[str] = None
+    period: Optional[str] = None  # ГГГГ-ММ
+    role: Optional[str] = None
+    name: Optional[str] = None
+
+
+_FLEET = re.compile(r"^флот\s*№?\s*(\S+)$", re.IGNORECASE)
+_BASE = re.compile(r"^(?:бпо|база)\s+(.+)$", re.IGNORECASE)
+_PERIOD_WORDS = re.compile(r"^(?:(?:в|за)\s+)?([а-яё]+)\s+(\d{4})(?:\s*г\.?)?$", re.IGNORECASE)
+_PERIOD_DIGITS = re.compile(r"^(\d{1,2})[./](\d{4})$")
+# Фамилия с инициалами или без в конце части: "Иванов И.И.", "Петрова-Водкина А. Б."
+_NAME = re.compile(r"([А-ЯЁ][а-яё]+(?:-[А-ЯЁ][а-яё]+)?(?:\s+[А-ЯЁ]\.\s*(?:[А-ЯЁ]\.)?)?)$")
+
+# Первые буквы месяца в любом падеже: "июнь", "июня", "в июне"
+_MONTHS = {
+    'янв': 1, 'фев': 2, 'мар': 3, 'апр': 4, 'май': 5, 'мая': 5, 'мае': 5, 'июн': 6,
+    'июл': 7, 'авг': 8, 'сен': 9, 'окт': 10, 'ноя': 11, 'дек': 12,
+}
+
+
+def _clean(text: str) -> str:
+    return " ".join(text.split())
+
+
+def normalize_base(base: str) -> str:
+    """'ноябрьск', 'НОЯБРЬСК ' -> 'Ноябрьск': одна база - одна группа в статистике"""
+    return " ".join(
+        "-".join(part[:1].upper() + part[1:].lower() for part in word.split("-"))
+        for word in base.split()
+    )
+
+
+def _period(part: str) -> Optional[str]:
+    match = _PERIOD_WORDS.match(part)
+    if match:
+        month = _MONTHS.get(match.group(1).lower()[:3])
+        if month:
+            return f"{match.group(2)}-{month:02d}"
+        return None
+    match = _PERIOD_DIGITS.match(part)
+    if match and 1 <= int(match.group(1)) <= 12:
+        return f"{match.group(2)}-{int(match.group(1)):02d}"
+    return None
+
+
+def parse_user_info(text: str) -> AuthorInfo:
+    """Раскладывает строку "о себе" на поля; части можно указывать в любом порядке"""
+    fleet = base = period = None
+    rest = []
+    for part in (_clean(p) for p in text.split(",")):
+        if not part:
+            continue
+        match = _FLEET.match(part)
+        if match and fleet is None:
+            fleet = match.group(1)
+            continue
+        match = _BASE.match(part)
+        if match and base is None:
+            base = normalize_base(match.group(1))
+            continue
+        if period is None:
+            period = _period(part)
+            if period:
+                continue
+        rest.append(part)
+
+    # Должность и ФИО - обычно одной частью ("мастер КИПиА Иванов И.И."),
+    # иногда двумя в любом порядке ("мастер КИПиА, Иванов И.И.")
+    role = name = None
+    if rest:
+        match = _NAME.search(rest[-1])
+        if match:
+            name = match.group(1)
+            rest[-1] = rest[-1][:match.start()].strip()
+        else:
+            for i, part in enumerate(rest):
+                if _NAME.fullmatch(part):
+                    name = rest.pop(i)
+                    break
+        role = ", ".join(part for part in rest if part) or None
+
+    return AuthorInfo(fleet, base, period, role, name)
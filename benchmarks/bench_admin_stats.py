@@ -0,0 +1,132 @@
+# bench_admin_stats.py - /admin и /stats на большой таблице: COUNT(*) против индексов и счетчиков
+#
+# Запуск из корня проекта:
+#   python -m benchmarks.bench_admin_stats [--rows 1000000]
+#
+# 1. Таблица без индексов (как в старых database.db) заполняется --rows строками,
+#    замеряются исходные запросы cmd_admin/cmd_stats.
+# 2. Применяется миграция (индексы + пересчет счетчиков), замеряется ее время.
+# 3. Те же запросы повторяются с индексами, затем через счетчики из repository.py.
+import argparse
+import asyncio
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="inside_bot_bench_")
+
+import repository  # noqa: E402
+from database import DB_PATH, engine  # noqa: E402
+from migrations import _indexes_and_counters, upgrade  # noqa: E402
+
+# Схему бот создает при запуске (main), здесь - до первых запросов
+upgrade(engine)
+
+LEGACY_QUERIES = {
+    "pending": "SELECT COUNT(*) FROM submissions WHERE status = 'pending'",
+    "approved": "SELECT COUNT(*) FROM submissions WHERE status = 'approved'",
+    "rejected": "SELECT COUNT(*) FROM submissions WHERE status = 'rejected'",
+    "total": "SELECT COUNT(*) FROM submissions",
+    "by_type": "SELECT content_type, COUNT(id) FROM submissions GROUP BY content_type",
+    "last_7_days": "SELECT COUNT(*) FROM submissions WHERE submission_date >= :since",
+}
+
+
+def seed(rows):
+    statuses = ['pending', 'approved', 'rejected', 'approved', 'approved']
+    types_ = ['photo', 'video', 'text']
+    start = datetime.utcnow() - timedelta(days=3 * 365)
+    step = (3 * 365 * 24 * 3600) / rows
+
+    connection = sqlite3.connect(DB_PATH)
+    for index in ("ix_submissions_status_date", "ix_submissions_user_date", "ix_submissions_date"):
+        connection.execute(f"DROP INDEX IF EXISTS {index}")
+    connection.executemany(
+        "INSERT INTO submissions (telegram_id, user_info, content_type, caption, status, submission_date) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (
+                1000 + i % 5000,
+                f"Флот {i % 9}, БПО Ноябрьск, июнь 2025, мастер Иванов {i}",
+                types_[i % 3],
+                "Описание",
+                statuses[i % 5],
+                (start + timedelta(seconds=i * step)).strftime('%Y-%m-%d %H:%M:%S.%f'),
+            )
+            for i in range(rows)
+        )
+    )
+    connection.commit()
+    connection.close()
+
+
+def timed(func, repeats=5):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def run_legacy_queries(label):
+    since = (datetime.utcnow() - timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S.%f')
+    connection = sqlite3.connect(DB_PATH)
+    total = 0.0
+    for name, sql in LEGACY_QUERIES.items():
+        elapsed = timed(lambda: connection.execute(sql, {"since": since}).fetchall())
+        total += elapsed
+        print(f"  {label:<10} {name:<12} {elapsed:10.2f} мс")
+    connection.close()
+    print(f"  {label:<10} {'ИТОГО':<12} {total:10.2f} мс")
+
+
+async def run_counter_queries():
+    calls = {
+        "by_status": repository.count_by_status,
+        "by_type": repository.content_type_stats,
+        "last_7_days": lambda: repository.count_last_days(7),
+    }
+    total = 0.0
+    for name, call in calls.items():
+        samples = []
+        for _ in range(5):
+            started = time.perf_counter()
+            await call()
+            samples.append((time.perf_counter() - started) * 1000)
+        elapsed = statistics.median(samples)
+        total += elapsed
+        print(f"  {'counters':<10} {name:<12} {elapsed:10.2f} мс")
+    print(f"  {'counters':<10} {'ИТОГО':<12} {total:10.2f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"Заполнение таблицы без индексов: {args.rows} строк...")
+    started = time.perf_counter()
+    seed(args.rows)
+    print(f"  готово за {time.perf_counter() - started:.1f} с\n")
+
+    print("Исходные запросы без индексов:")
+    run_legacy_queries("full scan")
+
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        _indexes_and_counters(connection)
+    print(f"\nМиграция (индексы + счетчики): {time.perf_counter() - started:.1f} с\n")
+
+    print("Исходные запросы с индексами:")
+    run_legacy_queries("indexed")
+
+    print("\nСчетчики (repository.py):")
+    asyncio.run(run_counter_queries())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# bench_author_stats.py - статистика по БПО и месяцам: разбор user_info в Python против колонок
+#
+# Запуск из корня проекта:
+#   python -m benchmarks.bench_author_stats [--rows 1000000]
+#
+# 1. Таблица заполняется --rows строками как в старой базе (поля автора пустые).
+# 2. "Отправки по БПО по месяцам" (месяц работы из user_info) считаются
+#    по-старому: чтение user_info всех строк и разбор в Python.
+# 3. Миграция (backfill + индексы) - ее время; затем тот же отчет через
+#    repository.base_month_stats (диапазон покрывающего индекса (period, base)).
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="inside_bot_bench_")
+
+import repository  # noqa: E402
+from authors import parse_user_info  # noqa: E402
+from database import DB_PATH, engine  # noqa: E402
+from migrations import _author_columns, _period_index, upgrade  # noqa: E402
+
+# Схему бот создает при запуске (main), здесь - до первых запросов
+upgrade(engine)
+
+BASES = ["Ноябрьск", "Уренгой", "Сургут", "Пурпе", "Муравленко", "Губкинский", "Ямбург", "Надым"]
+MONTHS = ["январь", "февраль", "март", "апрель", "май", "июнь",
+          "июль", "август", "сентябрь", "октябрь", "ноябрь", "декабрь"]
+
+
+def seed(rows):
+    rng = random.Random(1)
+    start = datetime.utcnow() - timedelta(days=365)
+    step = (365 * 24 * 3600) / rows
+    connection = sqlite3.connect(DB_PATH)
+    for index in ("ix_submissions_base_date", "ix_submissions_fleet_date", "ix_submissions_period_base"):
+        connection.execute(f"DROP INDEX IF EXISTS {index}")
+    def row(i):
+        date = start + timedelta(seconds=i * step)
+        # Месяц работы - обычно месяц отправки или предыдущий
+        worked = date - timedelta(days=rng.choice((0, 0, 31)))
+        return (
+            1000 + i % 5000,
+            f"Флот {i % 40}, БПО {rng.choice(BASES)}, {MONTHS[worked.month - 1]} {worked.year}, мастер Иванов И.И.",
+            "text",
+            "Описание",
+            "approved",
+            date.strftime('%Y-%m-%d %H:%M:%S.%f'),
+        )
+
+    connection.executemany(
+        "INSERT INTO submissions (telegram_id, user_info, content_type, caption, status, submission_date) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (row(i) for i in range(rows))
+    )
+    connection.commit()
+    connection.close()
+
+
+def python_scan(months=3):
+    """Как пришлось бы без колонок: все строки за период в Python и разбор каждой"""
+    now = datetime.utcnow()
+    month_index = now.year * 12 + now.month - 1 - (months - 1)
+    since = f"{month_index // 12:04d}-{month_index % 12 + 1:02d}"
+    connection = sqlite3.connect(DB_PATH)
+    counts = Counter()
+    for (user_info,) in connection.execute("SELECT user_info FROM submissions"):
+        author = parse_user_info(user_info)
+        if author.period and author.period >= since:
+            counts[(author.base, author.period)] += 1
+    connection.close()
+    return sorted(counts.items())
+
+
+def timed(func, repeats=3):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--months", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Заполнение таблицы: {args.rows} строк...")
+    seed(args.rows)
+
+    scan_ms, scanned = timed(lambda: python_scan(args.months))
+    print(f"Разбор user_info в Python:   {scan_ms:10.1f} мс")
+
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        _author_columns(connection)
+        _period_index(connection)
+    print(f"Миграция (backfill+индексы): {time.perf_counter() - started:10.1f} с")
+
+    grouped_ms, grouped = timed(lambda: asyncio.run(repository.base_month_stats(args.months)))
+    print(f"GROUP BY по индексу:         {grouped_ms:10.1f} мс")
+    assert [((b, m), c) for b, m, c in grouped] == scanned
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# bench_batch_moderation.py - /approve по одной отправке против пакетного set_status_many
+#
+# Запуск из корня проекта:
+#   python -m benchmarks.bench_batch_moderation [--ids 1000]
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="inside_bot_bench_")
+os.environ.setdefault("BOT_TOKEN", "123456789:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA")
+
+import repository  # noqa: E402
+from database import engine, get_session, Submission  # noqa: E402
+from migrations import rebuild_counters, upgrade  # noqa: E402
+
+# Схему бот создает при запуске (main), здесь - до первых запросов
+upgrade(engine)
+
+
+def seed(rows):
+    """rows ожидающих отправок от rows // 10 авторов, возвращает их ID"""
+    start = datetime.utcnow() - timedelta(days=30)
+    with get_session() as session:
+        first_id = (session.query(Submission.id).order_by(Submission.id.desc()).limit(1).scalar() or 0) + 1
+        session.bulk_insert_mappings(Submission, [
+            {
+                'telegram_id': 1000 + i % max(1, rows // 10),
+                'user_info': f"Флот {i % 9}, БПО Ноябрьск",
+                'content_type': 'text',
+                'caption': "Описание",
+                'status': 'pending',
+                'submission_date': start + timedelta(minutes=i),
+            }
+            for i in range(rows)
+        ])
+        session.commit()
+    with engine.begin() as connection:
+        rebuild_counters(connection)
+    return first_id, first_id + rows - 1
+
+
+async def one_by_one(low, high):
+    for submission_id in range(low, high + 1):
+        await repository.set_status(submission_id, 'approved', "Спасибо",
+                                    notify_text=f"✅ Ваша отправка #{submission_id} одобрена!")
+
+
+async def batch(low, high):
+    return await repository.set_status_many(
+        repository.Selection(ranges=((low, high),)), 'approved', "Спасибо",
+        notify_text=lambda ids: f"✅ Ваши отправки одобрены: {len(ids)}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ids", type=int, default=1000)
+    args = parser.parse_args()
+
+    for name, run in (("по одной", one_by_one), ("пакетом", batch)):
+        low, high = seed(args.ids)
+        started = time.perf_counter()
+        await run(low, high)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<10} {args.ids} отправок: {elapsed * 1000:9.1f} мс")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,211 @@
+# bench_dispatch.py - маршрутизация апдейта: один плоский роутер против роутеров по ролям
+#
+# Запуск из корня проекта:
+#   python -m benchmarks.bench_dispatch [--updates 20000] [--admin-share 0.05]
+#
+# Оба диспетчера собраны из фильтров настоящих хендлеров handlers.*, но колбэки
+# пустые: измеряется только поиск хендлера, без базы и Bot API.
+#   было  - все хендлеры на одном роутере в прежнем порядке bot.py (/start,
+#           админские команды, форма, меню); права проверял каждый админский
+#           хендлер внутри себя, поэтому фильтров у роутера нет; кнопки
+#           сравнивались синхронным F.text == "..." (aiogram выполняет его в пуле потоков).
+#   стало - handlers.get_routers(): меню, админский роутер с IsAdmin, отказ
+#           не-админам, форма; кнопки - асинхронный фильтр keyboards.Button.
+# Трафик - в основном сотрудники (кнопки меню и шаги формы в своих состояниях),
+# доля --admin-share - админские команды и нажатия кнопок листания и карточек.
+# Считается число вызовов фильтров (FilterObject.call) на апдейт и время на апдейт.
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+ADMIN_ID = 900001
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="inside_bot_bench_")
+os.environ.setdefault("BOT_TOKEN", "123456789:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA")
+os.environ["FSM_STORAGE"] = "memory"
+os.environ["ADMIN_IDS"] = str(ADMIN_ID)
+
+from aiogram import Bot, Dispatcher, F, Router  # noqa: E402
+from aiogram.dispatcher.event.handler import FilterObject  # noqa: E402
+from aiogram.fsm.storage.base import StorageKey  # noqa: E402
+from aiogram.fsm.storage.memory import MemoryStorage  # noqa: E402
+from aiogram.types import CallbackQuery, Chat, Message, PhotoSize, Update, User  # noqa: E402
+
+from admins import AdminRegistry  # noqa: E402
+from benchmarks.stubs import StubSession  # noqa: E402
+from config import Config  # noqa: E402
+from database import engine  # noqa: E402
+from handlers import admin, get_routers, submission, user  # noqa: E402
+from keyboards import Button, ModerationCallback, PageCallback  # noqa: E402
+from migrations import upgrade  # noqa: E402
+from states import ContentSubmission  # noqa: E402
+
+# Таблица admins нужна реестру прав
+Config.ensure_dirs()
+upgrade(engine)
+
+EVENTS = ("message", "callback_query")
+_ids = itertools.count(1)
+
+
+async def noop(event, **kwargs):
+    pass
+
+
+def filters_of(handler, flat=False):
+    filters = [f.magic or f.callback for f in handler.filters or ()]
+    if flat:
+        filters = [F.text == f.text if isinstance(f, Button) else f for f in filters]
+    return filters
+
+
+def copy_handlers(source, target, flat=False):
+    """Хендлеры source на target: те же фильтры, пустой колбэк"""
+    for event in EVENTS:
+        for handler in getattr(source, event).handlers:
+            getattr(target, event).register(noop, *filters_of(handler, flat))
+
+
+def copy_router(source):
+    """Копия роутера с фильтрами уровня роутера (роутер подключается только к одному родителю)"""
+    target = Router(name=source.name)
+    for event in EVENTS:
+        router_filters = getattr(source, event)._handler.filters or ()
+        getattr(target, event).filter(*[f.magic or f.callback for f in router_filters])
+    copy_handlers(source, target)
+    return target
+
+
+def flat_router():
+    """Прежний bot.py: один роутер, /start первым, меню - последним"""
+    router = Router(name="flat")
+    start, *menu = user.router.message.handlers
+    router.message.register(noop, *filters_of(start, flat=True))
+    copy_handlers(admin.router, router, flat=True)
+    copy_handlers(submission.router, router, flat=True)
+    for handler in menu:
+        router.message.register(noop, *filters_of(handler, flat=True))
+    return router
+
+
+def make_dispatcher(routers, admins):
+    dp = Dispatcher(storage=MemoryStorage(), admins=admins)
+    dp.include_routers(*routers)
+    return dp
+
+
+def sender(user_id):
+    return User(id=user_id, is_bot=False, first_name="Иван")
+
+
+def message(user_id, text=None, photo=None):
+    update_id = next(_ids)
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(id=user_id, type="private"),
+        from_user=sender(user_id), text=text, photo=photo,
+    ))
+
+
+def press(user_id, data):
+    update_id = next(_ids)
+    return Update(update_id=update_id, callback_query=CallbackQuery(
+        id=str(update_id), chat_instance="bench", data=data.pack(), from_user=sender(user_id),
+    ))
+
+
+# Апдейт сотрудника в каждом из состояний формы
+PHOTO = [PhotoSize(file_id="bench", file_unique_id="bench", width=640, height=480)]
+EMPLOYEE_STEPS = (
+    (None, lambda uid: message(uid, "/start")),
+    (None, lambda uid: message(uid, "📸 Отправить фото")),
+    (None, lambda uid: message(uid, "📊 Мои отправки")),
+    (ContentSubmission.waiting_for_user_info, lambda uid: message(uid, "Иванов, БПО-1")),
+    (ContentSubmission.waiting_for_caption, lambda uid: message(uid, "Подпись к фото")),
+    (ContentSubmission.waiting_for_media, lambda uid: message(uid, photo=PHOTO)),
+    (ContentSubmission.waiting_for_confirmation, lambda uid: message(uid, "✅ Да, отправить")),
+)
+ADMIN_STEPS = (
+    lambda: message(ADMIN_ID, "/pending"),
+    lambda: message(ADMIN_ID, "/moderate"),
+    lambda: message(ADMIN_ID, "/stats"),
+    lambda: press(ADMIN_ID, PageCallback(view='pending', ts=0, id=0, backwards=False)),
+    lambda: press(ADMIN_ID, ModerationCallback(a='a', ts=0, id=1)),
+)
+
+
+def make_traffic(count, admin_share, seed):
+    """Список (состояние, апдейт); состояние задается перед подачей апдейта"""
+    rng = random.Random(seed)
+    traffic = []
+    for n in range(count):
+        if rng.random() < admin_share:
+            traffic.append(("admin", None, rng.choice(ADMIN_STEPS)()))
+        else:
+            state, build = rng.choice(EMPLOYEE_STEPS)
+            traffic.append(("employee", state, build(1000 + n % 500)))
+    return traffic
+
+
+async def run(dp, bot, traffic):
+    calls = [0]
+    original = FilterObject.call
+
+    async def counted(self, *args, **kwargs):
+        calls[0] += 1
+        return await original(self, *args, **kwargs)
+
+    stats = {"employee": ([], []), "admin": ([], [])}
+    FilterObject.call = counted
+    try:
+        for kind, state, update in traffic:
+            if kind == "employee":
+                uid = update.message.from_user.id
+                await dp.fsm.storage.set_state(StorageKey(bot_id=bot.id, chat_id=uid, user_id=uid), state)
+            calls[0] = 0
+            started = time.perf_counter()
+            await dp.feed_update(bot, update)
+            timings, filters = stats[kind]
+            timings.append(time.perf_counter() - started)
+            filters.append(calls[0])
+    finally:
+        FilterObject.call = original
+    return stats
+
+
+async def main_async(args):
+    admins = AdminRegistry(lambda: Config.ADMIN_IDS, ttl=float("inf"))
+    await admins.reload()
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=StubSession(record=False))
+    layouts = (
+        ("было", make_dispatcher([flat_router()], admins)),
+        ("стало", make_dispatcher([copy_router(router) for router in get_routers()], admins)),
+    )
+    traffic = make_traffic(args.updates, args.admin_share, args.seed)
+    print(f"Апдейтов: {len(traffic)}, из них админских: {sum(kind == 'admin' for kind, _, _ in traffic)}")
+    print(f"{'':<8}{'кто':<10}{'фильтров/апдейт':>17}{'макс':>6}{'мкс/апдейт p50':>16}{'среднее':>9}")
+    for name, dp in layouts:
+        await run(dp, bot, traffic[:200])  # прогрев
+        stats = await run(dp, bot, traffic)
+        for kind, (timings, filters) in stats.items():
+            if not timings:
+                continue
+            print(f"{name:<8}{kind:<10}{statistics.mean(filters):>17.1f}{max(filters):>6}"
+                  f"{statistics.median(timings) * 1e6:>16.1f}{statistics.mean(timings) * 1e6:>9.1f}")
+    await bot.session.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--admin-share", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# bench_duplicates.py - поиск похожего фото среди сохраненных перцептивных хешей
+#
+# Запуск из корня проекта:
+#   python -m benchmarks.bench_duplicates [--hashes 100000] [--queries 2000]
+#
+# 1. Индекс HashIndex на --hashes случайных 64-битных хешах: построение, запись
+#    файла и загрузка при запуске.
+# 2. Поиск: полный перебор (как без индекса) против HashIndex.nearest - для
+#    запросов без совпадения и для копий в 1-6 битах от сохраненного хеша.
+# 3. dHash одного фото 4000x3000: полное декодирование JPEG против draft.
+import argparse
+import io
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from PIL import Image, ImageDraw, ImageOps
+
+from duplicates import HashIndex, hamming
+from images import dhash
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+def linear(stored, query, distance):
+    best = None
+    for submission_id, value in enumerate(stored, start=1):
+        d = hamming(query, value)
+        if d <= distance and (best is None or d < best[1]):
+            best = (submission_id, d)
+    return best
+
+
+def dhash_full(source, size=8):
+    """dHash без draft: JPEG декодируется в полном размере"""
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original).convert('L').resize((size + 1, size), Image.LANCZOS)
+    pixels = image.tobytes()
+    value = 0
+    for row in range(size):
+        for column in range(size):
+            offset = row * (size + 1) + column
+            value = (value << 1) | (pixels[offset] > pixels[offset + 1])
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hashes", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--distance", type=int, default=6)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    stored = [rng.getrandbits(64) for _ in range(args.hashes)]
+    path = os.path.join(tempfile.mkdtemp(prefix="inside_bot_bench_"), "phash.idx")
+
+    started = time.perf_counter()
+    index = HashIndex(path, distance=args.distance)
+    for submission_id, value in enumerate(stored, start=1):
+        index.add(value, submission_id)
+    print(f"построение и запись {args.hashes} хешей: {time.perf_counter() - started:.2f} с, "
+          f"файл {os.path.getsize(path) / 1024 / 1024:.1f} МБ")
+    started = time.perf_counter()
+    index = HashIndex(path, distance=args.distance)
+    index.load()
+    print(f"загрузка при запуске: {(time.perf_counter() - started) * 1000:.0f} мс\n")
+
+    misses = [rng.getrandbits(64) for _ in range(args.queries)]
+    hits = []
+    for _ in range(args.queries):
+        value = stored[rng.randrange(len(stored))]
+        for bit in rng.sample(range(64), rng.randint(1, args.distance)):
+            value ^= 1 << bit
+        hits.append(value)
+
+    print(f"{'поиск':>26} {'p50, мкс':>10} {'p99, мкс':>10}")
+    for name, queries in (("без совпадения", misses), ("копия в 1-6 битах", hits)):
+        for method, func in (("перебор", lambda q: linear(stored, q, args.distance)),
+                             ("индекс", index.nearest)):
+            count = len(queries) if method == "индекс" else min(len(queries), 50)
+            samples = []
+            for query in queries[:count]:
+                started = time.perf_counter()
+                func(query)
+                samples.append((time.perf_counter() - started) * 1e6)
+            p50, p99 = percentiles(samples)
+            print(f"{name + ', ' + method:>26} {p50:>10.0f} {p99:>10.0f}")
+
+    image = Image.new("RGB", (4000, 3000), (90, 120, 150))
+    draw = ImageDraw.Draw(image)
+    for _ in range(60):
+        x, y = rng.randrange(4000), rng.randrange(3000)
+        draw.rectangle((x, y, x + 800, y + 600), fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    photo = os.path.join(os.path.dirname(path), "photo.jpg")
+    with open(photo, "wb") as f:
+        f.write(buffer.getvalue())
+    print()
+    for name, func in (("dHash, полное декодирование", dhash_full), ("dHash, draft", dhash)):
+        samples = []
+        for _ in range(10):
+            started = time.perf_counter()
+            func(photo)
+            samples.append((time.perf_counter() - started) * 1000)
+        print(f"{name}: {statistics.median(samples):.1f} мс на фото 4000x3000")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# bench_event_loop.py - нагрузочный тест: задержка хендлеров при тяжелых админских запросах
+#
+# Запуск из корня проекта:
+#   python -m benchmarks.bench_event_loop [--rows 20000] [--requests 200]
+#
+# Сценарии:
+#   baseline   - только легкие пользовательские запросы (/start и "📊 Мои отправки")
+#   async      - то же самое, параллельно админы крутят /admin, /stats и /submissions
+#                через асинхронный репозиторий
+#   sync       - параллельно те же тяжелые запросы выполняются синхронной сессией
+#                прямо в event loop (как было до перехода на aiosqlite)
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+from datetime import datetime, timedelta
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="inside_bot_bench_")
+os.environ.setdefault("BOT_TOKEN", "123456789:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA")
+
+from sqlalchemy import func  # noqa: E402
+
+import bot  # noqa: E402
+import repository  # noqa: E402
+from handlers.user import cmd_start, my_submissions  # noqa: E402
+from database import engine, get_session, Submission  # noqa: E402
+from migrations import rebuild_counters, upgrade  # noqa: E402
+
+# Схему и приложение бот создает при запуске (main), здесь - до первых запросов
+upgrade(engine)
+app = bot.create_app()
+
+
+# Пауза между "кликами" админа: тяжелые запросы идут постоянным потоком,
+# но не занимают 100% CPU
+ADMIN_PAUSE = 0.02
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class FakeMessage:
+    """Минимальная замена aiogram Message: хендлерам нужны from_user, text и answer()"""
+
+    def __init__(self, user_id, text=""):
+        self.from_user = FakeUser(user_id)
+        self.text = text
+
+    async def answer(self, text, **kwargs):
+        return None
+
+
+def seed(rows):
+    statuses = ['pending', 'approved', 'rejected']
+    types_ = ['photo', 'video', 'text']
+    start = datetime.utcnow() - timedelta(days=365)
+    with get_session() as session:
+        session.bulk_insert_mappings(Submission, [
+            {
+                'telegram_id': 1000 + i % 500,
+                'user_info': f"Флот {i % 9}, БПО Ноябрьск, июнь 2025, мастер Иванов {i}",
+                'content_type': types_[i % 3],
+                'caption': "Описание " * 5,
+                'status': statuses[i % 3],
+                'submission_date': start + timedelta(minutes=i),
+            }
+            for i in range(rows)
+        ])
+        session.commit()
+    with engine.begin() as connection:
+        rebuild_counters(connection)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+async def light_load(requests, interval=0.01):
+    """Легкие пользовательские запросы с фиксированным темпом поступления.
+
+    Задержка считается от момента "прихода" апдейта, поэтому в нее попадает и
+    время ожидания, пока event loop занят чужой работой.
+    """
+    latencies = {'cmd_start': [], 'my_submissions': []}
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    async def one(i):
+        user_id = 1000 + random.randrange(500)
+        if i % 2:
+            handler, message = my_submissions, FakeMessage(user_id, "📊 Мои отправки")
+            services = {'render_cache': app.render_cache}
+        else:
+            handler, message = cmd_start, FakeMessage(user_id, "/start")
+            services = {'admins': app.admins}
+        arrival = started + i * interval
+        await asyncio.sleep(max(0.0, arrival - loop.time()))
+        await handler(message, **services)
+        latencies[handler.__name__].append((loop.time() - arrival) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies
+
+
+async def heavy_async(stop):
+    while not stop.is_set():
+        await repository.count_by_status()
+        await repository.content_type_stats()
+        await repository.count_last_days(7)
+        await repository.page_submissions()
+        await asyncio.sleep(ADMIN_PAUSE)
+
+
+async def heavy_sync(stop):
+    while not stop.is_set():
+        with get_session() as session:
+            session.query(Submission.status, func.count(Submission.id)).group_by(
+                Submission.status
+            ).all()
+            session.query(Submission.content_type, func.count(Submission.id)).group_by(
+                Submission.content_type
+            ).all()
+            session.query(Submission).filter(
+                Submission.submission_date >= datetime.utcnow() - timedelta(days=7)
+            ).count()
+            session.query(Submission).order_by(Submission.submission_date.desc()).limit(20).all()
+        await asyncio.sleep(ADMIN_PAUSE)
+
+
+async def run_scenario(name, requests, heavy=None, workers=2):
+    stop = asyncio.Event()
+    heavy_tasks = [asyncio.create_task(heavy(stop)) for _ in range(workers)] if heavy else []
+    results = await light_load(requests)
+    stop.set()
+    await asyncio.gather(*heavy_tasks)
+    for handler_name, latencies in results.items():
+        print(
+            f"{name:<10} {handler_name:<16} p50={statistics.median(latencies):8.2f} мс  "
+            f"p95={percentile(latencies, 95):8.2f} мс  "
+            f"p99={percentile(latencies, 99):8.2f} мс  "
+            f"max={max(latencies):8.2f} мс"
+        )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"Заполнение таблицы: {args.rows} строк...")
+    seed(args.rows)
+
+    await run_scenario("baseline", args.requests)
+    await run_scenario("async", args.requests, heavy_async)
+    await run_scenario("sync", args.requests, heavy_sync)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+# bench_export.py - выгрузка отправок: все в памяти против потоковой записи в ZIP
+#
+# Запуск из корня проекта:
+#   python -m benchmarks.bench_export [--rows 10000 100000] [--media 200]
+#
+# Для каждого размера таблицы сравниваются:
+#   naive  - как выгрузку пишут "в лоб": session.query(Submission).all(), CSV в
+#            StringIO, архив в BytesIO, медиа читаются в память целиком;
+#   stream - export.export_zip: строки партиями yield_per, архив пишется в файл,
+#            медиа копируются блоками.
+# Пиковая память - tracemalloc (аллокации Python), время - без него.
+import argparse
+import csv
+import io
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from datetime import datetime, timedelta
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="inside_bot_bench_")
+
+import export  # noqa: E402
+from config import Config  # noqa: E402
+from database import DB_PATH, Submission, get_session  # noqa: E402
+from repository import Selection  # noqa: E402
+from database import engine  # noqa: E402
+from migrations import upgrade  # noqa: E402
+
+# Каталоги и схему бот создает при запуске (main), здесь - до первых запросов
+Config.ensure_dirs()
+upgrade(engine)
+
+MEDIA_SIZE = 512 * 1024
+
+
+def seed(rows, media):
+    """rows одобренных отправок; media из них ссылаются на разные файлы по MEDIA_SIZE байт"""
+    rng = random.Random(1)
+    paths = []
+    for i in range(media):
+        path = os.path.join("photos", f"{i % 256:02x}", f"bench-{i}.jpg")
+        os.makedirs(os.path.join(Config.DATA_DIR, os.path.dirname(path)), exist_ok=True)
+        with open(os.path.join(Config.DATA_DIR, path), "wb") as f:
+            f.write(rng.randbytes(MEDIA_SIZE))
+        paths.append(path)
+
+    start = datetime.utcnow() - timedelta(days=365)
+    connection = sqlite3.connect(DB_PATH)
+    connection.execute("DELETE FROM submissions")
+    connection.executemany(
+        "INSERT INTO submissions (telegram_id, user_info, content_type, caption, status, submission_date, "
+        "base, fleet, author_name, media_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (
+                1000 + i % 5000,
+                f"Флот {i % 40}, БПО Ноябрьск, июнь 2025, мастер КИПиА Иванов И.И.",
+                "photo" if i < media else "text",
+                "Описание отправки " * 5,
+                "approved",
+                (start + timedelta(seconds=i)).strftime('%Y-%m-%d %H:%M:%S.%f'),
+                "Ноябрьск", str(i % 40), "Иванов И.И.",
+                paths[i] if i < media else None,
+            )
+            for i in range(rows)
+        )
+    )
+    connection.commit()
+    connection.close()
+
+
+def naive(path):
+    """Все строки ORM-объектами, таблица и архив целиком в памяти"""
+    with get_session() as session:
+        submissions = session.query(Submission).filter(Submission.status == 'approved').all()
+        table = io.StringIO()
+        writer = csv.writer(table)
+        writer.writerow(export.COLUMNS)
+        for sub in submissions:
+            writer.writerow([getattr(sub, column if column != 'media' else 'media_path')
+                             for column in export.COLUMNS])
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("submissions.csv", table.getvalue())
+            for sub in submissions:
+                if sub.media_path:
+                    with open(os.path.join(Config.DATA_DIR, sub.media_path), "rb") as f:
+                        archive.writestr("media/" + sub.media_path, f.read())
+        with open(path, "wb") as f:
+            f.write(buffer.getvalue())
+
+
+def stream(path):
+    export.export_zip(Selection(), path, "csv")
+
+
+def measure(func, path):
+    started = time.perf_counter()
+    func(path)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--media", type=int, default=200)
+    args = parser.parse_args()
+
+    out = os.path.join(Config.EXPORTS_DIR, "bench.zip")
+    print(f"медиа: {args.media} файлов по {MEDIA_SIZE // 1024} КБ\n")
+    print(f"{'строк':>8} {'способ':>7} {'время, с':>9} {'пик памяти, МБ':>15} {'архив, МБ':>10}")
+    for rows in args.rows:
+        seed(rows, min(args.media, rows))
+        for name, func in (("naive", naive), ("stream", stream)):
+            elapsed, peak, size = measure(func, out)
+            print(f"{rows:>8} {name:>7} {elapsed:>9.2f} {peak / 1024 / 1024:>15.1f} {size / 1024 / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+# bench_flow.py - нагрузочный тест полного сценария отправки через dp.feed_update
+#
+# Запуск из корня проекта:
+#   python -m benchmarks.bench_flow [--employees 500] [--admins 5] [--admin-actions 200]
+#   python -m benchmarks.bench_flow --save      # записать новый baseline
+#
+# Сотрудники параллельно проходят весь ContentSubmission: кнопка меню ->
+# user_info -> caption -> фото/видео -> "✅ Да, отправить" (каждый ждет ответа
+# на свой предыдущий апдейт, как живой человек). Одновременно админы листают
+# /pending, открывают /view и одобряют отправки через /approve.
+#
+# Bot API заменен StubSession: исходящие вызовы записываются, в сеть ничего не
+# уходит. Печатает пропускную способность, p50/p95/p99 по каждому хендлеру и
+# пиковую память, и сравнивает с benchmarks/baseline_flow.json.
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from datetime import datetime
+
+ADMIN_BASE = 900000
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="inside_bot_bench_")
+os.environ.setdefault("BOT_TOKEN", "123456789:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA")
+os.environ.setdefault("FSM_STORAGE", "memory")
+os.environ["ADMIN_IDS"] = ",".join(str(ADMIN_BASE + i) for i in range(5))
+# Воркеры загрузки в бенчмарке не запускаются - очередь не должна переполниться
+os.environ["MEDIA_QUEUE_SIZE"] = "1000000"
+
+import logging  # noqa: E402
+
+from aiogram.types import Chat, Message, PhotoSize, Update, User, Video  # noqa: E402
+
+import bot  # noqa: E402
+import repository  # noqa: E402
+from benchmarks.stubs import StubSession  # noqa: E402
+from database import engine  # noqa: E402
+from migrations import upgrade  # noqa: E402
+
+# Схему и приложение бот создает при запуске (main), здесь - до первых запросов
+upgrade(engine)
+app = bot.create_app()
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline_flow.json")
+# Насколько p95 хендлера может вырасти относительно baseline, прежде чем это считается
+# регрессией. Разброс между запусками на одной машине - до ~40%, а у хендлеров без
+# запросов к базе (доли миллисекунды) относительные скачки ничего не значат
+TOLERANCE = 0.5
+NOISE_FLOOR_MS = 5
+
+_update_ids = itertools.count(1)
+
+
+def message_update(user_id, text=None, photo=None, video=None):
+    update_id = next(_update_ids)
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id,
+        date=datetime.now(),
+        chat=Chat(id=user_id, type="private"),
+        from_user=User(id=user_id, is_bot=False, first_name="Сотрудник"),
+        text=text,
+        photo=photo,
+        video=video,
+    ))
+
+
+def media_update(user_id, content_type):
+    file_id = f"file-{user_id}-{next(_update_ids)}"
+    if content_type == "photo":
+        return message_update(user_id, photo=[
+            PhotoSize(file_id=f"{file_id}-s", file_unique_id=f"{file_id}-s", width=320, height=240, file_size=20_000),
+            PhotoSize(file_id=file_id, file_unique_id=file_id, width=1280, height=960, file_size=2_000_000),
+        ])
+    return message_update(user_id, video=Video(
+        file_id=file_id, file_unique_id=file_id, width=1280, height=720, duration=40, file_size=15_000_000
+    ))
+
+
+class HandlerTimer:
+    """Inner-middleware сообщений: время каждого хендлера по его имени"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = Counter()
+
+    async def __call__(self, handler, event, data):
+        name = data["handler"].callback.__name__
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.errors[name] += 1
+            raise
+        finally:
+            self.samples[name].append((time.perf_counter() - started) * 1000)
+
+    def clear(self):
+        self.samples.clear()
+        self.errors.clear()
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+async def employee(bench_bot, user_id, rng):
+    """Один сотрудник проходит весь сценарий отправки"""
+    content_type = rng.choice(["photo", "video", "text"])
+    button = {"photo": "📸 Отправить фото", "video": "🎥 Отправить видео", "text": "📝 Отправить текст"}[content_type]
+    steps = [
+        message_update(user_id, text=button),
+        message_update(user_id, text=f"Флот {user_id % 9}, БПО Ноябрьск, июнь 2025, мастер Иванов {user_id}"),
+        message_update(user_id, text="Утренняя планерка на буровой"),
+    ]
+    if content_type != "text":
+        steps.append(media_update(user_id, content_type))
+    steps.append(message_update(user_id, text="✅ Да, отправить"))
+
+    for fed, update in enumerate(steps, 1):
+        try:
+            await app.dp.feed_update(bench_bot, update)
+        except Exception:
+            # Пользователь не получил ответа и бросил отправку; ошибка учтена в HandlerTimer
+            return fed
+        # Человек читает ответ и набирает следующий шаг
+        await asyncio.sleep(rng.uniform(0, 0.005))
+    return len(steps)
+
+
+async def admin(bench_bot, admin_id, actions, rng, known_ids):
+    """Админ листает очередь, открывает и одобряет отправки"""
+    for i in range(actions):
+        if i % 3 == 0 or not known_ids:
+            text = "/pending"
+        elif i % 3 == 1:
+            text = f"/view {rng.choice(known_ids)}"
+        else:
+            text = f"/approve {rng.choice(known_ids)} Отлично"
+        try:
+            await app.dp.feed_update(bench_bot, message_update(admin_id, text=text))
+        except Exception:
+            pass
+        await asyncio.sleep(rng.uniform(0, 0.005))
+    return actions
+
+
+async def run(args):
+    session = StubSession()
+    bench_bot = app.bot
+    bench_bot.session = session
+    timer = HandlerTimer()
+    app.dp.message.middleware(timer)
+
+    # Немного уже существующих отправок, чтобы админам было что открывать
+    rng = random.Random(args.seed)
+    for i in range(args.employees // 5 or 1):
+        await employee(bench_bot, 10_000_000 + i, rng)
+    page = await repository.page_submissions(limit=10_000)
+    known_ids = [s.id for s in page.items]
+    timer.clear()
+    session.requests.clear()
+
+    # tracemalloc заметно замедляет выполнение, поэтому включается только по флагу
+    if args.tracemalloc:
+        tracemalloc.start()
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(employee(bench_bot, 1_000_000 + i, random.Random(args.seed + i)) for i in range(args.employees)),
+        *(admin(bench_bot, ADMIN_BASE + i, args.admin_actions, random.Random(-i - 1), known_ids)
+          for i in range(args.admins)),
+    )
+    elapsed = time.perf_counter() - started
+    peak_traced = None
+    if args.tracemalloc:
+        peak_traced = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+        tracemalloc.stop()
+
+    updates = sum(results)
+    return {
+        "params": {
+            "employees": args.employees, "admins": args.admins,
+            "admin_actions": args.admin_actions, "fsm_storage": os.environ["FSM_STORAGE"],
+        },
+        "environment": {"python": platform.python_version(), "machine": platform.machine()},
+        "updates": updates,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_ups": round(updates / elapsed, 1),
+        "peak_traced_mb": peak_traced,
+        # ru_maxrss в Linux - килобайты
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "api_calls": dict(Counter(type(r).__name__ for r in session.requests)),
+        "handlers": {
+            name: {
+                "count": len(samples),
+                "errors": timer.errors[name],
+                "p50_ms": round(statistics.median(samples), 3),
+                "p95_ms": round(percentile(samples, 95), 3),
+                "p99_ms": round(percentile(samples, 99), 3),
+            }
+            for name, samples in sorted(timer.samples.items())
+        },
+    }
+
+
+def print_report(result, baseline):
+    print(
+        f"Апдейтов: {result['updates']} за {result['elapsed_s']:.2f} с - "
+        f"{result['throughput_ups']:.0f} апд/с; "
+        f"пик памяти: {result['peak_rss_mb']} МБ RSS"
+        + (f", {result['peak_traced_mb']} МБ (tracemalloc)" if result['peak_traced_mb'] is not None else "")
+    )
+    print(f"Вызовы Bot API: {result['api_calls']}")
+    print(f"{'хендлер':<24}{'n':>7}{'ошибок':>8}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}   baseline p95")
+
+    regressions = []
+    for name, stats in result["handlers"].items():
+        line = (
+            f"{name:<24}{stats['count']:>7}{stats['errors']:>8}"
+            f"{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+        )
+        base = (baseline or {}).get("handlers", {}).get(name)
+        if base and stats["errors"] > base["errors"]:
+            regressions.append(f"{name} (ошибки)")
+        if base:
+            change = stats["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0
+            line += f"   {base['p95_ms']:.2f} ({change:+.0%})"
+            if change > TOLERANCE and stats["p95_ms"] - base["p95_ms"] > NOISE_FLOOR_MS:
+                regressions.append(name)
+                line += "  <-- регрессия"
+        print(line)
+
+    if baseline:
+        change = result["throughput_ups"] / baseline["throughput_ups"] - 1
+        print(f"Пропускная способность относительно baseline: {change:+.0%}")
+        if change < -TOLERANCE:
+            regressions.append("throughput")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--employees", type=int, default=500)
+    parser.add_argument("--admins", type=int, default=5)
+    parser.add_argument("--admin-actions", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tracemalloc", action="store_true", help="пик памяти Python-объектов (медленнее)")
+    parser.add_argument("--save", action="store_true", help="сохранить результат как новый baseline")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    result = asyncio.run(run(args))
+
+    baseline = None
+    if os.path.exists(BASELINE):
+        with open(BASELINE, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("params") != result["params"]:
+            print("Параметры отличаются от baseline - сравнение пропущено")
+            baseline = None
+
+    regressions = print_report(result, baseline)
+
+    if args.save:
+        with open(BASELINE, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"Baseline сохранен: {BASELINE}")
+    elif regressions:
+        print(f"Регрессии: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# bench_moderation_cards.py - решение по одной отправке: команды против карточек
+#
+# Запуск из корня проекта:
+#   python -m benchmarks.bench_moderation_cards [--rows 20000] [--decisions 300]
+#
+# commands - как раньше: /pending, затем /view <ID>, затем /approve <ID>
+# cards    - нажатие "✅ Одобрить" на карточке /moderate (следующая уже загружена)
+#
+# Для каждого решения считается время от первого апдейта модератора до
+# последнего ответа бота и число SQL-запросов (хуки SQLAlchemy).
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ADMIN_ID = 900001
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="inside_bot_bench_")
+os.environ.setdefault("BOT_TOKEN", "123456789:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA")
+os.environ["FSM_STORAGE"] = "memory"
+os.environ["ADMIN_IDS"] = str(ADMIN_ID)
+
+from aiogram.types import CallbackQuery, Chat, Message, Update, User  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+import bot  # noqa: E402
+from benchmarks.stubs import StubSession  # noqa: E402
+from database import async_engine, engine, get_session, Submission  # noqa: E402
+from keyboards import ModerationCallback  # noqa: E402
+from migrations import rebuild_counters, upgrade  # noqa: E402
+
+# Схему и приложение бот создает при запуске (main), здесь - до первых запросов
+upgrade(engine)
+app = bot.create_app()
+
+_update_ids = itertools.count(1)
+queries = 0
+
+
+@event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+def count_query(*args):
+    global queries
+    queries += 1
+
+
+def seed(rows):
+    start = datetime.utcnow() - timedelta(days=30)
+    with get_session() as session:
+        session.bulk_insert_mappings(Submission, [
+            {
+                'telegram_id': 1000 + i % 500,
+                'user_info': f"Флот {i % 9}, БПО Ноябрьск, мастер Иванов {i}",
+                'content_type': 'text',
+                'caption': "Описание",
+                'status': 'pending',
+                'submission_date': start + timedelta(seconds=i),
+            }
+            for i in range(rows)
+        ])
+        session.commit()
+    with engine.begin() as connection:
+        rebuild_counters(connection)
+
+
+def admin_update(text):
+    update_id = next(_update_ids)
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(id=ADMIN_ID, type="private"),
+        from_user=User(id=ADMIN_ID, is_bot=False, first_name="Админ"), text=text,
+    ))
+
+
+def press(card_text, markup, action):
+    button = next(b for row in markup.inline_keyboard for b in row
+                  if ModerationCallback.unpack(b.callback_data).a == action)
+    update_id = next(_update_ids)
+    return Update(update_id=update_id, callback_query=CallbackQuery(
+        id=str(update_id), chat_instance="bench", data=button.callback_data,
+        from_user=User(id=ADMIN_ID, is_bot=False, first_name="Админ"),
+        message=Message(message_id=1, date=datetime.now(), chat=Chat(id=ADMIN_ID, type="private"),
+                        text=card_text, reply_markup=markup),
+    ))
+
+
+def report(name, latencies, query_counts):
+    latencies = sorted(latencies)
+    print(
+        f"{name:<9} p50={statistics.median(latencies):7.2f} мс  "
+        f"p95={latencies[int(len(latencies) * 0.95)]:7.2f} мс  "
+        f"SQL-запросов на решение: {statistics.mean(query_counts):5.1f}"
+    )
+
+
+async def commands(bench_bot, session, decisions):
+    global queries
+    latencies, query_counts = [], []
+    for _ in range(decisions):
+        queries = 0
+        started = time.perf_counter()
+        await app.dp.feed_update(bench_bot, admin_update("/pending"))
+        # Модератор берет первую отправку из списка
+        first_id = session.requests[-1].text.split("#", 1)[1].split(" ", 1)[0]
+        await app.dp.feed_update(bench_bot, admin_update(f"/view {first_id}"))
+        await app.dp.feed_update(bench_bot, admin_update(f"/approve {first_id}"))
+        latencies.append((time.perf_counter() - started) * 1000)
+        query_counts.append(queries)
+    return latencies, query_counts
+
+
+async def cards(bench_bot, session, decisions):
+    global queries
+    latencies, query_counts = [], []
+    await app.dp.feed_update(bench_bot, admin_update("/moderate"))
+    card = session.requests[-1]
+    for _ in range(decisions):
+        # Модератор читает карточку: за это время следующая успевает загрузиться
+        await asyncio.sleep(0.01)
+        queries = 0
+        started = time.perf_counter()
+        await app.dp.feed_update(bench_bot, press(card.text, card.reply_markup, "a"))
+        latencies.append((time.perf_counter() - started) * 1000)
+        query_counts.append(queries)
+        card = session.requests[-1]
+    return latencies, query_counts
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--decisions", type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"Заполнение таблицы: {args.rows} ожидающих отправок...")
+    seed(args.rows)
+    session = StubSession()
+    bench_bot = app.bot
+    bench_bot.session = session
+
+    report("commands", *await commands(bench_bot, session, args.decisions))
+    report("cards", *await cards(bench_bot, session, args.decisions))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
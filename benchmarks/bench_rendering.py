@@ -0,0 +1,127 @@
+# bench_rendering.py - микробенчмарк слоя отображения
+#
+# Запуск из корня проекта:
+#   python -m benchmarks.bench_rendering [--repeat 20000]
+#
+# 1. Строки списка: словари подписей, собираемые на каждой строке (как было),
+#    против таблиц rendering.py.
+# 2. Клавиатура меню: новый ReplyKeyboardMarkup на каждый ответ против готовой.
+# 3. Хендлеры "📊 Мои отправки" и /admin: без кэша (запрос к базе + форматирование)
+#    и из RenderCache. Bot API - заглушка, поэтому время - только работа бота.
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import timeit
+from datetime import datetime
+
+ADMIN_ID = 900001
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="inside_bot_bench_")
+os.environ.setdefault("BOT_TOKEN", "123456789:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA")
+os.environ["FSM_STORAGE"] = "memory"
+os.environ["ADMIN_IDS"] = str(ADMIN_ID)
+
+from aiogram.types import Chat, KeyboardButton, Message, ReplyKeyboardMarkup, User  # noqa: E402
+
+import bot  # noqa: E402
+import repository  # noqa: E402
+from handlers.admin import cmd_admin  # noqa: E402
+from handlers.user import my_submissions  # noqa: E402
+from benchmarks.stubs import StubSession  # noqa: E402
+from keyboards import get_main_menu  # noqa: E402
+from rendering import my_submissions_text  # noqa: E402
+from database import engine  # noqa: E402
+from migrations import upgrade  # noqa: E402
+
+# Схему и приложение бот создает при запуске (main), здесь - до первых запросов
+upgrade(engine)
+app = bot.create_app()
+
+USER_ID = 1001
+
+
+def legacy_my_submissions_text(submissions):
+    response = "📋 Ваши последние отправки:\n\n"
+    for sub in submissions:
+        status_emoji = {'pending': '⏳', 'approved': '✅', 'rejected': '❌'}.get(sub.status, '❓')
+        content_emoji = {'photo': '📸', 'video': '🎥', 'text': '📝'}.get(sub.content_type, '📄')
+        date_str = sub.submission_date.strftime('%d.%m.%Y')
+        response += f"{status_emoji}{content_emoji} #{sub.id} - {date_str} ({sub.status})\n"
+    return response
+
+
+def legacy_main_menu():
+    return ReplyKeyboardMarkup(
+        keyboard=[
+            [KeyboardButton(text="📸 Отправить фото")],
+            [KeyboardButton(text="🎥 Отправить видео")],
+            [KeyboardButton(text="📝 Отправить текст")],
+            [KeyboardButton(text="📊 Мои отправки")],
+            [KeyboardButton(text="ℹ️ О проекте")]
+        ],
+        resize_keyboard=True
+    )
+
+
+def per_call_us(func, repeat):
+    return min(timeit.repeat(func, number=repeat, repeat=5)) / repeat * 1e6
+
+
+async def per_call_async_us(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await func()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def message(user_id, text, bench_bot):
+    return Message(
+        message_id=1, date=datetime.now(), chat=Chat(id=user_id, type="private"),
+        from_user=User(id=user_id, is_bot=False, first_name="Сотрудник"), text=text,
+    ).as_(bench_bot)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+
+    for i in range(10):
+        submission = await repository.create_submission(USER_ID, f"Флот {i}, БПО Ноябрьск", "photo", "Описание")
+        await repository.set_status(submission.id, ['approved', 'rejected', 'pending'][i % 3])
+    submissions = await repository.list_user_submissions(USER_ID, 10)
+    assert legacy_my_submissions_text(submissions) == my_submissions_text(submissions)
+
+    print(f"{'операция':<36}{'было, мкс':>12}{'стало, мкс':>12}")
+    old = per_call_us(lambda: legacy_my_submissions_text(submissions), args.repeat)
+    new = per_call_us(lambda: my_submissions_text(submissions), args.repeat)
+    print(f"{'10 строк «Мои отправки»':<36}{old:>12.2f}{new:>12.2f}")
+    old = per_call_us(legacy_main_menu, args.repeat)
+    new = per_call_us(get_main_menu, args.repeat)
+    print(f"{'клавиатура меню':<36}{old:>12.2f}{new:>12.2f}")
+
+    bench_bot = app.bot
+    bench_bot.session = StubSession(record=False)
+    user_message = message(USER_ID, "📊 Мои отправки", bench_bot)
+    admin_message = message(ADMIN_ID, "/admin", bench_bot)
+    handler_repeat = max(1, args.repeat // 20)
+
+    for name, handler, msg in (("хендлер «Мои отправки»", my_submissions, user_message),
+                               ("хендлер /admin", cmd_admin, admin_message)):
+        async def uncached():
+            app.render_cache.clear()
+            await handler(msg, render_cache=app.render_cache)
+
+        async def cached():
+            await handler(msg, render_cache=app.render_cache)
+
+        old = await per_call_async_us(uncached, handler_repeat)
+        await handler(msg, render_cache=app.render_cache)
+        new = await per_call_async_us(cached, handler_repeat)
+        print(f"{name:<36}{old:>12.2f}{new:>12.2f}")
+    print(f"Попаданий в кэш: {app.render_cache.hits}, промахов: {app.render_cache.misses}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
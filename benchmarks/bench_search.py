@@ -0,0 +1,134 @@
+# bench_search.py - /search на большом архиве: LIKE '%...%' против FTS5
+#
+# Запуск из корня проекта:
+#   python -m benchmarks.bench_search [--rows 1000000]
+#
+# Таблица заполняется --rows строками (индекс submissions_fts ведут триггеры),
+# затем для нескольких запросов разной селективности сравниваются LIKE по
+# user_info/caption, ранжирование bm25 всех совпадений и
+# repository.search_submissions (окно SEARCH_WINDOW новых совпадений; первая и
+# пятая страницы).
+# В конце замеряется полная пересборка индекса (python migrations.py --rebuild-search).
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="inside_bot_bench_")
+
+import repository  # noqa: E402
+from database import DB_PATH, engine  # noqa: E402
+from migrations import rebuild_search_index, upgrade  # noqa: E402
+
+# Схему бот создает при запуске (main), здесь - до первых запросов
+upgrade(engine)
+
+BASES = ["Ноябрьск", "Уренгой", "Сургут", "Пурпе", "Муравленко", "Губкинский", "Ямбург", "Надым"]
+ROLES = ["мастер", "бурильщик", "помбур", "инженер", "водитель"]
+NAMES = ["Иванов", "Петров", "Сидоров", "Кузнецов", "Смирнов", "Попов", "Волков", "Федоров"]
+CAPTIONS = ["Утренняя планерка", "Монтаж вышки", "Смена на кусте", "Обед в вагончике", "Спуск колонны"]
+
+# (запрос, подстроки для LIKE)
+QUERIES = [
+    ("Ноябрьск", ["Ноябрьск"]),
+    ("БПО Ноябрьск мастер", ["Ноябрьск", "мастер"]),
+    ("Волков 4242", ["Волков 4242"]),
+    ("планерка Ямбург", ["планерка", "Ямбург"]),
+]
+
+
+def seed(rows):
+    rng = random.Random(1)
+    start = datetime.utcnow() - timedelta(days=3 * 365)
+    step = (3 * 365 * 24 * 3600) / rows
+    connection = sqlite3.connect(DB_PATH)
+    connection.executemany(
+        "INSERT INTO submissions (telegram_id, user_info, content_type, caption, status, submission_date) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (
+                1000 + i % 5000,
+                f"Флот {i % 40}, БПО {rng.choice(BASES)}, июнь 2025, "
+                f"{rng.choice(ROLES)} {rng.choice(NAMES)} {i % 10000}",
+                "text",
+                rng.choice(CAPTIONS),
+                "approved",
+                (start + timedelta(seconds=i * step)).strftime('%Y-%m-%d %H:%M:%S.%f'),
+            )
+            for i in range(rows)
+        )
+    )
+    connection.commit()
+    connection.close()
+
+
+def timed(func, repeats=5):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def rank_all(connection, query):
+    return connection.execute(
+        "SELECT rowid FROM submissions_fts WHERE submissions_fts MATCH ? ORDER BY rank LIMIT 20",
+        (repository._match_expression(query),)
+    ).fetchall()
+
+
+async def timed_async(func, repeats=5):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def like(connection, parts):
+    where = " AND ".join("(user_info LIKE ? OR caption LIKE ?)" for _ in parts)
+    params = [f"%{p}%" for p in parts for _ in range(2)]
+    return connection.execute(
+        f"SELECT id FROM submissions WHERE {where} ORDER BY submission_date DESC LIMIT 20", params
+    ).fetchall()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"Заполнение таблицы: {args.rows} строк (с триггерами FTS5)...")
+    started = time.perf_counter()
+    seed(args.rows)
+    print(f"  {time.perf_counter() - started:.1f} с")
+
+    connection = sqlite3.connect(DB_PATH)
+    print(f"{'запрос':<24}{'найдено':>9}{'LIKE, мс':>11}{'bm25 всех, мс':>15}{'/search, мс':>13}{'стр. 5, мс':>12}")
+    for query, parts in QUERIES:
+        like_ms, _ = timed(lambda: like(connection, parts), repeats=3)
+        rank_ms, _ = timed(lambda: rank_all(connection, query), repeats=3)
+        found = connection.execute(
+            "SELECT count(*) FROM submissions_fts WHERE submissions_fts MATCH ?",
+            (repository._match_expression(query),)
+        ).fetchone()[0]
+        search_ms = await timed_async(lambda: repository.search_submissions(query))
+        page5_ms = await timed_async(lambda: repository.search_submissions(query, offset=4 * repository.PAGE_SIZE))
+        print(f"{query:<24}{found:>9}{like_ms:>11.1f}{rank_ms:>15.1f}{search_ms:>13.1f}{page5_ms:>12.1f}")
+    connection.close()
+
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        rebuild_search_index(connection)
+    print(f"Пересборка индекса: {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,171 @@
+# bench_sqlite.py - параллельная запись и чтение: SQLite по умолчанию против WAL с настройками
+#
+# Запуск из корня проекта:
+#   python -m benchmarks.bench_sqlite [--rows 50000] [--seconds 10] [--writers 8] [--readers 8]
+#
+# Для каждого варианта создается своя база с rows отправками, и в течение seconds
+# секунд параллельно идут:
+#   submit   - create_submission с уведомлением в outbox (confirm_submission);
+#   moderate - set_status случайной отправки (/approve, кнопки карточки);
+#   read     - "📊 Мои отправки", страница /pending, счетчики /admin;
+#   report   - полный проход по таблице в отдельном потоке (/export, /stats).
+# Варианты:
+#   default - как было: голые URL sqlite:/// и sqlite+aiosqlite:///, журнал отката,
+#             таймаут блокировки драйвера 5 с;
+#   tuned   - database.create_engines: WAL, synchronous=NORMAL, busy_timeout,
+#             cache_size, mmap_size и пул асинхронного движка.
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="inside_bot_bench_")
+
+from sqlalchemy import create_engine, insert, text  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+from sqlalchemy.pool import AsyncAdaptedQueuePool  # noqa: E402
+
+import database  # noqa: E402
+import repository  # noqa: E402
+from config import Config  # noqa: E402
+from database import Submission, create_engines  # noqa: E402
+from migrations import rebuild_counters, upgrade  # noqa: E402
+
+ADMIN_ID = 1
+
+
+def default_engines(url):
+    return (create_engine(url),
+            create_async_engine(url.replace('sqlite://', 'sqlite+aiosqlite://'), poolclass=AsyncAdaptedQueuePool))
+
+
+def seed(sync_engine, rows):
+    upgrade(sync_engine)
+    start = datetime.utcnow() - timedelta(days=365)
+    with sync_engine.begin() as connection:
+        connection.execute(insert(Submission), [
+            {
+                'telegram_id': 1000 + i % 2000,
+                'user_info': f"Флот {i % 40}, БПО Ноябрьск, июнь 2025, мастер Иванов И.И.",
+                'content_type': 'text',
+                'caption': "Описание отправки " * 5,
+                'status': 'pending' if i % 3 else 'approved',
+                'submission_date': start + timedelta(seconds=i * 60),
+                'base': "Ноябрьск",
+                'fleet': str(i % 40),
+            }
+            for i in range(rows)
+        ])
+        rebuild_counters(connection)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))] if values else 0.0
+
+
+async def run_load(sync_engine, rows, seconds, writers, readers):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    deadline = time.monotonic() + seconds
+    rng = random.Random(1)
+
+    async def timed(name, call):
+        started = time.perf_counter()
+        try:
+            await call()
+        except OperationalError as e:
+            errors[name] += 1
+            if "locked" not in str(e):
+                raise
+        latencies[name].append(time.perf_counter() - started)
+
+    async def submit(user_id):
+        while time.monotonic() < deadline:
+            await timed("submit", lambda: repository.create_submission(
+                user_id, "Флот 3, БПО Ноябрьск, июнь 2025, мастер Иванов И.И.", "text", "Текст",
+                notify_chat_ids=[ADMIN_ID], notify_text=lambda sub: f"Новая отправка #{sub.id}"
+            ))
+            await asyncio.sleep(rng.uniform(0, 0.05))
+
+    async def moderate():
+        while time.monotonic() < deadline:
+            await timed("moderate", lambda: repository.set_status(
+                rng.randint(1, rows), 'approved', notify_text="Одобрено"
+            ))
+            await asyncio.sleep(rng.uniform(0, 0.05))
+
+    async def read(user_id):
+        async def screens():
+            await repository.list_user_submissions(user_id)
+            await repository.page_pending()
+            await repository.count_by_status()
+        while time.monotonic() < deadline:
+            await timed("read", screens)
+            await asyncio.sleep(rng.uniform(0, 0.02))
+
+    def report():
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                with sync_engine.connect() as connection:
+                    for _ in connection.execution_options(yield_per=1000).execute(text(
+                        "SELECT id, user_info, caption, status, submission_date FROM submissions"
+                    )):
+                        pass
+            except OperationalError:
+                errors["report"] += 1
+            latencies["report"].append(time.perf_counter() - started)
+
+    report_thread = threading.Thread(target=report)
+    report_thread.start()
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(submit(100000 + i) for i in range(writers)),
+        moderate(), moderate(),
+        *(read(1000 + i) for i in range(readers)),
+    )
+    elapsed = time.perf_counter() - started
+    await asyncio.to_thread(report_thread.join)
+    return latencies, errors, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"строк: {args.rows}, {args.seconds:.0f} с, писателей: {args.writers}, читателей: {args.readers}\n")
+    print(f"{'вариант':>8} {'операция':>9} {'всего':>6} {'в с':>6} {'p50, мс':>8} {'p95, мс':>8} "
+          f"{'max, мс':>8} {'locked':>7}")
+    for name, factory in (("default", default_engines), ("tuned", create_engines)):
+        path = os.path.join(Config.DATA_DIR, f"bench-{name}.db")
+        sync_engine, async_engine = factory(f"sqlite:///{path}")
+        seed(sync_engine, args.rows)
+        # Репозиторий берет сессии из database.AsyncSessionLocal; сначала init_engines,
+        # иначе первое обращение к базе заменит подставленную фабрику
+        database.init_engines()
+        database.AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+        latencies, errors, elapsed = asyncio.run(
+            run_load(sync_engine, args.rows, args.seconds, args.writers, args.readers)
+        )
+        for operation in ("submit", "moderate", "read", "report"):
+            values = latencies[operation]
+            print(f"{name:>8} {operation:>9} {len(values):>6} {len(values) / elapsed:>6.1f} "
+                  f"{percentile(values, 50) * 1000:>8.1f} {percentile(values, 95) * 1000:>8.1f} "
+                  f"{max(values, default=0) * 1000:>8.1f} {errors[operation]:>7}")
+        asyncio.run(async_engine.dispose())
+        sync_engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# bench_startup.py - холодный старт: импорт моделей, конфигурации и бота, create_app
+#
+# Запуск из корня проекта:
+#   python -m benchmarks.bench_startup [--runs 5]
+#
+# Каждый замер - новый процесс Python без BOT_TOKEN и с DATA_DIR, которого еще нет.
+# Импорт должен проходить без побочных эффектов: после него проверяется, не появился
+# ли каталог данных и не созданы ли движки database. Каталоги, движки и Bot(token)
+# создает только bot.create_app - его время и есть "бот готов" (без сети и базы).
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = "123456789:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA"
+
+PROBE = r"""
+import json, os, sys, time
+
+started = time.perf_counter()
+import {module}
+result = {{"import": time.perf_counter() - started}}
+database = sys.modules.get("database")
+result["data_dir"] = os.path.exists(os.environ["DATA_DIR"])
+result["engine"] = database is not None and "engine" in vars(database)
+result["bot"] = any(type(value).__name__ == "Bot" for value in vars({module}).values())
+if {create_app}:
+    started = time.perf_counter()
+    app = {module}.create_app(token="{token}")
+    result["create_app"] = time.perf_counter() - started
+    result["data_dir_after"] = os.path.exists(os.environ["DATA_DIR"])
+print(json.dumps(result))
+"""
+
+SCENARIOS = (
+    ("config", False),
+    ("database", False),
+    ("repository", False),
+    # Нижняя граница для bot: почти все время его импорта - модели типов aiogram
+    ("aiogram", False),
+    ("bot", True),
+)
+
+
+def probe(module, create_app):
+    data_dir = os.path.join(tempfile.mkdtemp(prefix="inside_bot_bench_"), "data")
+    env = {key: value for key, value in os.environ.items() if key not in ("BOT_TOKEN", "DATABASE_URL")}
+    env.update(DATA_DIR=data_dir, FSM_STORAGE="memory", PYTHONDONTWRITEBYTECODE="1")
+    try:
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, create_app=create_app, token=TOKEN)],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True
+        ).stdout
+    finally:
+        shutil.rmtree(os.path.dirname(data_dir), ignore_errors=True)
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    # Первый запуск прогревает файловый кэш и __pycache__, в замеры не идет
+    probe("bot", True)
+    print(f"{'модуль':<12}{'импорт p50, мс':>16}{'create_app, мс':>16}  побочные эффекты импорта")
+    for module, create_app in SCENARIOS:
+        runs = [probe(module, create_app) for _ in range(args.runs)]
+        effects = [name for name, key in (("каталог данных", "data_dir"), ("движки БД", "engine"),
+                                          ("Bot(token)", "bot")) if any(run[key] for run in runs)]
+        ready = f"{statistics.median(run['create_app'] for run in runs) * 1000:>16.1f}" if create_app else f"{'':>16}"
+        print(f"{module:<12}{statistics.median(run['import'] for run in runs) * 1000:>16.1f}{ready}  "
+              f"{', '.join(effects) or 'нет'}")
+        if create_app and not all(run["data_dir_after"] for run in runs):
+            print("  ⚠️ create_app не создал каталог данных")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# bench_webhook.py - пропускная способность и задержка: webhook против polling
+#
+# Запуск из корня проекта:
+#   python -m benchmarks.bench_webhook [--updates 2000] [--rate 200] [--connections 32]
+#
+# Bot API заменен StubSession: исходящие вызовы не уходят в сеть, а в режиме
+# polling getUpdates отдает синтетические апдейты из очереди. В режиме webhook
+# те же апдейты в виде JSON отправляются POST-запросами на локальный
+# aiohttp-сервер (create_webhook_app) с заголовком секретного токена.
+#
+# Фазы:
+#   burst - все апдейты сразу: сколько апдейтов в секунду успевает обработать бот
+#   paced - апдейты приходят с постоянным темпом --rate: задержка от "прихода"
+#           апдейта до конца обработки хендлером
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="inside_bot_bench_")
+os.environ.setdefault("BOT_TOKEN", "123456789:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA")
+os.environ["FSM_STORAGE"] = "memory"
+
+import aiohttp  # noqa: E402
+from aiogram.types import Chat, Message, Update, User  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+import bot  # noqa: E402
+from benchmarks.stubs import StubSession  # noqa: E402
+from database import engine, get_session, Submission  # noqa: E402
+from migrations import rebuild_counters, upgrade  # noqa: E402
+from webhook import create_webhook_app  # noqa: E402
+
+# Схему и приложение бот создает при запуске (main), здесь - до первых запросов
+upgrade(engine)
+app = bot.create_app()
+
+SECRET = "bench-secret"
+TEXTS = ["/start", "📊 Мои отправки", "ℹ️ О проекте"]
+_update_ids = itertools.count(1)
+
+
+def seed(rows):
+    start = datetime.utcnow() - timedelta(days=30)
+    with get_session() as session:
+        session.bulk_insert_mappings(Submission, [
+            {
+                'telegram_id': 1000 + i % 500,
+                'user_info': f"Флот {i % 9}, БПО Ноябрьск, мастер Иванов {i}",
+                'content_type': ['photo', 'video', 'text'][i % 3],
+                'caption': "Описание",
+                'status': ['pending', 'approved', 'rejected'][i % 3],
+                'submission_date': start + timedelta(minutes=i),
+            }
+            for i in range(rows)
+        ])
+        session.commit()
+    with engine.begin() as connection:
+        rebuild_counters(connection)
+
+
+def make_updates(count):
+    updates = []
+    for i in range(count):
+        update_id = next(_update_ids)
+        user_id = 1000 + random.randrange(500)
+        updates.append(Update(update_id=update_id, message=Message(
+            message_id=update_id,
+            date=datetime.now(),
+            chat=Chat(id=user_id, type="private"),
+            from_user=User(id=user_id, is_bot=False, first_name="Сотрудник"),
+            text=TEXTS[i % len(TEXTS)],
+        )))
+    return updates
+
+
+class Recorder:
+    """Outer-middleware: время конца обработки каждого апдейта"""
+
+    def __init__(self):
+        self.arrivals = {}
+        self.finished = {}
+        self.handler_ms = []
+        self.expected = 0
+        self.done = asyncio.Event()
+
+    def reset(self, expected):
+        self.arrivals.clear()
+        self.finished.clear()
+        self.handler_ms.clear()
+        self.expected = expected
+        self.done.clear()
+
+    async def __call__(self, handler, event, data):
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            now = time.perf_counter()
+            self.handler_ms.append((now - started) * 1000)
+            self.finished[event.update_id] = now
+            if len(self.finished) >= self.expected:
+                self.done.set()
+
+    def latencies(self):
+        return [(self.finished[uid] - arrival) * 1000 for uid, arrival in self.arrivals.items()]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+def report(mode, phase, recorder, elapsed):
+    latencies = recorder.latencies()
+    print(
+        f"{mode:<18} {phase:<6} {len(latencies) / elapsed:8.0f} апд/с  "
+        f"хендлер p50={statistics.median(recorder.handler_ms):6.2f} мс  "
+        f"задержка p50={statistics.median(latencies):7.2f} мс  "
+        f"p95={percentile(latencies, 95):7.2f} мс  p99={percentile(latencies, 99):7.2f} мс"
+    )
+
+
+async def arrive(updates, rate, deliver):
+    """Отдает апдейты в deliver: все сразу (rate=None) или с постоянным темпом"""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    tasks = []
+    for i, update in enumerate(updates):
+        if rate:
+            await asyncio.sleep(max(0.0, started + i / rate - loop.time()))
+        tasks.append(asyncio.create_task(deliver(update)))
+    await asyncio.gather(*tasks)
+
+
+async def run_polling(bench_bot, session, recorder, updates, rate):
+    recorder.reset(len(updates))
+
+    async def deliver(update):
+        recorder.arrivals[update.update_id] = time.perf_counter()
+        session.feed([update])
+
+    polling = asyncio.create_task(app.dp.start_polling(
+        bench_bot, handle_signals=False, close_bot_session=False, polling_timeout=1
+    ))
+    started = time.perf_counter()
+    await arrive(updates, rate, deliver)
+    await recorder.done.wait()
+    elapsed = time.perf_counter() - started
+    await app.dp.stop_polling()
+    await polling
+    return elapsed
+
+
+async def run_webhook(bench_bot, recorder, updates, rate, connections, background):
+    recorder.reset(len(updates))
+    web_app = create_webhook_app(app.dp, bench_bot, "/webhook", SECRET, handle_in_background=background)
+    runner = web.AppRunner(web_app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    url = f"http://127.0.0.1:{port}/webhook"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET, "Content-Type": "application/json"}
+    payloads = {u.update_id: u.model_dump_json(exclude_none=True) for u in updates}
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=connections)) as client:
+        # Запрос без секрета должен отклоняться
+        async with client.post(url, data=payloads[updates[0].update_id]) as response:
+            assert response.status == 401, response.status
+
+        async def deliver(update):
+            recorder.arrivals[update.update_id] = time.perf_counter()
+            async with client.post(url, data=payloads[update.update_id], headers=headers) as response:
+                assert response.status == 200, response.status
+
+        started = time.perf_counter()
+        await arrive(updates, rate, deliver)
+        await recorder.done.wait()
+        elapsed = time.perf_counter() - started
+
+    await runner.cleanup()
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=200, help="апдейтов в секунду в фазе paced")
+    parser.add_argument("--connections", type=int, default=32, help="одновременных POST в режиме webhook")
+    args = parser.parse_args()
+
+    print(f"Заполнение таблицы: {args.rows} строк...")
+    seed(args.rows)
+
+    session = StubSession(record=False)
+    bench_bot = app.bot
+    # Уведомления outbox и хендлеры ходят через одну и ту же заглушку
+    bench_bot.session = session
+    recorder = Recorder()
+    app.dp.update.outer_middleware(recorder)
+
+    for phase, rate in (("burst", None), ("paced", args.rate)):
+        elapsed = await run_polling(bench_bot, session, recorder, make_updates(args.updates), rate)
+        report("polling", phase, recorder, elapsed)
+        for background, mode in ((False, "webhook"), (True, "webhook/background")):
+            elapsed = await run_webhook(
+                bench_bot, recorder, make_updates(args.updates), rate, args.connections, background
+            )
+            report(mode, phase, recorder, elapsed)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+# stubs.py - Bot API без сети для бенчмарков
+import asyncio
+import itertools
+from datetime import datetime
+
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import GetMe, GetUpdates, TelegramMethod
+from aiogram.types import Chat, Message, User
+
+BOT_USER = User(id=123456789, is_bot=True, first_name="Bench", username="bench_bot")
+
+
+class StubSession(BaseSession):
+    """Сессия Bot API: запоминает исходящие вызовы и отвечает фиктивными объектами.
+
+    Для polling отдает апдейты из очереди feed(), как getUpdates настоящего
+    сервера (с учетом offset и limit).
+    """
+
+    def __init__(self, record=True):
+        super().__init__()
+        self.record = record
+        self.requests = []
+        self.calls = 0
+        self._ids = itertools.count(1)
+        self._updates = []
+        self._has_updates = asyncio.Event()
+
+    def feed(self, updates):
+        self._updates.extend(updates)
+        self._has_updates.set()
+
+    async def _get_updates(self, method: GetUpdates):
+        if method.offset:
+            self._updates = [u for u in self._updates if u.update_id >= method.offset]
+        if not self._updates:
+            self._has_updates.clear()
+            try:
+                await asyncio.wait_for(self._has_updates.wait(), timeout=method.timeout or 0.1)
+            except asyncio.TimeoutError:
+                return []
+        return self._updates[:method.limit or 100]
+
+    async def make_request(self, bot, method: TelegramMethod, timeout=None):
+        if isinstance(method, GetUpdates):
+            return await self._get_updates(method)
+        if isinstance(method, GetMe):
+            return BOT_USER
+        self.calls += 1
+        if self.record:
+            self.requests.append(method)
+        if method.__returning__ is bool:
+            return True
+        chat_id = getattr(method, "chat_id", 0)
+        return Message(
+            message_id=next(self._ids),
+            date=datetime.now(),
+            chat=Chat(id=chat_id if isinstance(chat_id, int) else 0, type="private"),
+            text=getattr(method, "text", None),
+        )
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def close(self):
+        pass
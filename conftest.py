@@ -0,0 +1,223 @@
+# conftest.py - изолированное окружение для тестов
+#
+# По умолчанию тесты идут на SQLite во временном DATA_DIR. TEST_DATABASE=postgres
+# гоняет весь набор на PostgreSQL: кластер поднимается во временном каталоге
+# (initdb и pg_ctl из PATH или /usr/lib/postgresql/*/bin) и удаляется после тестов.
+# Нужны драйверы asyncpg и psycopg; initdb не запускается от root.
+import asyncio
+import atexit
+import glob
+import importlib.util
+import itertools
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+from datetime import datetime
+
+import pytest
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Chat, File, Message
+
+# Тесты не должны трогать рабочую базу data/database.db и требовать настоящий токен
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="inside_bot_test_"))
+os.environ.setdefault("BOT_TOKEN", "123456789:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA")
+
+
+def _pg_binary(name):
+    found = shutil.which(name)
+    if found:
+        return found
+    installed = sorted(glob.glob(f"/usr/lib/postgresql/*/bin/{name}"))
+    return installed[-1] if installed else None
+
+
+def postgres_unavailable():
+    """Почему нельзя поднять временный PostgreSQL (None - можно)"""
+    if not _pg_binary("initdb") or not _pg_binary("pg_ctl"):
+        return "нет initdb/pg_ctl"
+    if hasattr(os, "geteuid") and os.geteuid() == 0:
+        return "initdb не запускается от root"
+    for driver in ("asyncpg", "psycopg"):
+        if importlib.util.find_spec(driver) is None:
+            return f"не установлен драйвер {driver}"
+    return None
+
+
+class TemporaryPostgres:
+    """Кластер PostgreSQL во временном каталоге: только для тестов, без fsync, доступ без пароля"""
+
+    def __init__(self):
+        self.directory = tempfile.mkdtemp(prefix="inside_bot_pg_")
+        self.data = os.path.join(self.directory, "data")
+        self.port = None
+        self._names = itertools.count(1)
+
+    def start(self):
+        subprocess.run([_pg_binary("initdb"), "-D", self.data, "-U", "postgres", "-A", "trust",
+                        "-E", "UTF8", "--no-sync"], check=True, capture_output=True)
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        subprocess.run([_pg_binary("pg_ctl"), "-D", self.data, "-l", os.path.join(self.directory, "server.log"),
+                        "-w", "-o", f"-p {self.port} -k {self.directory} -c listen_addresses=127.0.0.1 "
+                                    f"-c fsync=off -c full_page_writes=off", "start"],
+                       check=True, capture_output=True)
+        atexit.register(self.stop)
+        return self.url("postgres")
+
+    def url(self, database):
+        return f"postgresql://postgres@127.0.0.1:{self.port}/{database}"
+
+    def create_database(self):
+        """Новая пустая база в кластере, ее URL"""
+        from sqlalchemy import create_engine, text
+
+        # Без импорта database: до него DATABASE_URL еще может быть не задан
+        name = f"test_{next(self._names)}"
+        admin = create_engine(f"postgresql+psycopg://postgres@127.0.0.1:{self.port}/postgres",
+                              isolation_level="AUTOCOMMIT")
+        with admin.connect() as connection:
+            connection.execute(text(f"CREATE DATABASE {name}"))
+        admin.dispose()
+        return self.url(name)
+
+    def stop(self):
+        if self.port is not None:
+            subprocess.run([_pg_binary("pg_ctl"), "-D", self.data, "-m", "immediate", "stop"],
+                           capture_output=True)
+            self.port = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+_postgres = None
+if os.environ.get("TEST_DATABASE") == "postgres":
+    reason = postgres_unavailable()
+    if reason:
+        raise RuntimeError(f"TEST_DATABASE=postgres: {reason}")
+    _postgres = TemporaryPostgres()
+    _postgres.start()
+    os.environ["DATABASE_URL"] = _postgres.create_database()
+
+
+def pytest_sessionstart(session):
+    # Импорт config и database ничего не создает - как бот при запуске, готовим каталоги
+    # и применяем миграции один раз
+    from config import Config
+    from database import engine
+    from migrations import upgrade
+
+    Config.ensure_dirs()
+    upgrade(engine)
+
+
+# ========== ЗАГЛУШКИ BOT API ==========
+# Общие для тестовых модулей: тесты получают их через фикстуры, а не импортом друг из друга
+
+_message_ids = itertools.count(1)
+
+
+class StubSession(BaseSession):
+    """Сессия Bot API без сети: запоминает вызовы и отвечает фиктивным сообщением"""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    async def make_request(self, bot, method, timeout=None):
+        self.requests.append(method)
+        return Message(
+            message_id=next(_message_ids),
+            date=datetime.now(),
+            chat=Chat(id=getattr(method, "chat_id", 0), type="private"),
+            text=getattr(method, "text", None),
+        )
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+class FakeApi:
+    def file_url(self, token, path):
+        return f"https://files.test/{path}"
+
+
+class FakeFileSession:
+    """Отдает содержимое файлов блоками, как aiohttp при потоковом чтении"""
+
+    def __init__(self, files):
+        self.api = FakeApi()
+        self.files = files
+        self.max_chunk = 0
+
+    async def stream_content(self, url, chunk_size=65536, timeout=30, **kwargs):
+        content = self.files[url.rsplit('/', 1)[1]]
+        for start in range(0, len(content), chunk_size):
+            chunk = content[start:start + chunk_size]
+            self.max_chunk = max(self.max_chunk, len(chunk))
+            await asyncio.sleep(0)
+            yield chunk
+
+
+class FakeFileBot:
+    """Бот для загрузчика медиа: getFile и скачивание файлов из словаря {имя: байты}"""
+    token = "123456789:TEST"
+
+    def __init__(self, files):
+        self.session = FakeFileSession(files)
+
+    async def get_file(self, file_id):
+        return File(file_id=file_id, file_unique_id=file_id, file_path=f"photos/{file_id}.jpg")
+
+
+@pytest.fixture
+def stub_session():
+    """Новая сессия Bot API без сети; отправленные методы - в stub_session.requests"""
+    return StubSession()
+
+
+@pytest.fixture
+def fake_bot():
+    """Фабрика ботов для MediaDownloader: fake_bot({"a.jpg": b"..."})"""
+    return FakeFileBot
+
+
+@pytest.fixture(scope="session")
+def app():
+    """Бот, диспетчер и службы (bot.create_app) - одни на все тесты, как в работающем процессе"""
+    import bot
+
+    return bot.create_app()
+
+
+@pytest.fixture
+def set_admins(app, monkeypatch):
+    """Назначает администраторов на время теста: Config.ADMIN_IDS и сброс кэша app.admins"""
+    from config import Config
+
+    def set_admins(*ids):
+        monkeypatch.setattr(Config, "ADMIN_IDS", list(ids))
+        app.admins.invalidate()
+
+    yield set_admins
+    # После теста monkeypatch вернет прежний список - перечитать при следующей проверке
+    app.admins.invalidate()
+
+
+@pytest.fixture(scope="session")
+def postgres():
+    """Временный кластер PostgreSQL (тот же, что у TEST_DATABASE=postgres, или отдельный)"""
+    if _postgres is not None:
+        yield _postgres
+        return
+    reason = postgres_unavailable()
+    if reason:
+        pytest.skip(f"PostgreSQL недоступен: {reason}")
+    server = TemporaryPostgres()
+    server.start()
+    yield server
+    server.stop()
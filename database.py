@@ -1,8 +1,12 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, Boolean
+from sqlalchemy import create_engine, event, Column, BigInteger, Integer, String, DateTime, Text, Boolean, Index
+from sqlalchemy.engine import URL, Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import datetime
 import os
+from typing import Dict, Tuple
 from config import Config
 
 Base = declarative_base()
@@ -11,28 +15,214 @@ class Submission(Base):
     __tablename__ = 'submissions'
     
     id = Column(Integer, primary_key=True)
-    telegram_id = Column(Integer, nullable=False)
+    telegram_id = Column(BigInteger, nullable=False)  # ID Telegram бывают больше 2^31
     user_info = Column(Text, nullable=False)
     content_type = Column(String(20), nullable=False)  # photo/video/text
     caption = Column(Text, nullable=True)
-    media_path = Column(String(500), nullable=True)
+    media_path = Column(String(500), nullable=True)  # относительно Config.DATA_DIR
+    file_id = Column(String(200), nullable=True)  # file_id фото/видео в Telegram
     status = Column(String(20), default='pending')
     submission_date = Column(DateTime, default=datetime.datetime.utcnow)
     admin_comment = Column(Text, nullable=True)
 
+    # Поля автора из user_info (authors.parse_user_info), разбираются при создании;
+    # None - поле не распознано
+    fleet = Column(String(20), nullable=True)
+    base = Column(String(100), nullable=True)
+    period = Column(String(7), nullable=True)  # ГГГГ-ММ из "июнь 2025"
+    role = Column(String(200), nullable=True)
+    author_name = Column(String(200), nullable=True)
+
+    # Возможный дубликат: ID более ранней отправки с тем же или похожим фото
+    # (duplicates.py), заполняется после скачивания файла
+    duplicate_of = Column(Integer, nullable=True)
+
+    # Альбом: число файлов, сами файлы - в submission_media; file_id и media_path
+    # выше - первый файл (обложка). NULL - одиночное фото/видео или текст
+    media_count = Column(Integer, nullable=True)
+
+    # Почему файл нельзя скачать (больше лимита Bot API и т.п.); такие файлы
+    # загрузчик больше не повторяет. NULL - скачан или еще будет скачан
+    media_error = Column(Text, nullable=True)
+
+    # Индексы под запросы хендлеров: очередь модерации, "Мои отправки", выборки по датам,
+    # статистика по БПО и флотам
+    __table_args__ = (
+        Index('ix_submissions_status_date', 'status', 'submission_date'),
+        Index('ix_submissions_user_date', 'telegram_id', 'submission_date'),
+        Index('ix_submissions_date', 'submission_date'),
+        Index('ix_submissions_base_date', 'base', 'submission_date'),
+        Index('ix_submissions_fleet_date', 'fleet', 'submission_date'),
+        Index('ix_submissions_period_base', 'period', 'base'),
+        Index('ix_submissions_media_path', 'media_path'),
+    )
+
+class SubmissionMedia(Base):
+    """Файл альбома (media group): по строке на фото/видео, position - порядок в альбоме"""
+    __tablename__ = 'submission_media'
+    submission_id = Column(Integer, primary_key=True)
+    position = Column(Integer, primary_key=True)
+    content_type = Column(String(20), nullable=False)  # photo/video
+    file_id = Column(String(200), nullable=False)
+    media_path = Column(String(500), nullable=True)  # относительно Config.DATA_DIR, после скачивания
+    media_error = Column(Text, nullable=True)  # как Submission.media_error
+
+class SubmissionCounter(Base):
+    """Денормализованные счетчики для /admin и /stats.
+
+    Ключи: 'total', 'status:<статус>', 'type:<тип контента>', 'day:<ГГГГ-ММ-ДД>'.
+    Обновляются в той же транзакции, что и вставка/смена статуса отправки.
+    """
+    __tablename__ = 'submission_counters'
+    name = Column(String(50), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+class OutboxMessage(Base):
+    """Исходящее уведомление (transactional outbox).
+
+    Пишется в той же транзакции, что и изменение отправки, и доставляется
+    воркерами outbox.py с повторами, поэтому не теряется при сбоях и рестартах.
+    """
+    __tablename__ = 'outbox'
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(BigInteger, nullable=False)
+    text = Column(Text, nullable=False)
+    status = Column(String(20), nullable=False, default='pending')  # pending/sending/sent/dead
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index('ix_outbox_status_next', 'status', 'next_attempt_at'),
+    )
+
 class Admin(Base):
     __tablename__ = 'admins'
     id = Column(Integer, primary_key=True)
-    telegram_id = Column(Integer, unique=True, nullable=False)
+    telegram_id = Column(BigInteger, unique=True, nullable=False)
+
+# Поиск в PostgreSQL (repository.search_submissions): GIN-индекс ix_submissions_search
+# по этому выражению строит миграция 3, запрос обязан повторять его дословно.
+# Конфигурация 'simple' - без стемминга, как токенизатор FTS5 в SQLite
+SEARCH_VECTOR_PG = "to_tsvector('simple', coalesce(user_info, '') || ' ' || coalesce(caption, ''))"
 
-# Инициализация БД
-engine = create_engine(f'sqlite:///{os.path.join(Config.DATA_DIR, "database.db")}')
-Base.metadata.create_all(engine)
+DATABASE_URL = Config.DATABASE_URL
 
-# Создаем фабрику сессий
-SessionLocal = sessionmaker(bind=engine)
+# Драйверы по умолчанию: (синхронный - миграции, скрипты, выгрузка; асинхронный - хендлеры)
+DRIVERS = {
+    'sqlite': ('pysqlite', 'aiosqlite'),
+    'postgresql': ('psycopg', 'asyncpg'),
+}
+
+def engine_urls(url: str) -> Tuple[URL, URL]:
+    """URL синхронного и асинхронного движков для DATABASE_URL.
+
+    Драйвер в URL можно не указывать. Явно указанный асинхронный (aiosqlite,
+    asyncpg) берется для асинхронного движка, psycopg - для обоих (он умеет оба
+    режима), любой другой (psycopg2, pg8000) - для синхронного.
+    """
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in DRIVERS:
+        raise ValueError(f"Неподдерживаемая база данных: {backend} (нужна sqlite или postgresql)")
+    sync_driver, async_driver = DRIVERS[backend]
+    driver = url.drivername.partition('+')[2]
+    if driver == 'psycopg':
+        sync_driver = async_driver = driver
+    elif driver and driver != async_driver:
+        sync_driver = driver
+    return url.set(drivername=f'{backend}+{sync_driver}'), url.set(drivername=f'{backend}+{async_driver}')
+
+# Файл SQLite из DATABASE_URL (None для PostgreSQL) - для скриптов, работающих с ним напрямую
+_url = make_url(DATABASE_URL)
+DB_PATH = _url.database if _url.get_backend_name() == 'sqlite' else None
+
+# Настройки каждого нового соединения с SQLite:
+#   journal_mode=WAL - читатели не блокируют писателя и друг друга (в режиме
+#     журнала отката /stats или /export держали блокировку, и коммит отправки
+#     ждал до "database is locked");
+#   synchronous=NORMAL - в WAL fsync только при checkpoint, коммит переживает
+#     падение процесса (но не отключение питания);
+#   busy_timeout - сколько миллисекунд ждать чужую запись, прежде чем вернуть ошибку;
+#   cache_size (отрицательное - в КиБ) и mmap_size - страницы читаются из памяти;
+#   journal_size_limit - после checkpoint файл WAL обрезается до этого размера.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': Config.SQLITE_BUSY_TIMEOUT,
+    'cache_size': -Config.SQLITE_CACHE_SIZE * 1024,
+    'mmap_size': Config.SQLITE_MMAP_SIZE * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'journal_size_limit': 64 * 1024 * 1024,
+}
+
+def configure_sqlite(engine: Engine, pragmas: Dict[str, object] = SQLITE_PRAGMAS) -> None:
+    """Выполняет PRAGMA на каждом соединении движка при его открытии.
+
+    Для асинхронного движка передается async_engine.sync_engine.
+    """
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def create_engines(url: str) -> Tuple[Engine, AsyncEngine]:
+    """Синхронный (миграции, скрипты, выгрузка) и асинхронный (хендлеры) движки для URL базы.
+
+    Схему движки не трогают: таблицы создает и обновляет migrations.upgrade.
+    """
+    sync_url, async_url = engine_urls(url)
+    sqlite = sync_url.get_backend_name() == 'sqlite'
+    # Соединение PostgreSQL могло закрыться на стороне сервера, пока лежало в пуле
+    sync_engine = create_engine(sync_url, pool_pre_ping=not sqlite)
+    # aiosqlite выполняет запросы каждого соединения в своем потоке; с WAL читатели
+    # идут параллельно, поэтому пул держит несколько соединений, а не одно на всех
+    async_engine = create_async_engine(
+        async_url,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_POOL_OVERFLOW,
+        pool_pre_ping=not sqlite,
+    )
+    if sqlite:
+        configure_sqlite(sync_engine)
+        configure_sqlite(async_engine.sync_engine)
+    return sync_engine, async_engine
+
+# Движки и фабрики сессий (engine, async_engine, SessionLocal, AsyncSessionLocal) создаются
+# при первом обращении, а не при импорте: моделям, engine_urls и скриптам, которым база
+# не нужна, импорт ничего не стоит. Схему создает migrations.upgrade при запуске бота
+_LAZY = ('engine', 'async_engine', 'SessionLocal', 'AsyncSessionLocal')
+
+def init_engines() -> Tuple[Engine, AsyncEngine]:
+    """Создает движки и фабрики сессий для DATABASE_URL, если их еще нет"""
+    global engine, async_engine, SessionLocal, AsyncSessionLocal
+    if 'engine' not in globals():
+        if DB_PATH and DB_PATH != ':memory:':
+            # SQLite создает файл базы, но не каталог для него
+            os.makedirs(os.path.dirname(os.path.abspath(DB_PATH)), exist_ok=True)
+        engine, async_engine = create_engines(DATABASE_URL)
+        SessionLocal = sessionmaker(bind=engine)
+        # Асинхронные сессии для хендлеров бота
+        AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+    return engine, async_engine
+
+def __getattr__(name):
+    # from database import engine - первое обращение создает движки
+    if name in _LAZY:
+        init_engines()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Функция для получения сессии
 def get_session():
-    """Создает и возвращает новую сессию БД"""
-    return SessionLocal()
\ No newline at end of file
+    """Создает и возвращает новую синхронную сессию БД (для скриптов и тестов)"""
+    init_engines()
+    return SessionLocal()
+
+def get_async_session():
+    """Создает и возвращает новую асинхронную сессию БД"""
+    init_engines()
+    return AsyncSessionLocal()
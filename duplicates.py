@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import os
+import struct
+from itertools import combinations
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import repository
+from images import ImageProcessor
+
+logger = logging.getLogger(__name__)
+
+# Поиск повторно присланных фото и видео.
+#
+# Одинаковые файлы уже хранятся один раз (media.py, путь по SHA-256), так что
+# точная копия видна по совпадению media_path. Пересжатое или уменьшенное фото
+# (переслали из другого чата, сохранили скриншотом) - другой файл, его находит
+# перцептивный хеш (images.dhash, 64 бита): у таких копий он отличается в
+# нескольких битах.
+#
+# Хеши лежат в HashIndex в памяти; на диске - файл рядом с database.db, в
+# который каждый новый хеш дописывается 16 байтами, при запуске он читается целиком.
+
+HASH_BITS = 64
+_RECORD = struct.Struct('<QQ')  # хеш, ID отправки
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class HashIndex:
+    """Хеши фото с поиском ближайшего в радиусе distance бит (multi-index hashing).
+
+    64 бита делятся на bands полос. Если хеши отличаются не больше чем в distance
+    битах, то хотя бы в одной полосе - не больше чем в distance // bands
+    (принцип Дирихле). Для каждой полосы запроса перебираются ее варианты в этом
+    радиусе и берутся хеши из словаря полосы - точное расстояние считается
+    только для них, а не для всех хешей индекса.
+    """
+
+    def __init__(self, path: Optional[str] = None, distance: int = 6, bands: int = 4):
+        if HASH_BITS % bands:
+            raise ValueError(f"bands должно делить {HASH_BITS}")
+        self.path = path
+        self.distance = distance
+        self.bands = bands
+        self._width = HASH_BITS // bands
+        self._mask = (1 << self._width) - 1
+        # Маски переворота до distance // bands бит внутри полосы (включая "без изменений")
+        radius = distance // bands
+        self._flips = [sum(1 << bit for bit in bits)
+                       for r in range(radius + 1) for bits in combinations(range(self._width), r)]
+        self._hashes: List[int] = []
+        self._ids: List[int] = []
+        self._known: Set[int] = set()
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def __contains__(self, submission_id: int) -> bool:
+        return submission_id in self._known
+
+    def _bands(self, value: int):
+        for band in range(self.bands):
+            yield band, (value >> (band * self._width)) & self._mask
+
+    def _insert(self, value: int, submission_id: int) -> None:
+        position = len(self._hashes)
+        self._hashes.append(value)
+        self._ids.append(submission_id)
+        self._known.add(submission_id)
+        for band, key in self._bands(value):
+            self._tables[band].setdefault(key, []).append(position)
+
+    def load(self) -> int:
+        """Читает файл индекса (если есть). Недописанная последняя запись пропускается"""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        data = data[:len(data) - len(data) % _RECORD.size]
+        for value, submission_id in _RECORD.iter_unpack(data):
+            self._insert(value, submission_id)
+        return len(self._hashes)
+
+    def add(self, value: int, submission_id: int) -> None:
+        self._insert(value, submission_id)
+        if self.path:
+            with open(self.path, 'ab') as f:
+                f.write(_RECORD.pack(value, submission_id))
+
+    def nearest(self, value: int, before: Optional[int] = None) -> Optional[Tuple[int, int]]:
+        """(ID отправки, расстояние) ближайшего хеша не дальше distance; при равенстве - более ранняя.
+
+        before - искать только среди отправок с меньшим ID.
+        """
+        best: Optional[Tuple[int, int]] = None
+        for band, key in self._bands(value):
+            table = self._tables[band]
+            for flip in self._flips:
+                for position in table.get(key ^ flip, ()):
+                    submission_id = self._ids[position]
+                    if before is not None and submission_id >= before:
+                        continue
+                    distance = hamming(value, self._hashes[position])
+                    if distance <= self.distance and (best is None or (distance, submission_id) < best[::-1]):
+                        best = (submission_id, distance)
+        return best
+
+
+class DuplicateDetector:
+    """Проверка скачанного файла отправки на повтор (вызывается из MediaDownloader).
+
+    on_found(submission_id, original_id) - что сделать с найденным дубликатом
+    (bot.py отмечает отправку и уведомляет админов).
+    """
+
+    def __init__(self, index: HashIndex, processor: ImageProcessor,
+                 on_found: Callable[[int, int], Awaitable[None]]):
+        self.index = index
+        self.processor = processor
+        self.on_found = on_found
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        """Загружает индекс с диска (в отдельном потоке - файл может быть в мегабайты)"""
+        async with self._load_lock:
+            if self._loaded:
+                return
+            count = await asyncio.to_thread(self.index.load)
+            self._loaded = True
+            if count:
+                logger.info(f"Индекс перцептивных хешей: {count}")
+
+    async def find_original(self, submission_id: int, media_path: str, content_type: str) -> Optional[int]:
+        """ID более ранней отправки с тем же или похожим файлом; хеш фото попадает в индекс"""
+        if content_type != 'photo':
+            # Видео не декодируем (нет зависимостей для кадров) - только точная копия
+            return await repository.first_with_media(media_path, submission_id)
+        await self.start()
+        value = await self.processor.dhash(media_path)
+        match = self.index.nearest(value, before=submission_id)
+        # Повторное скачивание после перезапуска не должно добавить второй хеш той же отправки
+        if submission_id not in self.index:
+            self.index.add(value, submission_id)
+        return match[0] if match else None
+
+    async def check(self, submission_id: int, media_path: str, content_type: str) -> Optional[int]:
+        try:
+            original_id = await self.find_original(submission_id, media_path, content_type)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Не удалось проверить отправку #{submission_id} на дубликаты: {e}")
+            return None
+        if original_id is not None:
+            await self.on_found(submission_id, original_id)
+        return original_id
@@ -0,0 +1,197 @@
+# export.py - выгрузка отправок в ZIP: таблица (CSV или JSONL) и файлы медиа
+#
+# Строки читаются из базы партиями (yield_per) и сразу пишутся в архив, медиа
+# копируются в него блоками, поэтому память не растет с размером выборки:
+# архив на сотни тысяч отправок собирается так же, как на десяток.
+#
+# Из бота: /export [csv|jsonl] [фильтры] (bot.py). Из консоли:
+#   python export.py jsonl status=approved base=Ноябрьск from=2025-06-01 --out export.zip
+import argparse
+import csv
+import io
+import json
+import os
+import zipfile
+from datetime import datetime
+from typing import Iterator, NamedTuple, Optional, Sequence
+
+from sqlalchemy import case, func, select
+
+from config import Config
+from database import Submission, SubmissionMedia, get_session
+from media import media_abspath
+from repository import Selection
+from utils import parse_moderation_args
+
+FORMATS = ('csv', 'jsonl')
+
+# Колонки таблицы; media - путь файла внутри архива (у альбома - все файлы через |)
+COLUMNS = (
+    'id', 'submission_date', 'status', 'content_type', 'telegram_id', 'user_info',
+    'fleet', 'base', 'period', 'role', 'author_name', 'caption', 'admin_comment', 'media',
+)
+_SELECTED = [
+    Submission.id, Submission.submission_date, Submission.status, Submission.content_type,
+    Submission.telegram_id, Submission.user_info, Submission.fleet, Submission.base,
+    Submission.period, Submission.role, Submission.author_name, Submission.caption,
+    Submission.admin_comment,
+    # aggregate_strings - group_concat в SQLite, string_agg в PostgreSQL
+    case(
+        (Submission.media_count.isnot(None),
+         select(func.aggregate_strings(SubmissionMedia.media_path, '|'))
+         .where(SubmissionMedia.submission_id == Submission.id)
+         .scalar_subquery()),
+        else_=Submission.media_path,
+    ),
+]
+
+# Строк на одну выборку из курсора
+BATCH_SIZE = 1000
+
+
+class ExportResult(NamedTuple):
+    path: str
+    rows: int
+    media: int  # файлов медиа в архиве
+    missing: int  # медиа, которых нет на диске
+    size: int  # байт
+
+
+def export_selection(selection: Selection) -> Selection:
+    """Без статуса в фильтрах выгружаются одобренные отправки"""
+    return selection if selection.status else selection._replace(status='approved')
+
+
+def iter_rows(selection: Selection, batch_size: int = BATCH_SIZE) -> Iterator[tuple]:
+    """Строки выборки по возрастанию ID; в памяти не больше batch_size строк.
+
+    Читаются только нужные колонки, без ORM-объектов и identity map сессии.
+    """
+    stmt = (select(*_SELECTED).where(*selection.conditions())
+            .order_by(Submission.id).execution_options(yield_per=batch_size))
+    with get_session() as session:
+        for row in session.execute(stmt):
+            yield tuple(row)
+
+
+def iter_media(selection: Selection, batch_size: int = BATCH_SIZE) -> Iterator[str]:
+    """Пути медиа выборки (относительно Config.DATA_DIR) вторым проходом по базе.
+
+    Пока в архив пишется таблица, другой файл в него писать нельзя, а копить
+    пути в списке - та же память, что и у строк. Одинаковые файлы хранятся один
+    раз на несколько отправок (media.py), повторы убирает SQLite.
+    """
+    covers = select(Submission.media_path.label('media_path')).where(*selection.conditions(),
+                                                                      Submission.media_path.isnot(None))
+    album_files = (select(SubmissionMedia.media_path)
+                   .join(Submission, Submission.id == SubmissionMedia.submission_id)
+                   .where(*selection.conditions(), SubmissionMedia.media_path.isnot(None)))
+    # UNION (а не UNION ALL) убирает повторы, обложка альбома - его же первый файл
+    stmt = covers.union(album_files).order_by('media_path').execution_options(yield_per=batch_size)
+    with get_session() as session:
+        for (media_path,) in session.execute(stmt):
+            yield media_path
+
+
+def _media_name(media_path: Optional[str]) -> Optional[str]:
+    return media_path and "media/" + media_path.replace(os.sep, "/")
+
+
+def _record(row: tuple) -> dict:
+    record = dict(zip(COLUMNS, row))
+    record['submission_date'] = record['submission_date'] and record['submission_date'].isoformat(sep=' ')
+    if record['media']:
+        record['media'] = "|".join(_media_name(path) for path in record['media'].split("|"))
+    return record
+
+
+def _write_csv(stream, rows: Iterator[tuple]) -> int:
+    # utf-8-sig: Excel без BOM открывает кириллицу как cp1251
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    writer = csv.DictWriter(text, fieldnames=COLUMNS)
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(_record(row))
+        count += 1
+    text.flush()
+    text.detach()
+    return count
+
+
+def _write_jsonl(stream, rows: Iterator[tuple]) -> int:
+    count = 0
+    for row in rows:
+        stream.write(json.dumps(_record(row), ensure_ascii=False).encode('utf-8') + b"\n")
+        count += 1
+    return count
+
+
+def export_zip(selection: Selection, path: str, fmt: str = 'csv', media: bool = True,
+               batch_size: int = BATCH_SIZE) -> ExportResult:
+    """Пишет выборку в ZIP по пути path: submissions.csv|jsonl и media/<путь в DATA_DIR>.
+
+    Таблица сжимается, медиа (jpg, mp4 уже сжаты) кладутся без сжатия.
+    Архив собирается во временном файле и переименовывается в конце, так что
+    по пути path никогда не лежит недописанный архив.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Формат: {', '.join(FORMATS)}")
+    selection = export_selection(selection)
+    tmp_path = path + ".part"
+    media_count = missing = 0
+    try:
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            with archive.open(f"submissions.{fmt}", 'w', force_zip64=True) as stream:
+                write = _write_csv if fmt == 'csv' else _write_jsonl
+                rows = write(stream, iter_rows(selection, batch_size))
+            if media:
+                for media_path in iter_media(selection, batch_size):
+                    source = media_abspath(media_path)
+                    if not os.path.isfile(source):
+                        missing += 1
+                        continue
+                    archive.write(source, _media_name(media_path), compress_type=zipfile.ZIP_STORED)
+                    media_count += 1
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return ExportResult(path, rows, media_count, missing, os.path.getsize(path))
+
+
+def export_path(fmt: str, now: Optional[datetime] = None) -> str:
+    """Новый файл в Config.EXPORTS_DIR: export-20250601-153000.csv.zip"""
+    now = now or datetime.now()
+    return os.path.join(Config.EXPORTS_DIR, f"export-{now:%Y%m%d-%H%M%S}.{fmt}.zip")
+
+
+def main(argv: Sequence[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Выгрузка отправок в ZIP (таблица и медиа)")
+    parser.add_argument('args', nargs='*', metavar='фильтр',
+                        help="csv|jsonl, ID/диапазоны и фильтры как в /export: "
+                             "status=, type=, date=, from=, to=, user=, base=")
+    parser.add_argument('--out', help="путь к архиву (по умолчанию - в data/exports)")
+    parser.add_argument('--no-media', action='store_true', help="только таблица, без файлов")
+    options = parser.parse_args(argv)
+
+    args = list(options.args)
+    fmt = args.pop(0).lower() if args and args[0].lower() in FORMATS else 'csv'
+    try:
+        selection, rest = parse_moderation_args(args, allow_empty=True)
+    except ValueError as e:
+        parser.error(str(e))
+    if rest:
+        parser.error(f"Непонятные аргументы: {rest}")
+
+    Config.ensure_dirs()
+    result = export_zip(selection, options.out or export_path(fmt), fmt, media=not options.no_media)
+    print(f"📦 {result.path}: {result.rows} отправок, {result.media} файлов медиа, "
+          f"{result.size / 1024 / 1024:.1f} МБ")
+    if result.missing:
+        print(f"⚠️ Нет на диске: {result.missing} файлов")
+
+
+if __name__ == "__main__":
+    main()
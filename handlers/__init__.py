@@ -0,0 +1,16 @@
+# handlers - хендлеры бота по ролям: сотрудник (меню), форма отправки, администратор
+from typing import Tuple
+
+from aiogram import Router
+
+from handlers import admin, submission, user
+
+
+def get_routers() -> Tuple[Router, ...]:
+    """Роутеры в порядке проверки апдейта.
+
+    Меню - раньше шагов формы, чтобы кнопки работали в любом ее состоянии;
+    админский роутер отсекает не-админов одним фильтром, отказ на их
+    админские команды - до формы, чтобы "/view 1" не стал текстом поля.
+    """
+    return user.router, admin.router, admin.denied_router, submission.router
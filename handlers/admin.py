@@ -0,0 +1,579 @@
+# handlers/admin.py - модерация и отчеты: команды и кнопки только для администраторов
+#
+# Права проверяет фильтр IsAdmin один раз на роутере, а не каждый хендлер: апдейт
+# сотрудника отсекается целиком и не сверяется с командами ниже. Не-админу на
+# админскую команду или кнопку отвечает denied_router.
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+
+from aiogram import Router, types
+from aiogram.filters import Command, or_f
+from aiogram.types import FSInputFile, InputMediaPhoto, InputMediaVideo
+
+import repository
+from admins import IsAdmin
+from config import Config
+from export import FORMATS as EXPORT_FORMATS, export_path, export_zip
+from images import ImageProcessor
+from keyboards import (
+    get_pagination_keyboard, PageCallback, get_moderation_keyboard, ModerationCallback,
+    get_search_keyboard, SearchCallback
+)
+from metrics import perf_window
+from outbox import OutboxWorker
+from rendering import (
+    CONTENT_EMOJI, ADMIN_DASHBOARD, RenderCache, admin_dashboard_text, author_short,
+    submission_info, submission_line
+)
+from utils import format_size, parse_moderation_args, format_id_ranges
+
+logger = logging.getLogger(__name__)
+
+router = Router(name="admin")
+router.message.filter(IsAdmin())
+router.callback_query.filter(IsAdmin())
+
+# ========== МИНИАТЮРЫ ==========
+
+# Миниатюра загружается в Telegram один раз, дальше отправляется по file_id
+thumbnail_file_ids = {}
+
+def thumbnail_input(path):
+    return thumbnail_file_ids.get(path) or FSInputFile(path)
+
+def remember_thumbnail(path, sent):
+    if sent.photo:
+        thumbnail_file_ids[path] = sent.photo[-1].file_id
+
+async def answer_with_thumbnail(message, submission, text, images):
+    """Отвечает миниатюрой фото с подписью. False, если миниатюры нет"""
+    if submission.content_type != 'photo' or not submission.media_path:
+        return False
+    
+    # Если миниатюры еще нет, она строится в пуле процессов - обработка апдейтов не блокируется
+    path = await images.thumbnail(submission.media_path)
+    if not path:
+        return False
+    
+    # Подпись к фото ограничена 1024 символами
+    caption = text if len(text) <= 1024 else f"📋 Отправка #{submission.id}"
+    sent = await message.answer_photo(thumbnail_input(path), caption=caption)
+    remember_thumbnail(path, sent)
+    if caption != text:
+        await message.answer(text)
+    return True
+
+async def send_queue_thumbnails(message, submissions, images):
+    """Миниатюры фото со страницы очереди одним альбомом (только уже готовые)"""
+    items = []
+    for sub in submissions:
+        if sub.content_type == 'photo' and sub.media_path:
+            paths = images.cached(sub.media_path)
+            if paths:
+                items.append((sub.id, paths['thumbnail']))
+    items = items[:10]  # больше 10 фото в альбоме Telegram не принимает
+    
+    if len(items) == 1:
+        submission_id, path = items[0]
+        remember_thumbnail(path, await message.answer_photo(thumbnail_input(path), caption=f"#{submission_id}"))
+    elif items:
+        sent = await message.answer_media_group([
+            InputMediaPhoto(media=thumbnail_input(path), caption=f"#{submission_id}")
+            for submission_id, path in items
+        ])
+        for (_, path), sent_message in zip(items, sent):
+            remember_thumbnail(path, sent_message)
+
+# ========== СПИСКИ С ПАГИНАЦИЕЙ ==========
+
+EPOCH = datetime(1970, 1, 1)
+
+def cursor_of(sub):
+    """Ключ отправки для callback_data: (дата в микросекундах, id)"""
+    return (sub.submission_date - EPOCH) // timedelta(microseconds=1), sub.id
+
+def page_keyboard(view, page):
+    """Инлайн-навигация для страницы: курсоры - ключи крайних строк"""
+    return get_pagination_keyboard(
+        view,
+        prev_cursor=cursor_of(page.items[0]) if page.has_prev else None,
+        next_cursor=cursor_of(page.items[-1]) if page.has_next else None
+    )
+
+async def render_submissions_page(page):
+    """Текст и клавиатура страницы /submissions"""
+    total = await repository.count_total()
+    response = f"📋 Все отправки (всего {total}):\n\n"
+    
+    for sub in page.items:
+        response += submission_line(sub)
+    
+    return response, page_keyboard('all', page)
+
+async def render_pending_page(page):
+    """Текст и клавиатура страницы /pending"""
+    pending = (await repository.count_by_status()).get('pending', 0)
+    response = f"⏳ Ожидают модерации ({pending}):\n\n"
+    
+    for sub in page.items:
+        content_emoji = CONTENT_EMOJI.get(sub.content_type, '📄')
+        date_str = sub.submission_date.strftime('%d.%m %H:%M')
+        
+        response += f"{content_emoji} #{sub.id} - {author_short(sub)[:40]} ({date_str})\n"
+    
+    response += f"\nДля просмотра: /view <ID>, карточками с кнопками: /moderate"
+    return response, page_keyboard('pending', page)
+
+SEARCH_TITLE = "🔍 Поиск: "
+
+def render_search_page(query, page, offset):
+    """Текст и клавиатура страницы результатов /search"""
+    # Первая строка - запрос: по ней кнопки листания узнают, что искать
+    response = f"{SEARCH_TITLE}{query}\n\n"
+    for sub in page.items:
+        response += submission_line(sub)
+    response += "\nДля просмотра: /view <ID>"
+    keyboard = get_search_keyboard(offset, repository.PAGE_SIZE, page.has_prev, page.has_next)
+    return response, keyboard
+
+# ========== КАРТОЧКИ МОДЕРАЦИИ ==========
+
+# Пока модератор смотрит карточку, следующая ожидающая отправка загружается в фоне:
+# id отправки на карточке -> задача, возвращающая следующую
+prefetched_cards = {}
+PREFETCH_LIMIT = 1000
+
+def prefetch_next(submission):
+    if submission.id in prefetched_cards:
+        return
+    if len(prefetched_cards) >= PREFETCH_LIMIT:
+        # Самая старая карточка, скорее всего, брошена
+        prefetched_cards.pop(next(iter(prefetched_cards))).cancel()
+    prefetched_cards[submission.id] = asyncio.create_task(
+        repository.next_pending((submission.submission_date, submission.id))
+    )
+
+async def take_next(callback_data):
+    """Следующая карточка: заранее загруженная или (после перезапуска) запросом по ключу"""
+    task = prefetched_cards.pop(callback_data.id, None)
+    if task is not None:
+        try:
+            return await task
+        except Exception:
+            logger.exception("Не удалось заранее загрузить карточку")
+    cursor = (EPOCH + timedelta(microseconds=callback_data.ts), callback_data.id)
+    return await repository.next_pending(cursor)
+
+def card_media(submission, caption, images):
+    """InputMedia для карточки фото/видео или None для текста"""
+    if submission.content_type == 'photo' and submission.file_id:
+        # Готовая миниатюра легче оригинала; если ее нет - оригинал по file_id
+        paths = images.cached(submission.media_path) if submission.media_path else None
+        media = thumbnail_input(paths['thumbnail']) if paths else submission.file_id
+        return InputMediaPhoto(media=media, caption=caption)
+    if submission.content_type == 'video' and submission.file_id:
+        return InputMediaVideo(media=submission.file_id, caption=caption)
+    return None
+
+def card_parts(submission, images):
+    ts, submission_id = cursor_of(submission)
+    text = submission_info(submission)[:1024]  # подпись к медиа ограничена 1024 символами
+    return text, card_media(submission, text, images), get_moderation_keyboard(submission_id, ts)
+
+async def send_card(message, submission, images):
+    """Новое сообщение-карточка"""
+    text, media, keyboard = card_parts(submission, images)
+    if isinstance(media, InputMediaPhoto):
+        sent = await message.answer_photo(media.media, caption=text, reply_markup=keyboard)
+    elif isinstance(media, InputMediaVideo):
+        sent = await message.answer_video(media.media, caption=text, reply_markup=keyboard)
+    else:
+        sent = await message.answer(text, reply_markup=keyboard)
+    if isinstance(media, InputMediaPhoto) and isinstance(media.media, FSInputFile):
+        remember_thumbnail(media.media.path, sent)
+    prefetch_next(submission)
+
+async def show_card(message, submission, images):
+    """Показывает отправку на месте текущей карточки"""
+    text, media, keyboard = card_parts(submission, images)
+    card_has_media = bool(message.photo or message.video)
+    if media is not None and card_has_media:
+        sent = await message.edit_media(media, reply_markup=keyboard)
+        if isinstance(media.media, FSInputFile) and isinstance(sent, types.Message):
+            remember_thumbnail(media.media.path, sent)
+    elif media is None and not card_has_media:
+        await message.edit_text(text, reply_markup=keyboard)
+    else:
+        # Текстовое сообщение нельзя превратить в фото и наоборот
+        await message.delete()
+        await send_card(message, submission, images)
+        return
+    prefetch_next(submission)
+
+async def finish_cards(message):
+    text = "✅ Очередь пройдена. Пропущенные остались в /pending, /moderate - начать заново."
+    if message.photo or message.video:
+        await message.edit_caption(caption=text)
+    else:
+        await message.edit_text(text)
+
+# ========== КОМАНДЫ ==========
+
+@router.message(Command("admin"))
+async def cmd_admin(message: types.Message, render_cache: RenderCache):
+    """Панель администратора"""
+    text = render_cache.get(ADMIN_DASHBOARD)
+    if text is None:
+        generation = render_cache.generation
+        text = admin_dashboard_text(await repository.count_by_status())
+        render_cache.set(ADMIN_DASHBOARD, text, generation)
+    
+    await message.answer(text)
+
+@router.message(Command("submissions"))
+async def cmd_submissions(message: types.Message):
+    """Просмотр всех отправок"""
+    page = await repository.page_submissions()
+    
+    if not page.items:
+        await message.answer("📭 Отправок пока нет.")
+        return
+    
+    text, keyboard = await render_submissions_page(page)
+    await message.answer(text, reply_markup=keyboard)
+
+@router.message(Command("view"))
+async def cmd_view(message: types.Message, images: ImageProcessor):
+    """Просмотр конкретной отправки"""
+    # Парсим ID из команды /view 123
+    args = message.text.split()
+    if len(args) < 2:
+        await message.answer("Использование: /view <ID>\nПример: /view 1")
+        return
+    
+    try:
+        submission_id = int(args[1])
+    except ValueError:
+        await message.answer("ID должен быть числом")
+        return
+    
+    submission = await repository.get_submission(submission_id)
+    
+    if not submission:
+        await message.answer(f"❌ Отправка #{submission_id} не найдена.")
+        return
+    
+    info = submission_info(submission)
+    if not await answer_with_thumbnail(message, submission, info, images):
+        await message.answer(info)
+    
+    # Остальные файлы альбома - одной группой по file_id
+    if submission.media_count:
+        parts = (await repository.list_album_media(submission.id))[1:]
+        if len(parts) == 1:
+            part = parts[0]
+            send = message.answer_photo if part.content_type == 'photo' else message.answer_video
+            await send(part.file_id)
+        elif parts:
+            await message.answer_media_group([
+                (InputMediaPhoto if part.content_type == 'photo' else InputMediaVideo)(media=part.file_id)
+                for part in parts
+            ])
+
+@router.message(Command("pending"))
+async def cmd_pending(message: types.Message, images: ImageProcessor):
+    """Просмотр ожидающих модерации отправок"""
+    # Только ожидающие модерации, первая страница
+    page = await repository.page_pending()
+    
+    if not page.items:
+        await message.answer("✅ Нет отправок ожидающих модерации.")
+        return
+    
+    text, keyboard = await render_pending_page(page)
+    await send_queue_thumbnails(message, page.items, images)
+    await message.answer(text, reply_markup=keyboard)
+
+@router.callback_query(PageCallback.filter())
+async def paginate(callback: types.CallbackQuery, callback_data: PageCallback):
+    """Листание /pending и /submissions инлайн-кнопками"""
+    cursor = (EPOCH + timedelta(microseconds=callback_data.ts), callback_data.id)
+    if callback_data.view == 'pending':
+        page = await repository.page_pending(cursor, callback_data.backwards)
+        render = render_pending_page
+    else:
+        page = await repository.page_submissions(cursor, callback_data.backwards)
+        render = render_submissions_page
+    
+    if not page.items:
+        await callback.answer("Больше отправок нет.")
+        return
+    
+    text, keyboard = await render(page)
+    await callback.message.edit_text(text, reply_markup=keyboard)
+    await callback.answer()
+
+@router.message(Command("search"))
+async def cmd_search(message: types.Message):
+    """Полнотекстовый поиск по данным автора и описанию"""
+    args = message.text.split(maxsplit=1)
+    query = args[1].strip() if len(args) > 1 else ''
+    if not query:
+        await message.answer(
+            "Использование: /search <слова>\n"
+            "Пример: /search БПО Ноябрьск Иванов\n"
+            "Ищутся отправки, где есть все слова; последнее можно не дописывать."
+        )
+        return
+    
+    page = await repository.search_submissions(query)
+    if not page.items:
+        await message.answer(f"🔍 По запросу «{query}» ничего не найдено.")
+        return
+    
+    text, keyboard = render_search_page(query, page, 0)
+    await message.answer(text, reply_markup=keyboard)
+
+@router.callback_query(SearchCallback.filter())
+async def paginate_search(callback: types.CallbackQuery, callback_data: SearchCallback):
+    """Листание результатов /search"""
+    query = callback.message.text.split("\n", 1)[0][len(SEARCH_TITLE):]
+    page = await repository.search_submissions(query, callback_data.offset)
+    if not page.items:
+        await callback.answer("Больше отправок нет.")
+        return
+    
+    text, keyboard = render_search_page(query, page, callback_data.offset)
+    await callback.message.edit_text(text, reply_markup=keyboard)
+    await callback.answer()
+
+def approved_text(ids, comment=None):
+    """Уведомление автору об одобрении одной или нескольких его отправок"""
+    if len(ids) == 1:
+        text = f"✅ Ваша отправка #{ids[0]} одобрена!\n"
+    else:
+        text = f"✅ Ваши отправки {format_id_ranges(ids)} одобрены!\n"
+    return text + (f"💬 Комментарий: {comment}" if comment else "")
+
+def rejected_text(ids, reason):
+    if len(ids) == 1:
+        text = f"❌ Ваша отправка #{ids[0]} отклонена.\n"
+    else:
+        text = f"❌ Ваши отправки {format_id_ranges(ids)} отклонены.\n"
+    return text + f"📋 Причина: {reason}"
+
+async def apply_moderation(message, status, usage, outbox):
+    """Общая часть /approve и /reject: одна отправка или пакет по ID и фильтрам"""
+    args = message.text.split()
+    if len(args) < 2:
+        await message.answer(usage)
+        return
+    
+    try:
+        selection, comment = parse_moderation_args(args[1:])
+    except ValueError as e:
+        await message.answer(str(e))
+        return
+    
+    if status == 'approved':
+        comment = comment or None
+        notify_text = lambda ids: approved_text(ids, comment)
+        done_one, done_many = "✅ Отправка #{} одобрена.", "✅ Одобрено отправок: {}"
+    else:
+        comment = comment or "Отклонено модератором"
+        notify_text = lambda ids: rejected_text(ids, comment)
+        done_one, done_many = "❌ Отправка #{} отклонена.", "❌ Отклонено отправок: {}"
+    
+    # Один ID без фильтров - прежний путь с ответом "не найдена"
+    first_low, first_high = selection.ranges[0] if selection.ranges else (None, None)
+    if first_low == first_high and selection == repository.Selection(ranges=((first_low, first_low),)):
+        single = first_low
+        # Обновляем статус; уведомление пользователю ляжет в outbox в той же транзакции
+        submission = await repository.set_status(single, status, comment, notify_text=notify_text([single]))
+        if not submission:
+            await message.answer(f"❌ Отправка #{single} не найдена.")
+            return
+        outbox.wake()
+        await message.answer(done_one.format(single))
+        return
+    
+    # Пакет: один UPDATE на всю выборку и уведомления одной вставкой
+    ids = await repository.set_status_many(selection, status, comment, notify_text=notify_text)
+    if not ids:
+        await message.answer("Подходящих отправок не найдено.")
+        return
+    outbox.wake()
+    await message.answer(f"{done_many.format(len(ids))}\n{format_id_ranges(ids)}")
+
+@router.message(Command("approve"))
+async def cmd_approve(message: types.Message, outbox: OutboxWorker):
+    """Одобрить одну или несколько отправок"""
+    await apply_moderation(message, 'approved', (
+        "Использование: /approve <ID> [комментарий]\n"
+        "Пример: /approve 1 Отличное фото!\n"
+        "Несколько сразу: /approve 10-57,63 Спасибо\n"
+        "По фильтру (только ожидающие): /approve type=text date=2025-06-01\n"
+        "Фильтры: type=photo|video|text, date=, from=, to=, user=<Telegram ID>"
+    ), outbox)
+
+@router.message(Command("reject"))
+async def cmd_reject(message: types.Message, outbox: OutboxWorker):
+    """Отклонить одну или несколько отправок"""
+    await apply_moderation(message, 'rejected', (
+        "Использование: /reject <ID> [причина]\n"
+        "Пример: /reject 1 Низкое качество\n"
+        "Несколько сразу: /reject 10-57,63 Не по теме\n"
+        "По фильтру (только ожидающие): /reject type=video from=2025-06-01 to=2025-06-30"
+    ), outbox)
+
+STATS_MONTHS = 3
+
+@router.message(Command("stats"))
+async def cmd_stats(message: types.Message):
+    """Детальная статистика"""
+    # Статистика по типам контента
+    type_stats = await repository.content_type_stats()
+    
+    # Последние 7 дней
+    recent = await repository.count_last_days(7)
+    
+    response = "📈 Детальная статистика:\n\n"
+    
+    # По типам
+    response += "📄 По типам контента:\n"
+    for content_type, count in type_stats:
+        emoji = CONTENT_EMOJI.get(content_type, '📄')
+        response += f"  {emoji} {content_type}: {count}\n"
+    
+    response += f"\n📅 За последние 7 дней: {recent}\n"
+    
+    # По БПО и месяцам
+    base_stats = await repository.base_month_stats(STATS_MONTHS)
+    if base_stats:
+        response += f"\n🏭 По БПО за {STATS_MONTHS} мес.:\n"
+        current_base = object()
+        for base, month, count in base_stats:
+            if base != current_base:
+                current_base = base
+                response += f"  {base or 'не указана'}:\n"
+            response += f"    {month}: {count}\n"
+    
+    await message.answer(response)
+
+# Экспорт собирается в отдельном потоке; одновременно - только один
+export_lock = asyncio.Lock()
+
+@router.message(Command("export"))
+async def cmd_export(message: types.Message):
+    """Выгрузка отправок в ZIP: таблица CSV/JSONL и файлы медиа"""
+    args = message.text.split()[1:]
+    fmt = args.pop(0).lower() if args and args[0].lower() in EXPORT_FORMATS else 'csv'
+    try:
+        selection, rest = parse_moderation_args(args, allow_empty=True)
+    except ValueError as e:
+        await message.answer(str(e))
+        return
+    if rest:
+        await message.answer(
+            "Использование: /export [csv|jsonl] [фильтры]\n"
+            "Пример: /export jsonl base=Ноябрьск from=2025-06-01\n"
+            "Фильтры: status= (по умолчанию approved), type=, date=, from=, to=, user=, base=, ID и диапазоны"
+        )
+        return
+    if export_lock.locked():
+        await message.answer("⏳ Уже идет другой экспорт, попробуйте позже.")
+        return
+    
+    async with export_lock:
+        await message.answer("📦 Собираю архив...")
+        # Чтение базы и запись ZIP - блокирующие, event loop они не держат
+        result = await asyncio.to_thread(export_zip, selection, export_path(fmt), fmt)
+        summary = f"{result.rows} отправок, {result.media} файлов медиа, {format_size(result.size)}"
+        if result.missing:
+            summary += f"\n⚠️ Нет на диске: {result.missing} файлов"
+        
+        if result.size > Config.EXPORT_SEND_LIMIT:
+            await message.answer(f"📦 Архив слишком большой для Telegram ({summary}).\n"
+                                 f"Сохранен на сервере: {result.path}")
+            return
+        try:
+            await message.answer_document(FSInputFile(result.path), caption=f"📦 {summary}")
+        finally:
+            os.remove(result.path)
+
+@router.message(Command("moderate"))
+async def cmd_moderate(message: types.Message, images: ImageProcessor):
+    """Модерация карточками: одна отправка с кнопками одобрить/отклонить/пропустить"""
+    submission = await repository.next_pending()
+    if not submission:
+        await message.answer("✅ Нет отправок ожидающих модерации.")
+        return
+    await send_card(message, submission, images)
+
+@router.callback_query(ModerationCallback.filter())
+async def moderation_card(callback: types.CallbackQuery, callback_data: ModerationCallback,
+                          outbox: OutboxWorker, images: ImageProcessor):
+    """Решение по карточке: меняем статус и показываем следующую на месте этой"""
+    submission_id = callback_data.id
+    toast = f"⏭ #{submission_id} пропущена"
+    if callback_data.a in ('a', 'r'):
+        if callback_data.a == 'a':
+            status, comment, toast = 'approved', None, f"✅ #{submission_id} одобрена"
+            notify_text = approved_text
+        else:
+            status, comment, toast = 'rejected', "Отклонено модератором", f"❌ #{submission_id} отклонена"
+            notify_text = lambda ids: rejected_text(ids, comment)
+        # Только если отправка еще ожидает: другой модератор мог успеть раньше
+        changed = await repository.set_status_many(
+            repository.Selection(ranges=((submission_id, submission_id),), status='pending'),
+            status, comment, notify_text=notify_text
+        )
+        if changed:
+            outbox.wake()
+        else:
+            toast = f"#{submission_id} уже обработана другим модератором"
+    await callback.answer(toast)
+    
+    next_submission = await take_next(callback_data)
+    if next_submission:
+        await show_card(callback.message, next_submission, images)
+    else:
+        await finish_cards(callback.message)
+
+@router.message(Command("perf"))
+async def cmd_perf(message: types.Message):
+    """Самые медленные хендлеры за последние PERF_WINDOW секунд"""
+    slowest = perf_window.slowest(10)
+    if not slowest:
+        await message.answer("Нет данных о производительности за последние "
+                             f"{Config.PERF_WINDOW // 60} мин.")
+        return
+    
+    response = f"⏱ Самые медленные хендлеры за {Config.PERF_WINDOW // 60} мин (мс):\n\n"
+    for item in slowest:
+        response += (
+            f"<b>{item['handler']}</b> ×{item['count']}\n"
+            f"  p50 {item['p50'] * 1000:.1f} · p95 {item['p95'] * 1000:.1f} · max {item['max'] * 1000:.1f}\n"
+            f"  в среднем: БД {item['db_time'] * 1000:.1f} ({item['db_queries']:.1f} запр.), "
+            f"API {item['api_time'] * 1000:.1f}, FSM {item['fsm_time'] * 1000:.1f}\n"
+        )
+    
+    await message.answer(response, parse_mode="HTML")
+
+# ========== БЕЗ ПРАВ ==========
+
+# Команды роутера выше: не-админ получает отказ, а не молчание
+ADMIN_COMMANDS = ("admin", "submissions", "view", "pending", "search", "approve", "reject",
+                  "stats", "export", "moderate", "perf")
+
+denied_router = Router(name="admin_denied")
+
+@denied_router.message(Command(*ADMIN_COMMANDS))
+async def admin_command_denied(message: types.Message):
+    await message.answer("У вас нет прав администратора.")
+
+@denied_router.callback_query(or_f(PageCallback.filter(), SearchCallback.filter(), ModerationCallback.filter()))
+async def admin_button_denied(callback: types.CallbackQuery):
+    await callback.answer("У вас нет прав администратора.", show_alert=True)
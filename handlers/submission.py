@@ -0,0 +1,288 @@
+# handlers/submission.py - форма отправки: тип контента, данные автора, описание,
+# файл или альбом, превью и подтверждение
+from aiogram import F, Router, types
+from aiogram.fsm.context import FSMContext
+from aiogram.types import InputMediaPhoto, InputMediaVideo
+
+import repository
+from admins import AdminRegistry
+from config import Config
+from keyboards import Button, get_cancel_keyboard, get_confirmation_keyboard, get_main_menu
+from media import MediaDownloader
+from outbox import OutboxWorker
+from rendering import CONTENT_EMOJI, CONTENT_TYPE_RU
+from states import ContentSubmission
+from utils import check_media_limits, format_duration, format_size
+
+router = Router(name="submission")
+
+# ========== ОТПРАВКА ФОТО ==========
+
+@router.message(Button("📸 Отправить фото"))
+async def start_photo_submission(message: types.Message, state: FSMContext):
+    """Начало отправки фото"""
+    await state.update_data(content_type="photo")
+    
+    await message.answer(
+        "📋 Прежде чем отправить фото, давайте познакомимся!\n\n"
+        "Расскажите о себе в формате:\n"
+        f"<b>{Config.INFO_TEMPLATE}</b>",
+        parse_mode="HTML",
+        reply_markup=get_cancel_keyboard()
+    )
+    await state.set_state(ContentSubmission.waiting_for_user_info)
+
+# ========== ОТПРАВКА ВИДЕО ==========
+
+@router.message(Button("🎥 Отправить видео"))
+async def start_video_submission(message: types.Message, state: FSMContext):
+    """Начало отправки видео"""
+    await state.update_data(content_type="video")
+    
+    await message.answer(
+        "📋 Прежде чем отправить видео, давайте познакомимся!\n\n"
+        "Расскажите о себе в формате:\n"
+        f"<b>{Config.INFO_TEMPLATE}</b>",
+        parse_mode="HTML",
+        reply_markup=get_cancel_keyboard()
+    )
+    await state.set_state(ContentSubmission.waiting_for_user_info)
+
+# ========== ОТПРАВКА ТЕКСТА ==========
+
+@router.message(Button("📝 Отправить текст"))
+async def start_text_submission(message: types.Message, state: FSMContext):
+    """Начало отправки текста"""
+    await state.update_data(content_type="text")
+    
+    await message.answer(
+        "📋 Прежде чем отправить текст, давайте познакомимся!\n\n"
+        "Расскажите о себе в формате:\n"
+        f"<b>{Config.INFO_TEMPLATE}</b>",
+        parse_mode="HTML",
+        reply_markup=get_cancel_keyboard()
+    )
+    await state.set_state(ContentSubmission.waiting_for_user_info)
+
+# ========== ОБРАБОТКА ФОРМЫ ==========
+
+@router.message(ContentSubmission.waiting_for_user_info)
+async def process_user_info(message: types.Message, state: FSMContext):
+    """Обработка информации о себе"""
+    if len(message.text.strip()) < 10:
+        await message.answer("❌ Информация слишком короткая. Пожалуйста, расскажите подробнее.")
+        return
+    
+    await state.update_data(user_info=message.text.strip())
+    
+    await message.answer(
+        "📝 Теперь добавьте описание:\n"
+        "• Что изображено/о чем текст?\n"
+        "• Почему это важно показать?",
+        reply_markup=get_cancel_keyboard()
+    )
+    await state.set_state(ContentSubmission.waiting_for_caption)
+
+@router.message(ContentSubmission.waiting_for_caption)
+async def process_caption(message: types.Message, state: FSMContext):
+    """Обработка описания"""
+    await state.update_data(caption=message.text.strip())
+    
+    data = await state.get_data()
+    content_type = data.get('content_type', 'photo')
+    
+    if content_type in ['photo', 'video']:
+        media_type = "фото" if content_type == 'photo' else "видео"
+        limits = Config.MEDIA_LIMITS[content_type]
+        limits_text = f"⚠️ Максимальный размер: {format_size(limits['max_size'])}"
+        if limits['max_duration']:
+            limits_text += f", длительность до {format_duration(limits['max_duration'])}"
+        await message.answer(
+            f"📸 Теперь отправьте {media_type}\n"
+            f"Можно несколько файлов одним альбомом (до 10).\n\n"
+            f"{limits_text}",
+            reply_markup=get_cancel_keyboard()
+        )
+        await state.set_state(ContentSubmission.waiting_for_media)
+    else:
+        # Для текста сразу показываем превью
+        await show_preview(message, state)
+
+async def show_preview(message: types.Message, state: FSMContext):
+    """Показ превью перед отправкой"""
+    data = await state.get_data()
+    
+    content_type = data.get('content_type', 'photo')
+    user_info = data.get('user_info', '')
+    caption = data.get('caption', '')
+    
+    content_emoji = CONTENT_EMOJI.get(content_type, '📄')
+    
+    preview_text = (
+        f"{content_emoji} <b>Превью отправки:</b>\n\n"
+        f"👤 <b>О вас:</b>\n{user_info}\n\n"
+        f"📝 <b>Описание:</b>\n{caption}\n\n"
+        f"✅ Все верно? Отправляем на модерацию?"
+    )
+    
+    album = data.get('album')
+    if album:
+        # Альбом - одной группой с превью в подписи первого файла, кнопки - отдельным
+        # сообщением: к media group клавиатуру не прикрепить
+        await message.answer_media_group([
+            (InputMediaPhoto if media_type == 'photo' else InputMediaVideo)(
+                media=file_id, caption=preview_text if position == 0 else None, parse_mode="HTML"
+            )
+            for position, (media_type, file_id) in enumerate(album)
+        ])
+        await message.answer(f"🖼 Файлов в альбоме: {len(album)}. Все верно? Отправляем на модерацию?",
+                             reply_markup=get_confirmation_keyboard())
+    # Если есть фото, показываем его
+    elif content_type == 'photo' and 'file_id' in data:
+        await message.answer_photo(
+            photo=data['file_id'],
+            caption=preview_text,
+            parse_mode="HTML",
+            reply_markup=get_confirmation_keyboard()
+        )
+    elif content_type == 'video' and 'file_id' in data:
+        await message.answer_video(
+            video=data['file_id'],
+            caption=preview_text,
+            parse_mode="HTML",
+            reply_markup=get_confirmation_keyboard()
+        )
+    else:
+        await message.answer(
+            preview_text,
+            parse_mode="HTML",
+            reply_markup=get_confirmation_keyboard()
+        )
+    
+    await state.set_state(ContentSubmission.waiting_for_confirmation)
+
+async def process_album(message: types.Message, state: FSMContext, album):
+    """Альбом из фото и видео: проверка лимитов каждого файла и одно превью на весь альбом"""
+    items, errors = [], []
+    for number, part in enumerate(album, start=1):
+        if part.photo:
+            media_type, file_id = 'photo', part.photo[-1].file_id
+            error = check_media_limits('photo', part.photo[-1].file_size)
+        elif part.video:
+            media_type, file_id = 'video', part.video.file_id
+            error = check_media_limits('video', part.video.file_size, part.video.duration)
+        else:
+            # Документы и аудио в альбоме не принимаем
+            continue
+        if error:
+            errors.append(f"Файл {number}: {error}")
+        items.append([media_type, file_id])
+    
+    if errors or not items:
+        text = "\n".join(errors) if errors else "❌ В альбоме нет фото или видео."
+        await message.answer(f"{text}\n\nОтправьте альбом без этих файлов или отмените отправку.",
+                             reply_markup=get_cancel_keyboard())
+        return
+    
+    # Тип отправки - по первому файлу (обложке)
+    await state.update_data(content_type=items[0][0], file_id=items[0][1], album=items)
+    await show_preview(message, state)
+
+@router.message(ContentSubmission.waiting_for_media, F.photo)
+async def process_photo(message: types.Message, state: FSMContext, album=None):
+    """Обработка фото"""
+    if album:
+        await process_album(message, state, album)
+        return
+    
+    photo = message.photo[-1]
+    
+    # Размер известен из метаданных: слишком большой файл не пересылаем и не скачиваем
+    error = check_media_limits('photo', photo.file_size)
+    if error:
+        await message.answer(f"{error}\n\nОтправьте другое фото или отмените отправку.",
+                             reply_markup=get_cancel_keyboard())
+        return
+    
+    await state.update_data(file_id=photo.file_id, album=None)
+    await show_preview(message, state)
+
+@router.message(ContentSubmission.waiting_for_media, F.video)
+async def process_video(message: types.Message, state: FSMContext, album=None):
+    """Обработка видео"""
+    if album:
+        await process_album(message, state, album)
+        return
+    
+    video = message.video
+    
+    error = check_media_limits('video', video.file_size, video.duration)
+    if error:
+        await message.answer(f"{error}\n\nОтправьте другое видео или отмените отправку.",
+                             reply_markup=get_cancel_keyboard())
+        return
+    
+    await state.update_data(file_id=video.file_id, album=None)
+    await show_preview(message, state)
+
+@router.message(ContentSubmission.waiting_for_media)
+async def process_no_media(message: types.Message):
+    """Если медиа не прикреплено"""
+    await message.answer(
+        "❌ Вы выбрали отправку фото/видео, но не прикрепили файл.\n\n"
+        "Пожалуйста, отправьте файл или отмените отправку.",
+        reply_markup=get_cancel_keyboard()
+    )
+
+@router.message(ContentSubmission.waiting_for_confirmation, Button("✅ Да, отправить"))
+async def confirm_submission(message: types.Message, state: FSMContext,
+                             outbox: OutboxWorker, downloader: MediaDownloader, admins: AdminRegistry):
+    """Подтверждение отправки"""
+    data = await state.get_data()
+    
+    album = data.get('album') or ()
+    if album:
+        what = f"альбом (фото и видео: {len(album)})"
+    else:
+        what = CONTENT_TYPE_RU.get(data['content_type'], 'контент')
+    
+    # Отправка (с файлами альбома) и уведомления админам сохраняются одной
+    # транзакцией, доставкой занимаются воркеры outbox - пользователю отвечаем сразу
+    submission = await repository.create_submission(
+        telegram_id=message.from_user.id,
+        user_info=data['user_info'],
+        content_type=data['content_type'],
+        caption=data.get('caption', ''),
+        file_id=data.get('file_id'),
+        album=[tuple(item) for item in album],
+        notify_chat_ids=await admins.current(),
+        notify_text=lambda submission: (
+            f"🆕 Новый {what} от сотрудника:\n"
+            f"👤 {data['user_info']}\n"
+            f"📋 ID: {submission.id}"
+        )
+    )
+    outbox.wake()
+    
+    # Файлы скачиваются в фоне; альбом - одной задачей, параллельно
+    if album:
+        downloader.enqueue_album(submission.id, [
+            (position, file_id, media_type) for position, (media_type, file_id) in enumerate(album)
+        ])
+    elif submission.file_id:
+        downloader.enqueue(submission.id, submission.file_id, submission.content_type)
+    
+    await message.answer(
+        "✅ Отправлено на модерацию! Мы уведомим вас о результате.",
+        reply_markup=get_main_menu()
+    )
+    await state.clear()
+
+@router.message(ContentSubmission.waiting_for_confirmation, Button("❌ Нет, отменить"))
+async def cancel_confirmation(message: types.Message, state: FSMContext):
+    """Отмена на этапе подтверждения"""
+    await state.clear()
+    await message.answer(
+        "❌ Отправка отменена.",
+        reply_markup=get_main_menu()
+    )
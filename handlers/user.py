@@ -0,0 +1,69 @@
+# handlers/user.py - /start и кнопки главного меню, доступные всем сотрудникам
+#
+# Роутер стоит первым: кнопки меню и отмена срабатывают в любом состоянии формы,
+# а не попадают в ее поля как текст.
+from aiogram import Router, types
+from aiogram.filters import CommandStart
+from aiogram.fsm.context import FSMContext
+
+import repository
+from admins import AdminRegistry
+from keyboards import Button, get_main_menu
+from rendering import RenderCache, my_submissions_key, my_submissions_text
+
+router = Router(name="user")
+
+@router.message(CommandStart())
+async def cmd_start(message: types.Message, admins: AdminRegistry):
+    """Старт бота"""
+    welcome_text = (
+        "👋 Добро пожаловать в проект 'Компания изнутри'!\n\n"
+        "Здесь мы собираем фото, видео и истории от сотрудников.\n"
+        "Выберите тип контента который хотите отправить."
+    )
+    
+    if await admins.check(message.from_user.id):
+        await message.answer(f"{welcome_text}\n\n👨‍💼 Вы администратор", reply_markup=get_main_menu())
+    else:
+        await message.answer(welcome_text, reply_markup=get_main_menu())
+
+@router.message(Button("📊 Мои отправки"))
+async def my_submissions(message: types.Message, render_cache: RenderCache):
+    """Просмотр отправок пользователя"""
+    key = my_submissions_key(message.from_user.id)
+    text = render_cache.get(key)
+    if text is None:
+        generation = render_cache.generation
+        text = my_submissions_text(await repository.list_user_submissions(message.from_user.id, 10))
+        render_cache.set(key, text, generation)
+    
+    await message.answer(text)
+
+@router.message(Button("ℹ️ О проекте"))
+async def about_project(message: types.Message):
+    """Информация о проекте"""
+    await message.answer(
+        "🏢 <b>Проект 'Компания изнутри'</b>\n\n"
+        "Цель проекта — показать реальную работу нашей компании "
+        "через глаза сотрудников.\n\n"
+        "<b>Что можно отправлять:</b>\n"
+        "📸 Фото с рабочих мест\n"
+        "🎥 Короткие видео процессов\n"
+        "📝 Истории и отзывы о работе\n\n"
+        "<b>Как это работает:</b>\n"
+        "1. Выбираете тип контента\n"
+        "2. Рассказываете о себе\n"
+        "3. Добавляете описание\n"
+        "4. Отправляете на модерацию\n\n"
+        "Лучшие материалы будут опубликованы!",
+        parse_mode="HTML"
+    )
+
+@router.message(Button("🚫 Отменить отправку"))
+async def cancel_submission(message: types.Message, state: FSMContext):
+    """Отмена отправки из любого состояния"""
+    await state.clear()
+    await message.answer(
+        "❌ Отправка отменена.",
+        reply_markup=get_main_menu()
+    )
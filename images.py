@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Производные изображения для скачанных фото: миниатюра для модераторов и
+# веб-версии (JPEG и WebP) без EXIF. Декодирование и ресайз - чистая работа CPU,
+# поэтому идут в отдельных процессах, цикл событий только ждет результат.
+#
+# Файлы лежат рядом с photos/ и называются по хешу оригинала:
+#   thumbnails/ab/abcdef...jpg
+#   web/ab/abcdef...jpg, web/ab/abcdef...webp
+# Повторная обработка того же содержимого берет уже готовые файлы.
+#
+# Там же считается перцептивный хеш фото для поиска почти одинаковых (duplicates.py).
+
+def _sha256_of(media_path: str) -> str:
+    return os.path.splitext(os.path.basename(media_path))[0]
+
+def derivative_paths(media_path: str) -> Dict[str, str]:
+    """Абсолютные пути производных для значения Submission.media_path"""
+    sha256 = _sha256_of(media_path)
+    return {
+        'thumbnail': os.path.join(Config.THUMBNAILS_DIR, sha256[:2], f"{sha256}.jpg"),
+        'web_jpeg': os.path.join(Config.WEB_DIR, sha256[:2], f"{sha256}.jpg"),
+        'web_webp': os.path.join(Config.WEB_DIR, sha256[:2], f"{sha256}.webp"),
+    }
+
+def _save(image, path: str, fmt: str, quality: int) -> None:
+    """Атомарная запись: читатель не увидит недописанный файл"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.part"
+    # exif/icc не передаем - метаданные (в т.ч. геопозиция) не сохраняются
+    image.save(tmp_path, fmt, quality=quality, optimize=fmt == 'JPEG')
+    os.replace(tmp_path, path)
+
+def render_derivatives(source: str, paths: Dict[str, str], thumbnail_size: int, web_size: int) -> Dict[str, str]:
+    """Строит производные из оригинала. Выполняется в дочернем процессе"""
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as original:
+        # Поворот по EXIF применяем к пикселям, сам EXIF отбрасываем
+        image = ImageOps.exif_transpose(original)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        web = image.copy()
+        web.thumbnail((web_size, web_size), Image.LANCZOS)
+        _save(web, paths['web_jpeg'], 'JPEG', 85)
+        _save(web, paths['web_webp'], 'WEBP', 80)
+
+        # Миниатюру уменьшаем из веб-версии - так быстрее, чем из оригинала
+        web.thumbnail((thumbnail_size, thumbnail_size), Image.LANCZOS)
+        _save(web, paths['thumbnail'], 'JPEG', 80)
+    return paths
+
+def dhash(source: str, size: int = 8) -> int:
+    """Разностный перцептивный хеш (dHash), size * size бит. Выполняется в дочернем процессе.
+
+    Картинка сводится к серой (size + 1) x size, бит - "пиксель ярче соседа
+    справа". Пересжатие, ресайз и мелкие правки меняют единицы бит из 64.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as original:
+        # JPEG декодируется сразу в уменьшенном масштабе - в разы быстрее полного
+        original.draft('L', ((size + 1) * 8, size * 8))
+        image = ImageOps.exif_transpose(original).convert('L').resize((size + 1, size), Image.LANCZOS)
+    pixels = image.tobytes()
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for column in range(size):
+            value = (value << 1) | (pixels[offset + column] > pixels[offset + column + 1])
+    return value
+
+class ImageProcessor:
+    """Пул процессов для построения миниатюр, веб-версий и перцептивных хешей"""
+
+    def __init__(self, workers: int = 2, thumbnail_size: int = 320, web_size: int = 1280):
+        self.workers = workers
+        self.thumbnail_size = thumbnail_size
+        self.web_size = web_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Процессы поднимаются при первой обработке, а не при импорте
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    @staticmethod
+    def cached(media_path: str) -> Optional[Dict[str, str]]:
+        """Готовые производные или None, если их еще нет"""
+        paths = derivative_paths(media_path)
+        return paths if all(os.path.exists(path) for path in paths.values()) else None
+
+    async def derive(self, media_path: str) -> Dict[str, str]:
+        """Производные для фото (из кеша или построенные в пуле процессов)"""
+        paths = self.cached(media_path)
+        if paths:
+            return paths
+
+        # Одинаковые файлы из разных отправок обрабатываем один раз
+        sha256 = _sha256_of(media_path)
+        future = self._inflight.get(sha256)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self._pool(), render_derivatives,
+                os.path.join(Config.DATA_DIR, media_path), derivative_paths(media_path),
+                self.thumbnail_size, self.web_size
+            )
+            self._inflight[sha256] = future
+            future.add_done_callback(lambda _: self._inflight.pop(sha256, None))
+        return await asyncio.shield(future)
+
+    async def dhash(self, media_path: str) -> int:
+        """Перцептивный хеш фото (см. dhash), считается в пуле процессов"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool(), dhash, os.path.join(Config.DATA_DIR, media_path))
+
+    async def thumbnail(self, media_path: str) -> Optional[str]:
+        """Путь миниатюры; None, если фото не удалось обработать"""
+        try:
+            return (await self.derive(media_path))['thumbnail']
+        except Exception as e:
+            logger.warning(f"Не удалось построить миниатюру для {media_path}: {e}")
+            return None
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
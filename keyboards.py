@@ -1,29 +1,134 @@
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.utils.keyboard import ReplyKeyboardBuilder
+from typing import Tuple
+
+from aiogram.filters import BaseFilter
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
+from pydantic import ConfigDict, field_serializer
+
+class PageCallback(CallbackData, prefix="page"):
+    """Навигация по спискам /pending и /submissions.
+
+    ts и id - ключ (submission_date в микросекундах, id) крайней строки страницы,
+    от которой листаем; backwards - листать к началу списка.
+    """
+    view: str
+    backwards: bool
+    ts: int
+    id: int
+
+class ModerationCallback(CallbackData, prefix="m"):
+    """Кнопка карточки модерации: a - одобрить, r - отклонить, s - пропустить.
+
+    ts и id - ключ (submission_date в микросекундах, id) отправки на карточке:
+    по нему ищется следующая, если заранее загруженной уже нет (после перезапуска).
+    """
+    a: str
+    id: int
+    ts: int
+
+class SearchCallback(CallbackData, prefix="sr"):
+    """Листание результатов /search: offset - первая строка нужной страницы.
+
+    Сам запрос в callback_data не помещается (лимит 64 байта), он берется из
+    текста сообщения с результатами.
+    """
+    offset: int
+
+class Button(BaseFilter):
+    """Нажата кнопка reply-клавиатуры с текстом text.
+
+    То же, что F.text == text, но асинхронно: синхронные фильтры aiogram
+    выполняет в пуле потоков, и каждое сравнение строки стоило переключения потока.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+
+    async def __call__(self, message: Message) -> bool:
+        return message.text == self.text
+
+class FrozenKeyboardButton(KeyboardButton):
+    """KeyboardButton без изменения полей"""
+    model_config = ConfigDict(frozen=True)
+
+class FrozenReplyKeyboard(ReplyKeyboardMarkup):
+    """ReplyKeyboardMarkup, которую нельзя изменить: один объект отдается во все ответы.
+
+    Ряды хранятся кортежами неизменяемых кнопок, поэтому закрыта не только
+    замена полей, но и правка рядов и кнопок на месте.
+    """
+    model_config = ConfigDict(frozen=True)
+    keyboard: Tuple[Tuple[FrozenKeyboardButton, ...], ...]
+
+    @field_serializer('keyboard')
+    def _rows_as_lists(self, keyboard):
+        # Сессия aiogram убирает пустые поля кнопок только внутри списков, не кортежей
+        return [[button.model_dump() for button in row] for row in keyboard]
+
+# Постоянные клавиатуры строятся один раз при импорте, а не на каждый ответ
+
+MAIN_MENU = FrozenReplyKeyboard(
+    keyboard=[
+        [FrozenKeyboardButton(text="📸 Отправить фото")],
+        [FrozenKeyboardButton(text="🎥 Отправить видео")],
+        [FrozenKeyboardButton(text="📝 Отправить текст")],
+        [FrozenKeyboardButton(text="📊 Мои отправки")],
+        [FrozenKeyboardButton(text="ℹ️ О проекте")]
+    ],
+    resize_keyboard=True
+)
+
+CONFIRMATION_KEYBOARD = FrozenReplyKeyboard(
+    keyboard=[
+        [FrozenKeyboardButton(text="✅ Да, отправить"), FrozenKeyboardButton(text="❌ Нет, отменить")]
+    ],
+    resize_keyboard=True,
+    one_time_keyboard=True
+)
+
+CANCEL_KEYBOARD = FrozenReplyKeyboard(
+    keyboard=[[FrozenKeyboardButton(text="🚫 Отменить отправку")]],
+    resize_keyboard=True
+)
 
 def get_main_menu():
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="📸 Отправить фото")],
-            [KeyboardButton(text="🎥 Отправить видео")],
-            [KeyboardButton(text="📝 Отправить текст")],
-            [KeyboardButton(text="📊 Мои отправки")],
-            [KeyboardButton(text="ℹ️ О проекте")]
-        ],
-        resize_keyboard=True
-    )
+    return MAIN_MENU
 
 def get_confirmation_keyboard():
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="✅ Да, отправить"), KeyboardButton(text="❌ Нет, отменить")]
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True
-    )
+    return CONFIRMATION_KEYBOARD
 
 def get_cancel_keyboard():
-    return ReplyKeyboardMarkup(
-        keyboard=[[KeyboardButton(text="🚫 Отменить отправку")]],
-        resize_keyboard=True
-    )
\ No newline at end of file
+    return CANCEL_KEYBOARD
+
+def get_pagination_keyboard(view, prev_cursor=None, next_cursor=None):
+    """Кнопки "назад/вперед" для списка или None, если листать некуда.
+
+    prev_cursor/next_cursor - ключи (ts, id) первой и последней строки страницы.
+    """
+    builder = InlineKeyboardBuilder()
+    if prev_cursor:
+        ts, item_id = prev_cursor
+        builder.button(text="⬅️ Назад", callback_data=PageCallback(view=view, backwards=True, ts=ts, id=item_id))
+    if next_cursor:
+        ts, item_id = next_cursor
+        builder.button(text="Вперед ➡️", callback_data=PageCallback(view=view, backwards=False, ts=ts, id=item_id))
+    return builder.as_markup() if prev_cursor or next_cursor else None
+
+def get_search_keyboard(offset, limit, has_prev, has_next):
+    """Навигация по страницам результатов поиска"""
+    builder = InlineKeyboardBuilder()
+    if has_prev:
+        builder.button(text="⬅️ Назад", callback_data=SearchCallback(offset=max(0, offset - limit)))
+    if has_next:
+        builder.button(text="Вперед ➡️", callback_data=SearchCallback(offset=offset + limit))
+    return builder.as_markup() if has_prev or has_next else None
+
+def get_moderation_keyboard(submission_id, ts):
+    """Кнопки карточки модерации"""
+    builder = InlineKeyboardBuilder()
+    builder.button(text="✅ Одобрить", callback_data=ModerationCallback(a="a", id=submission_id, ts=ts))
+    builder.button(text="❌ Отклонить", callback_data=ModerationCallback(a="r", id=submission_id, ts=ts))
+    builder.button(text="⏭ Пропустить", callback_data=ModerationCallback(a="s", id=submission_id, ts=ts))
+    builder.adjust(2, 1)
+    return builder.as_markup()
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import time
+from typing import NamedTuple, Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Фоновое обслуживание SQLite в режиме WAL.
+#
+# Коммиты дописываются в файл database.db-wal, а в основной файл страницы
+# переносит checkpoint. Сам SQLite делает его внутри коммита, на котором WAL
+# перерос wal_autocheckpoint страниц, - этот коммит и ждет. Здесь checkpoint
+# выполняется заранее по таймеру в режиме PASSIVE: он не ждет читателей и
+# писателей и ничего не блокирует, а что не успел - перенесет в следующий раз.
+#
+# Раз в optimize_interval выполняется PRAGMA optimize - обновление статистики
+# планировщика (sqlite_stat1) для таблиц, по которым она устарела.
+# При остановке - checkpoint(TRUNCATE) и optimize, файл WAL обнуляется.
+#
+# PostgreSQL checkpoint и статистику (autovacuum) ведет сам - там start/stop ничего не делают.
+
+class Checkpoint(NamedTuple):
+    """Результат PRAGMA wal_checkpoint"""
+    busy: int  # 1 - не удалось получить блокировку (только для FULL/RESTART/TRUNCATE)
+    log: int  # страниц в WAL
+    checkpointed: int  # из них перенесено в основной файл
+
+class DatabaseMaintenance:
+    """Периодический checkpoint WAL и PRAGMA optimize для асинхронного движка"""
+
+    def __init__(self, engine: AsyncEngine, checkpoint_interval: float = 60, optimize_interval: float = 3600):
+        self.engine = engine
+        self.checkpoint_interval = checkpoint_interval
+        self.optimize_interval = optimize_interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def checkpoint(self, mode: str = 'PASSIVE') -> Checkpoint:
+        async with self.engine.connect() as connection:
+            result = await connection.exec_driver_sql(f"PRAGMA wal_checkpoint({mode})")
+            return Checkpoint(*result.one())
+
+    async def optimize(self) -> None:
+        async with self.engine.connect() as connection:
+            await connection.exec_driver_sql("PRAGMA optimize")
+
+    async def _run(self) -> None:
+        optimized_at = time.monotonic()
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            try:
+                result = await self.checkpoint()
+                if result.log > result.checkpointed:
+                    logger.debug(f"Checkpoint WAL: перенесено {result.checkpointed} из {result.log} страниц")
+                if time.monotonic() - optimized_at >= self.optimize_interval:
+                    await self.optimize()
+                    optimized_at = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка обслуживания базы")
+
+    @property
+    def enabled(self) -> bool:
+        return self.engine.dialect.name == 'sqlite'
+
+    async def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает таймер; последний checkpoint переносит весь WAL и обрезает файл"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if not self.enabled:
+            return
+        try:
+            # optimize может записать статистику (sqlite_stat1) - до checkpoint, чтобы WAL остался пустым
+            await self.optimize()
+            await self.checkpoint('TRUNCATE')
+        except Exception:
+            logger.exception("Ошибка обслуживания базы при остановке")
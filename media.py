@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+
+import repository
+from config import Config
+from duplicates import DuplicateDetector
+from images import ImageProcessor
+
+logger = logging.getLogger(__name__)
+
+# Скачивание фото/видео отправок на диск.
+#
+# Файл читается из Telegram потоком блоками MEDIA_CHUNK_SIZE и сразу пишется во
+# временный файл, параллельно считается SHA-256 - целиком в памяти он не
+# держится. Итоговый путь зависит только от содержимого:
+#   photos/ab/abcdef...jpg
+# поэтому одинаковые файлы хранятся один раз. В Submission.media_path пишется
+# путь относительно Config.DATA_DIR.
+
+_MEDIA_DIRS = {'photo': Config.PHOTOS_DIR, 'video': Config.VIDEOS_DIR}
+_DEFAULT_EXTENSIONS = {'photo': '.jpg', 'video': '.mp4'}
+
+class MediaTooLarge(Exception):
+    """Файл больше лимита Config.MEDIA_LIMITS или Bot API - скачивать его нет смысла"""
+
+def _is_file_too_big(error: TelegramBadRequest) -> bool:
+    """getFile отказывает в файлах больше 20 МБ - повтор этого не изменит"""
+    return "file is too big" in error.message.lower()
+
+def content_path(content_type: str, sha256: str, extension: str) -> str:
+    """Абсолютный путь файла по хешу содержимого"""
+    return os.path.join(_MEDIA_DIRS[content_type], sha256[:2], f"{sha256}{extension}")
+
+def media_abspath(media_path: str) -> str:
+    """Абсолютный путь для значения Submission.media_path"""
+    return os.path.join(Config.DATA_DIR, media_path)
+
+class MediaDownloader:
+    """Ограниченный пул фоновых загрузок медиа"""
+
+    def __init__(self, bot: Bot, workers: int = 2, queue_size: int = 1000,
+                 chunk_size: int = 256 * 1024, max_attempts: int = 3,
+                 processor: Optional[ImageProcessor] = None,
+                 duplicates: Optional[DuplicateDetector] = None):
+        self.bot = bot
+        self.processor = processor
+        self.duplicates = duplicates
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_attempts = max_attempts
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks: List[asyncio.Task] = []
+
+    def enqueue(self, submission_id: int, file_id: str, content_type: str) -> bool:
+        """Ставит загрузку в очередь без ожидания.
+
+        Если очередь переполнена, файл скачается при следующем запуске
+        (media_path останется пустым, см. start()).
+        """
+        return self._put(submission_id, self.process, (submission_id, file_id, content_type))
+
+    def enqueue_album(self, submission_id: int, items: List[Tuple[int, str, str]]) -> bool:
+        """Ставит в очередь альбом: [(позиция, file_id, тип), ...] - одна задача на все файлы"""
+        return self._put(submission_id, self.process_album, (submission_id, items))
+
+    def _put(self, submission_id: int, job, args: tuple) -> bool:
+        try:
+            self._queue.put_nowait((job, args))
+            return True
+        except asyncio.QueueFull:
+            logger.warning(f"Очередь загрузок переполнена, отправка #{submission_id} отложена")
+            return False
+
+    async def download(self, file_id: str, content_type: str) -> str:
+        """Скачивает файл потоком и возвращает путь относительно DATA_DIR"""
+        file = await self.bot.get_file(file_id)
+        max_size = Config.MEDIA_LIMITS[content_type]['max_size']
+        if file.file_size and file.file_size > max_size:
+            raise MediaTooLarge(f"{file.file_size} байт при лимите {max_size}")
+        url = self.bot.session.api.file_url(self.bot.token, file.file_path)
+        extension = os.path.splitext(file.file_path or '')[1].lower() or _DEFAULT_EXTENSIONS[content_type]
+
+        digest = hashlib.sha256()
+        tmp_path = os.path.join(Config.TMP_DIR, f"{uuid.uuid4().hex}.part")
+        try:
+            with open(tmp_path, 'wb') as tmp:
+                size = 0
+                async for chunk in self.bot.session.stream_content(url, chunk_size=self.chunk_size, timeout=120):
+                    # Размер в метаданных мог отсутствовать - прерываем поток, а не качаем до конца
+                    size += len(chunk)
+                    if size > max_size:
+                        raise MediaTooLarge(f"больше {max_size} байт")
+                    digest.update(chunk)
+                    tmp.write(chunk)
+
+            final_path = content_path(content_type, digest.hexdigest(), extension)
+            if os.path.exists(final_path):
+                # Такой файл уже есть - дубликат не храним
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return os.path.relpath(final_path, Config.DATA_DIR)
+
+    async def fetch(self, submission_id: int, file_id: str, content_type: str) -> Optional[str]:
+        """download с повторами; None, если файл не скачался (повторится при следующем запуске).
+
+        MediaTooLarge - файл не скачается никогда, повторять не нужно.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return await self.download(file_id, content_type)
+            except (asyncio.CancelledError, MediaTooLarge):
+                raise
+            except TelegramBadRequest as e:
+                if _is_file_too_big(e):
+                    raise MediaTooLarge(f"Bot API: {e.message}") from e
+                logger.warning(f"Не удалось скачать файл отправки #{submission_id} (попытка {attempt}): {e}")
+                if attempt < self.max_attempts:
+                    await asyncio.sleep(2 ** attempt)
+            except Exception as e:
+                logger.warning(f"Не удалось скачать файл отправки #{submission_id} (попытка {attempt}): {e}")
+                if attempt < self.max_attempts:
+                    await asyncio.sleep(2 ** attempt)
+        logger.error(f"Файл отправки #{submission_id} не скачан, повторим при следующем запуске")
+        return None
+
+    async def process(self, submission_id: int, file_id: str, content_type: str) -> Optional[str]:
+        """Скачивает файл отправки с повторами и записывает media_path"""
+        try:
+            media_path = await self.fetch(submission_id, file_id, content_type)
+        except MediaTooLarge as e:
+            logger.error(f"Файл отправки #{submission_id} превышает лимит и не скачивается: {e}")
+            await repository.set_media_error(submission_id, str(e))
+            return None
+        if media_path is None:
+            return None
+        await repository.set_media_path(submission_id, media_path)
+
+        # Миниатюру строим сразу, чтобы модератор получил ее без ожидания
+        if content_type == 'photo' and self.processor is not None:
+            await self.processor.thumbnail(media_path)
+        if self.duplicates is not None:
+            await self.duplicates.check(submission_id, media_path, content_type)
+        return media_path
+
+    async def process_album(self, submission_id: int, items: List[Tuple[int, str, str]]) -> Dict[int, str]:
+        """Скачивает файлы альбома параллельно и записывает пути одной транзакцией.
+
+        Возвращает {позиция: media_path} скачанных; остальные повторятся при следующем запуске.
+        """
+        results = await asyncio.gather(*(self.fetch(submission_id, file_id, content_type)
+                                         for _, file_id, content_type in items), return_exceptions=True)
+        errors = {position: str(result) for (position, _, _), result in zip(items, results)
+                  if isinstance(result, MediaTooLarge)}
+        if errors:
+            logger.error(f"Файлы альбома #{submission_id} превышают лимит и не скачиваются: {sorted(errors)}")
+            await repository.set_album_media_errors(submission_id, errors)
+        for result in results:
+            if isinstance(result, BaseException) and not isinstance(result, MediaTooLarge):
+                raise result
+        done = {position: path for (position, _, _), path in zip(items, results) if path}
+        if not done:
+            return done
+        await repository.set_album_media_paths(submission_id, done)
+
+        content_types = {position: content_type for position, _, content_type in items}
+        if self.processor is not None:
+            await asyncio.gather(*(self.processor.thumbnail(path) for position, path in done.items()
+                                   if content_types[position] == 'photo'))
+        # Дубликаты ищем по обложке: она же показывается в карточке и списках
+        if 0 in done and self.duplicates is not None:
+            await self.duplicates.check(submission_id, done[0], content_types[0])
+        return done
+
+    async def _run(self) -> None:
+        while True:
+            job, args = await self._queue.get()
+            try:
+                await job(*args)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Воркер не должен умирать из-за одной загрузки: файл без media_path
+                # повторится при следующем запуске
+                logger.exception(f"Ошибка загрузки медиа отправки #{args[0]}")
+            finally:
+                self._queue.task_done()
+
+    async def start(self) -> None:
+        """Запускает воркеры и дозагружает файлы, не скачанные до перезапуска"""
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+        missing: List[Tuple[int, str, str]] = await repository.list_missing_media(self._queue.maxsize)
+        for submission_id, file_id, content_type in missing:
+            self.enqueue(submission_id, file_id, content_type)
+        albums = await repository.list_missing_album_media(self._queue.maxsize)
+        for submission_id, items in albums.items():
+            self.enqueue_album(submission_id, items)
+        if missing or albums:
+            logger.info(f"Дозагрузка медиа после перезапуска: {len(missing)} файлов, {len(albums)} альбомов")
+
+    async def stop(self) -> None:
+        """Останавливает воркеры; незавершенные загрузки повторятся при следующем запуске"""
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,279 @@
+import bisect
+import contextvars
+import logging
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiohttp import web
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Метрики производительности: сколько времени уходит на хендлер целиком и
+# сколько из него - на запросы к базе, вызовы Bot API и FSM-хранилище.
+#
+# На время обработки апдейта в contextvar кладется UpdateStats; хуки SQLAlchemy,
+# middleware сессии бота и обертка хранилища добавляют в него свое время. После
+# хендлера все попадает в гистограммы (текст Prometheus на METRICS_PORT) и в
+# скользящее окно для команды /perf.
+
+# Границы корзин в секундах: от долей миллисекунды до долгих запросов
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+class Histogram:
+    """Гистограмма Prometheus с метками (без внешних зависимостей)"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # метки -> [счетчики по корзинам..., +Inf], сумма
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = defaultdict(float)
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, counts in sorted(self._counts.items()):
+            label_text = ",".join(f'{name}="{value}"' for name, value in zip(self.labelnames, labels))
+            prefix = f"{label_text}," if label_text else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            suffix = f"{{{label_text}}}" if label_text else ""
+            lines.append(f"{self.name}_sum{suffix} {self._sums[labels]}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Время обработки апдейта хендлером", ("handler",))
+UPDATE_DB_QUERIES = Histogram("bot_update_db_queries", "Запросов к базе за апдейт", ("handler",), QUERY_BUCKETS)
+UPDATE_DB_SECONDS = Histogram("bot_update_db_seconds", "Время запросов к базе за апдейт", ("handler",))
+UPDATE_API_SECONDS = Histogram("bot_update_api_seconds", "Время вызовов Bot API за апдейт", ("handler",))
+UPDATE_FSM_SECONDS = Histogram("bot_update_fsm_seconds", "Время FSM-хранилища за апдейт", ("handler",))
+API_SECONDS = Histogram("bot_api_request_seconds", "Время вызова Bot API", ("method",))
+FSM_SECONDS = Histogram("bot_fsm_seconds", "Время операции FSM-хранилища", ("operation",))
+DB_SECONDS = Histogram("bot_db_query_seconds", "Время одного запроса к базе (включая фоновые задачи)")
+ALL_METRICS = (HANDLER_SECONDS, UPDATE_DB_QUERIES, UPDATE_DB_SECONDS, UPDATE_API_SECONDS,
+               UPDATE_FSM_SECONDS, API_SECONDS, FSM_SECONDS, DB_SECONDS)
+
+class UpdateStats:
+    """Счетчики одного апдейта"""
+    __slots__ = ('handler', 'db_queries', 'db_time', 'api_calls', 'api_time', 'fsm_time', 'idle_time')
+
+    def __init__(self):
+        self.handler = 'unhandled'
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.api_calls = 0
+        self.api_time = 0.0
+        self.fsm_time = 0.0
+        self.idle_time = 0.0  # намеренное ожидание (сбор альбома), из времени хендлера вычитается
+
+_current: contextvars.ContextVar[Optional[UpdateStats]] = contextvars.ContextVar('update_stats', default=None)
+
+def add_idle_time(seconds: float) -> None:
+    """Отмечает ожидание внутри обработки апдейта, которое не должно считаться временем хендлера"""
+    stats = _current.get()
+    if stats is not None:
+        stats.idle_time += seconds
+
+class PerfWindow:
+    """Последние обработки апдейтов за window секунд - для /perf"""
+
+    def __init__(self, window: float = 900, maxlen: int = 20000):
+        self.window = window
+        self._samples: Deque[Tuple[float, str, float, UpdateStats]] = deque(maxlen=maxlen)
+
+    def add(self, duration: float, stats: UpdateStats) -> None:
+        self._samples.append((time.monotonic(), stats.handler, duration, stats))
+
+    def slowest(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Хендлеры, отсортированные по p95 времени обработки"""
+        border = time.monotonic() - self.window
+        while self._samples and self._samples[0][0] < border:
+            self._samples.popleft()
+
+        grouped: Dict[str, List[Tuple[float, UpdateStats]]] = defaultdict(list)
+        for _, handler, duration, stats in self._samples:
+            grouped[handler].append((duration, stats))
+
+        result = []
+        for handler, samples in grouped.items():
+            durations = sorted(duration for duration, _ in samples)
+            count = len(durations)
+            result.append({
+                'handler': handler,
+                'count': count,
+                'p50': durations[count // 2],
+                'p95': durations[min(count - 1, int(count * 0.95))],
+                'max': durations[-1],
+                'db_queries': sum(s.db_queries for _, s in samples) / count,
+                'db_time': sum(s.db_time for _, s in samples) / count,
+                'api_time': sum(s.api_time for _, s in samples) / count,
+                'fsm_time': sum(s.fsm_time for _, s in samples) / count,
+            })
+        result.sort(key=lambda item: item['p95'], reverse=True)
+        return result[:limit]
+
+perf_window = PerfWindow()
+
+class UpdateTimingMiddleware(BaseMiddleware):
+    """Outer-middleware апдейтов: время обработки и разбивка по базе/API/FSM"""
+
+    async def __call__(self, handler: Callable[..., Awaitable[Any]], event: Any, data: Dict[str, Any]) -> Any:
+        stats = UpdateStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            duration = time.perf_counter() - started - stats.idle_time
+            _current.reset(token)
+            HANDLER_SECONDS.observe(duration, stats.handler)
+            UPDATE_DB_QUERIES.observe(stats.db_queries, stats.handler)
+            UPDATE_DB_SECONDS.observe(stats.db_time, stats.handler)
+            UPDATE_API_SECONDS.observe(stats.api_time, stats.handler)
+            UPDATE_FSM_SECONDS.observe(stats.fsm_time, stats.handler)
+            perf_window.add(duration, stats)
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """Inner-middleware: имя выбранного хендлера (во внешнем middleware оно еще неизвестно)"""
+
+    async def __call__(self, handler: Callable[..., Awaitable[Any]], event: Any, data: Dict[str, Any]) -> Any:
+        stats = _current.get()
+        if stats is not None:
+            stats.handler = data['handler'].callback.__name__
+        return await handler(event, data)
+
+class ApiTimingMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: время каждого вызова Bot API"""
+
+    async def __call__(self, make_request, bot: Bot, method):
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            elapsed = time.perf_counter() - started
+            API_SECONDS.observe(elapsed, type(method).__name__)
+            stats = _current.get()
+            if stats is not None:
+                stats.api_calls += 1
+                stats.api_time += elapsed
+
+class InstrumentedStorage(BaseStorage):
+    """Обертка FSM-хранилища, считающая время его операций"""
+
+    def __init__(self, storage: BaseStorage):
+        self.storage = storage
+
+    async def _timed(self, operation: str, awaitable):
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            elapsed = time.perf_counter() - started
+            FSM_SECONDS.observe(elapsed, operation)
+            # Чтение состояния в FSMContextMiddleware идет раньше UpdateTimingMiddleware
+            # и попадает только в bot_fsm_seconds
+            stats = _current.get()
+            if stats is not None:
+                stats.fsm_time += elapsed
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._timed('set_state', self.storage.set_state(key, state))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self._timed('get_state', self.storage.get_state(key))
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._timed('set_data', self.storage.set_data(key, data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return await self._timed('get_data', self.storage.get_data(key))
+
+    async def close(self) -> None:
+        await self.storage.close()
+
+def instrument_engine(engine: Engine) -> None:
+    """Хуки SQLAlchemy: число и время запросов.
+
+    Для асинхронного движка передается async_engine.sync_engine; contextvar
+    виден внутри, т.к. SQLAlchemy выполняет запрос в контексте вызывающей задачи.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        DB_SECONDS.observe(elapsed)
+        stats = _current.get()
+        if stats is not None:
+            stats.db_queries += 1
+            stats.db_time += elapsed
+
+def render_metrics() -> str:
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+def setup_metrics(dp: Dispatcher, bot: Bot, engine: Engine, perf_window_seconds: float = 900) -> None:
+    """Подключает все измерения к диспетчеру, боту и движку базы"""
+    perf_window.window = perf_window_seconds
+    dp.update.outer_middleware(UpdateTimingMiddleware())
+    dp.message.middleware(HandlerNameMiddleware())
+    dp.callback_query.middleware(HandlerNameMiddleware())
+    bot.session.middleware(ApiTimingMiddleware())
+    dp.fsm.storage = InstrumentedStorage(dp.fsm.storage)
+    instrument_engine(engine)
+
+class MetricsServer:
+    """HTTP-эндпоинт /metrics в формате Prometheus"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9090):
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8")
+
+    async def start(self) -> None:
+        if not self.port or self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, self.host, self.port).start()
+        except OSError as e:
+            # Занятый порт не должен мешать работе бота
+            logger.error(f"Не удалось открыть порт метрик {self.host}:{self.port}: {e}")
+            await self._runner.cleanup()
+            self._runner = None
+            return
+        logger.info(f"Метрики: http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,270 @@
+# migrations.py - схема базы (SQLite или PostgreSQL) и ее миграции
+#
+# upgrade() вызывается при запуске бота. Пустая база получает все таблицы в
+# текущем виде (Base.metadata), затем выполняются миграции: в существующей базе
+# они добавляют колонки, таблицы, индексы и данные для них, в новой - только то,
+# чего нет в моделях (поисковый индекс, счетчики). Примененные версии
+# записываются в таблицу schema_migrations, поэтому каждая миграция выполняется
+# один раз; все миграции можно безопасно повторить на уже обновленной схеме.
+# Различия диалектов - внутри миграций (connection.dialect.name).
+#
+# Ручной запуск: python migrations.py
+# Пересборка поискового индекса: python migrations.py --rebuild-search
+import sys
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import make_url
+
+from authors import parse_user_info
+from database import SEARCH_VECTOR_PG, Base, OutboxMessage, Admin, SubmissionCounter, SubmissionMedia
+
+
+def rebuild_counters(connection):
+    """Пересчитывает таблицу submission_counters по таблице submissions"""
+    connection.execute(text("DELETE FROM submission_counters"))
+    connection.execute(text(
+        "INSERT INTO submission_counters (name, value) "
+        "SELECT 'total', COUNT(*) FROM submissions"
+    ))
+    connection.execute(text(
+        "INSERT INTO submission_counters (name, value) "
+        "SELECT 'status:' || COALESCE(status, 'pending'), COUNT(*) FROM submissions "
+        "GROUP BY COALESCE(status, 'pending')"
+    ))
+    connection.execute(text(
+        "INSERT INTO submission_counters (name, value) "
+        "SELECT 'type:' || content_type, COUNT(*) FROM submissions GROUP BY content_type"
+    ))
+    connection.execute(text(
+        "INSERT INTO submission_counters (name, value) "
+        "SELECT 'day:' || date(submission_date), COUNT(*) FROM submissions "
+        "WHERE submission_date IS NOT NULL GROUP BY date(submission_date)"
+    ))
+
+
+def _indexes_and_counters(connection):
+    SubmissionCounter.__table__.create(connection, checkfirst=True)
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_submissions_status_date "
+        "ON submissions (status, submission_date)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_submissions_user_date "
+        "ON submissions (telegram_id, submission_date)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_submissions_date ON submissions (submission_date)"
+    ))
+    rebuild_counters(connection)
+
+
+def _add_column(connection, table, column, ddl):
+    """ALTER TABLE ADD COLUMN, если колонки еще нет (create_all мог создать ее сам)"""
+    columns = {column['name'] for column in inspect(connection).get_columns(table)}
+    if column not in columns:
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _submission_file_id(connection):
+    _add_column(connection, "submissions", "file_id", "VARCHAR(200)")
+
+
+def rebuild_search_index(connection):
+    """Заново строит поисковый индекс (submissions_fts в SQLite, ix_submissions_search в PostgreSQL)"""
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text("REINDEX INDEX ix_submissions_search"))
+        return
+    connection.execute(text("INSERT INTO submissions_fts (submissions_fts) VALUES ('rebuild')"))
+
+
+def _search_index(connection):
+    if connection.dialect.name == 'postgresql':
+        # tsvector по тем же полям; индекс обновляется вместе с таблицей, триггеры не нужны
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_submissions_search ON submissions USING gin ({SEARCH_VECTOR_PG})"
+        ))
+        return
+    # External content: FTS5 хранит только индекс, тексты читаются из submissions.
+    # Триггеры держат индекс в синхронизации с любой записью в таблицу, включая
+    # скрипты в обход repository.py
+    connection.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS submissions_fts USING fts5("
+        "user_info, caption, content='submissions', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')"
+    ))
+    connection.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS submissions_fts_insert AFTER INSERT ON submissions BEGIN "
+        "INSERT INTO submissions_fts (rowid, user_info, caption) "
+        "VALUES (new.id, new.user_info, new.caption); "
+        "END"
+    ))
+    connection.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS submissions_fts_delete AFTER DELETE ON submissions BEGIN "
+        "INSERT INTO submissions_fts (submissions_fts, rowid, user_info, caption) "
+        "VALUES ('delete', old.id, old.user_info, old.caption); "
+        "END"
+    ))
+    # Смена статуса тексты не трогает, поэтому триггер только на эти колонки
+    connection.execute(text(
+        "CREATE TRIGGER IF NOT EXISTS submissions_fts_update "
+        "AFTER UPDATE OF user_info, caption ON submissions BEGIN "
+        "INSERT INTO submissions_fts (submissions_fts, rowid, user_info, caption) "
+        "VALUES ('delete', old.id, old.user_info, old.caption); "
+        "INSERT INTO submissions_fts (rowid, user_info, caption) "
+        "VALUES (new.id, new.user_info, new.caption); "
+        "END"
+    ))
+    # bm25 по умолчанию для ORDER BY rank: совпадение в данных автора весит вдвое больше описания
+    connection.execute(text(
+        "INSERT INTO submissions_fts (submissions_fts, rank) VALUES ('rank', 'bm25(2.0, 1.0)')"
+    ))
+    rebuild_search_index(connection)
+
+
+AUTHOR_COLUMNS = [
+    ("fleet", "VARCHAR(20)"),
+    ("base", "VARCHAR(100)"),
+    ("period", "VARCHAR(7)"),
+    ("role", "VARCHAR(200)"),
+    ("author_name", "VARCHAR(200)"),
+]
+
+
+def backfill_authors(connection, batch_size=10000):
+    """Разбирает user_info всех строк в колонки автора. Возвращает число строк"""
+    done = 0
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            text("SELECT id, user_info FROM submissions WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": batch_size}
+        ).all()
+        if not rows:
+            return done
+        # executemany одним UPDATE на пачку вместо запроса на строку
+        connection.execute(
+            text("UPDATE submissions SET fleet = :fleet, base = :base, period = :period, "
+                 "role = :role, author_name = :name WHERE id = :id"),
+            [{"id": row_id, **parse_user_info(user_info or "")._asdict()} for row_id, user_info in rows]
+        )
+        done += len(rows)
+        last_id = rows[-1][0]
+
+
+def _author_columns(connection):
+    for column, ddl in AUTHOR_COLUMNS:
+        _add_column(connection, "submissions", column, ddl)
+    backfill_authors(connection)
+    # Индексы - после заполнения: так они строятся один раз, а не обновляются на каждой строке
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_submissions_base_date ON submissions (base, submission_date)"
+    ))
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_submissions_fleet_date ON submissions (fleet, submission_date)"
+    ))
+
+
+def _duplicates(connection):
+    _add_column(connection, "submissions", "duplicate_of", "INTEGER")
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_submissions_media_path ON submissions (media_path)"
+    ))
+
+
+def _albums(connection):
+    _add_column(connection, "submissions", "media_count", "INTEGER")
+    SubmissionMedia.__table__.create(connection, checkfirst=True)
+
+
+def _outbox_and_admins(connection):
+    # До upgrade() эти таблицы создавал create_all при импорте database.py
+    OutboxMessage.__table__.create(connection, checkfirst=True)
+    Admin.__table__.create(connection, checkfirst=True)
+
+
+def _media_errors(connection):
+    _add_column(connection, "submissions", "media_error", "TEXT")
+    _add_column(connection, "submission_media", "media_error", "TEXT")
+
+
+def _period_index(connection):
+    # Отчет "по БПО и месяцам" (repository.base_month_stats): диапазон по period,
+    # группировка по (period, base) в порядке индекса, без чтения строк таблицы
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_submissions_period_base ON submissions (period, base)"
+    ))
+
+
+def _telegram_ids_bigint(connection):
+    # ID пользователей и чатов Telegram не помещаются в INTEGER PostgreSQL (32 бита).
+    # В SQLite INTEGER и так 64-битный - менять нечего
+    if connection.dialect.name != 'postgresql':
+        return
+    for table, column in (("submissions", "telegram_id"), ("outbox", "chat_id"), ("admins", "telegram_id")):
+        connection.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE BIGINT"))
+
+
+# (версия, описание, функция) - новые миграции добавляются только в конец
+MIGRATIONS = [
+    (1, "индексы submissions и таблица счетчиков", _indexes_and_counters),
+    (2, "file_id в submissions", _submission_file_id),
+    (3, "полнотекстовый индекс submissions_fts", _search_index),
+    (4, "поля автора из user_info (флот, БПО, месяц, должность, ФИО)", _author_columns),
+    (5, "duplicate_of и индекс по media_path (поиск дубликатов)", _duplicates),
+    (6, "media_count в submissions и таблица submission_media (альбомы)", _albums),
+    (7, "таблицы outbox и admins", _outbox_and_admins),
+    (8, "media_error: файлы, которые загрузчик не повторяет", _media_errors),
+    (9, "индекс (period, base) для статистики по БПО и месяцам", _period_index),
+    (10, "BIGINT для ID пользователей и чатов Telegram", _telegram_ids_bigint),
+]
+
+
+def run_migrations(engine):
+    """Применяет все еще не примененные миграции. Возвращает список примененных версий"""
+    applied_now = []
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, description TEXT, applied_at TIMESTAMP)"
+        ))
+        applied = {row[0] for row in connection.execute(text("SELECT version FROM schema_migrations"))}
+
+        for version, description, migrate in MIGRATIONS:
+            if version in applied:
+                continue
+            migrate(connection)
+            connection.execute(
+                text("INSERT INTO schema_migrations (version, description, applied_at) "
+                     "VALUES (:version, :description, :applied_at)"),
+                {"version": version, "description": description, "applied_at": datetime.utcnow()}
+            )
+            applied_now.append(version)
+
+    return applied_now
+
+
+def upgrade(engine):
+    """Создает схему в пустой базе и применяет недостающие миграции. Возвращает примененные версии"""
+    if not inspect(engine).has_table("submissions"):
+        Base.metadata.create_all(engine)
+    return run_migrations(engine)
+
+
+if __name__ == "__main__":
+    from database import DATABASE_URL, engine
+
+    print(f"База данных: {make_url(DATABASE_URL).render_as_string(hide_password=True)}")
+    applied = upgrade(engine)
+    if applied:
+        print(f"🆕 Применены миграции: {', '.join(map(str, applied))}")
+    if "--rebuild-search" in sys.argv[1:]:
+        with engine.begin() as connection:
+            rebuild_search_index(connection)
+        print("🔍 Поисковый индекс пересобран")
+    with engine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT version, description, applied_at FROM schema_migrations ORDER BY version"
+        )).all()
+    for version, description, applied_at in rows:
+        print(f"✅ {version}: {description} ({applied_at})")
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+from typing import Dict, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Отправка уведомлений (админам о новых отправках, пользователям о решении) с
+# соблюдением лимитов Telegram: ~30 сообщений в секунду на бота и ~1 сообщение
+# в секунду в один чат. Очередь, повторы и задержки между ними - в outbox.OutboxWorker.
+
+class NotificationDispatcher:
+    """Одна попытка отправки сообщения с ограничением скорости"""
+
+    def __init__(self, bot: Bot, concurrency: int = 8, global_rate: float = 25,
+                 chat_interval: float = 1.0):
+        self.bot = bot
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._global_interval = 1.0 / global_rate
+        self._chat_interval = chat_interval
+        self._next_global = 0.0
+        self._next_chat: Dict[int, float] = {}
+
+    def next_slot(self, chat_id: int) -> float:
+        """Ближайшее свободное время отправки в чат (часы цикла событий), без брони"""
+        now = asyncio.get_running_loop().time()
+        return max(now, self._next_global, self._next_chat.get(chat_id, 0.0))
+
+    def reserve(self, chat_id: int) -> float:
+        """Бронирует ближайшее время отправки в чат и возвращает его.
+
+        Между чтением и записью слотов нет await, поэтому блокировки не нужны.
+        """
+        now = asyncio.get_running_loop().time()
+        slot = self.next_slot(chat_id)
+        self._next_global = slot + self._global_interval
+        self._next_chat[chat_id] = slot + self._chat_interval
+
+        # Не копим слоты давно отписанных чатов
+        if len(self._next_chat) > 10000:
+            self._next_chat = {cid: t for cid, t in self._next_chat.items() if t > now}
+        return slot
+
+    def _delay_chat(self, chat_id: int, seconds: float) -> None:
+        now = asyncio.get_running_loop().time()
+        self._next_chat[chat_id] = max(self._next_chat.get(chat_id, 0.0), now + seconds)
+
+    async def deliver(self, chat_id: int, text: str, slot: Optional[float] = None, **kwargs) -> None:
+        """Одна попытка отправки с учетом лимитов. Ошибки Telegram пробрасываются.
+
+        slot - время, заранее забронированное через reserve(); без него бронируется ближайшее.
+        """
+        if slot is None:
+            slot = self.reserve(chat_id)
+        await asyncio.sleep(max(0.0, slot - asyncio.get_running_loop().time()))
+        try:
+            async with self._semaphore:
+                await self.bot.send_message(chat_id, text, **kwargs)
+        except TelegramRetryAfter as e:
+            # Флуд-контроль: Telegram сам говорит, сколько ждать
+            logger.warning(f"Флуд-лимит для чата {chat_id}, ждем {e.retry_after} с")
+            self._delay_chat(chat_id, e.retry_after)
+            raise
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from sqlalchemy import bindparam, delete, select, update
+
+from database import get_async_session, OutboxMessage
+from notifications import NotificationDispatcher
+
+logger = logging.getLogger(__name__)
+
+# Доставка уведомлений из таблицы outbox.
+#
+# Хендлеры не ходят в сеть внутри транзакции: они только пишут строку outbox
+# вместе с изменением отправки. Воркеры забирают due-строки пачками, помечая их
+# status='sending' с арендой до next_attempt_at, и отправляют уже без открытой
+# сессии. Если процесс упал после захвата, по истечении аренды строку заберет
+# другой воркер - доставка "хотя бы один раз".
+
+class OutboxWorker:
+    """Пул воркеров, разбирающих outbox"""
+
+    def __init__(self, notifier: NotificationDispatcher, workers: int = 4, batch_size: int = 50,
+                 poll_interval: float = 2.0, max_attempts: int = 8, base_backoff: float = 5.0,
+                 lease: float = 60.0, retention_days: int = 7):
+        self.notifier = notifier
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.lease = lease
+        self.retention_days = retention_days
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    def wake(self) -> None:
+        """Будит воркеры сразу после коммита, не дожидаясь poll_interval"""
+        self._wakeup.set()
+
+    async def claim_batch(self) -> List[Tuple[OutboxMessage, float]]:
+        """Захватывает пачку готовых к отправке строк: [(строка, забронированный слот), ...].
+
+        Захват - одна UPDATE ... RETURNING. Чаты, чьи строки еще в аренде у другого
+        воркера, пропускаются. Каждой строке сразу бронируется время отправки
+        (NotificationDispatcher.reserve), и аренда отсчитывается от него: ожидание
+        слота в чате (~1 сообщение/с) не съедает аренду. Сообщения в чат, которые
+        не успеют уйти за lease секунд, возвращаются в очередь к слоту чата.
+        """
+        now = datetime.utcnow()
+        in_flight = select(OutboxMessage.chat_id).where(
+            OutboxMessage.status == 'sending', OutboxMessage.next_attempt_at > now
+        )
+        due = (
+            select(OutboxMessage.id)
+            .where(OutboxMessage.status.in_(('pending', 'sending')), OutboxMessage.next_attempt_at <= now,
+                   OutboxMessage.chat_id.not_in(in_flight))
+            .order_by(OutboxMessage.id)
+            .limit(self.batch_size)
+            # PostgreSQL: параллельные воркеры не захватывают одни и те же строки
+            # (SQLite сериализует запись сам, там FOR UPDATE не выводится)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        async with get_async_session() as session:
+            claimed = list(await session.scalars(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(due))
+                .values(status='sending', next_attempt_at=now + timedelta(seconds=self.lease))
+                .returning(OutboxMessage)
+                .execution_options(synchronize_session=False)
+            ))
+            # Слоты бронируются в той же транзакции: до коммита строки никто не заберет
+            loop = asyncio.get_running_loop()
+            batch = []
+            for message in claimed:
+                wait = self.notifier.next_slot(message.chat_id) - loop.time()
+                if wait > self.lease:
+                    message.status = 'pending'
+                    message.next_attempt_at = now + timedelta(seconds=wait)
+                    continue
+                slot = self.notifier.reserve(message.chat_id)
+                message.next_attempt_at = now + timedelta(seconds=slot - loop.time() + self.lease)
+                batch.append((message, slot))
+            await session.commit()
+        return batch
+
+    async def _send(self, message: OutboxMessage, slot: float) -> dict:
+        """Отправляет одно сообщение и возвращает изменения для его строки"""
+        # b_lease - аренда этого захвата: итог пишется, только если строку не забрал другой воркер
+        claim = {'b_id': message.id, 'b_lease': message.next_attempt_at}
+        attempts = message.attempts + 1
+        try:
+            await self.notifier.deliver(message.chat_id, message.text, slot=slot)
+            return {**claim, 'status': 'sent', 'attempts': attempts, 'next_attempt_at': datetime.utcnow(),
+                    'last_error': None}
+        except (TelegramForbiddenError, TelegramBadRequest) as e:
+            # Повтор не поможет: бот заблокирован или чат не существует
+            return {**claim, 'status': 'dead', 'attempts': attempts, 'next_attempt_at': datetime.utcnow(),
+                    'last_error': str(e)}
+        except Exception as e:
+            if attempts >= self.max_attempts:
+                logger.error(f"Уведомление #{message.id} в чат {message.chat_id} не доставлено: {e}")
+                return {**claim, 'status': 'dead', 'attempts': attempts, 'next_attempt_at': datetime.utcnow(),
+                        'last_error': str(e)}
+            if isinstance(e, TelegramRetryAfter):
+                delay = e.retry_after
+            else:
+                delay = self.base_backoff * 2 ** (attempts - 1)
+            return {
+                **claim,
+                'status': 'pending',
+                'attempts': attempts,
+                'next_attempt_at': datetime.utcnow() + timedelta(seconds=delay),
+                'last_error': str(e),
+            }
+
+    async def process_batch(self) -> int:
+        """Захватывает и отправляет одну пачку. Возвращает ее размер"""
+        batch = await self.claim_batch()
+        if not batch:
+            return 0
+
+        results = await asyncio.gather(*(self._send(message, slot) for message, slot in batch))
+
+        # Итоги пачки - одной транзакцией; строки, чья аренда истекла и которые
+        # уже забрал другой воркер, не перезаписываются
+        table = OutboxMessage.__table__
+        async with get_async_session() as session:
+            await session.execute(
+                update(table).where(
+                    table.c.id == bindparam('b_id'),
+                    table.c.status == 'sending',
+                    table.c.next_attempt_at == bindparam('b_lease'),
+                ),
+                results
+            )
+            await session.commit()
+        return len(batch)
+
+    async def purge_sent(self) -> None:
+        """Удаляет доставленные уведомления старше retention_days"""
+        border = datetime.utcnow() - timedelta(days=self.retention_days)
+        async with get_async_session() as session:
+            await session.execute(
+                delete(OutboxMessage).where(OutboxMessage.status == 'sent', OutboxMessage.created_at < border)
+            )
+            await session.commit()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                processed = await self.process_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ошибка обработки outbox")
+                processed = 0
+            if processed < self.batch_size and not self._stopping:
+                # Очередь пуста: ждем коммита с уведомлением или следующего опроса
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._stopping = False
+        try:
+            await self.purge_sent()
+        except Exception:
+            logger.exception("Не удалось очистить outbox")
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: Optional[float] = 10) -> None:
+        """Останавливает воркеры; недоставленное останется в outbox до следующего запуска.
+
+        Уже захваченной пачке дается timeout секунд, чтобы дойти и записать итоги.
+        """
+        self._stopping = True
+        self._wakeup.set()
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+        self._tasks = []
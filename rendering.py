@@ -0,0 +1,145 @@
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Callable, Hashable, Iterable, Optional, Tuple
+
+# Тексты отправок для хендлеров: таблицы подписей строятся один раз при импорте
+# (а не заново на каждой строке списка), готовые тексты "Мои отправки" и панели
+# админа кэшируются в RenderCache до изменения данных.
+
+STATUS_EMOJI = MappingProxyType({'pending': '⏳', 'approved': '✅', 'rejected': '❌'})
+CONTENT_EMOJI = MappingProxyType({'photo': '📸', 'video': '🎥', 'text': '📝'})
+STATUS_RU = MappingProxyType({'pending': '⏳ Ожидает', 'approved': '✅ Одобрено', 'rejected': '❌ Отклонено'})
+CONTENT_TYPE_RU = MappingProxyType({'photo': 'фото', 'video': 'видео', 'text': 'текст'})
+
+ADMIN_COMMANDS = (
+    "📋 Команды:\n"
+    "/moderate - модерация карточками с кнопками\n"
+    "/pending - ожидающие модерации\n"
+    "/submissions - все отправки\n"
+    "/view <ID> - просмотр отправки\n"
+    "/search <слова> - поиск по автору и описанию\n"
+    "/approve <ID> - одобрить (можно 10-57,63 или type=text date=2025-06-01)\n"
+    "/reject <ID> - отклонить (так же пакетно)\n"
+    "/stats - статистика\n"
+    "/export - выгрузка в ZIP (csv|jsonl, фильтры как у /approve)\n"
+    "/perf - самые медленные хендлеры"
+)
+
+def author_short(sub) -> str:
+    """Автор для списков: ФИО и БПО, разобранные при создании отправки"""
+    parts = [part for part in (sub.author_name, sub.base and f"БПО {sub.base}") if part]
+    if parts:
+        return ", ".join(parts)
+    # Строка не по шаблону - первая часть как есть
+    return sub.user_info.split(',')[0] if ',' in sub.user_info else sub.user_info[:20]
+
+def submission_line(sub) -> str:
+    """Строка списка: статус, тип, ID, автор и дата"""
+    status_emoji = STATUS_EMOJI.get(sub.status, '❓')
+    content_emoji = CONTENT_EMOJI.get(sub.content_type, '📄')
+    date_str = sub.submission_date.strftime('%d.%m %H:%M')
+    return f"{status_emoji}{content_emoji} #{sub.id} - {author_short(sub)[:40]} ({date_str})\n"
+
+def submission_info(submission) -> str:
+    """Детальная информация об отправке (/view и карточки модерации)"""
+    info = (
+        f"📋 Отправка #{submission.id}\n"
+        f"📅 Дата: {submission.submission_date.strftime('%d.%m.%Y %H:%M')}\n"
+        f"👤 Пользователь: {submission.user_info}\n"
+        f"📄 Тип: {submission.content_type}\n"
+        f"📝 Описание: {submission.caption or 'Нет описания'}\n"
+        f"📊 Статус: {STATUS_RU.get(submission.status, submission.status)}\n"
+        f"🆔 Telegram ID: {submission.telegram_id}"
+    )
+    if submission.media_count:
+        info += f"\n🖼 Альбом, файлов: {submission.media_count}"
+    if submission.duplicate_of:
+        info += f"\n♻️ Возможный дубликат #{submission.duplicate_of}"
+    if submission.admin_comment:
+        info += f"\n💬 Комментарий админа: {submission.admin_comment}"
+    return info
+
+def my_submissions_text(submissions) -> str:
+    """Ответ на "📊 Мои отправки" """
+    if not submissions:
+        return "📭 У вас пока нет отправок."
+    lines = ["📋 Ваши последние отправки:\n\n"]
+    for sub in submissions:
+        status_emoji = STATUS_EMOJI.get(sub.status, '❓')
+        content_emoji = CONTENT_EMOJI.get(sub.content_type, '📄')
+        date_str = sub.submission_date.strftime('%d.%m.%Y')
+        lines.append(f"{status_emoji}{content_emoji} #{sub.id} - {date_str} ({sub.status})\n")
+    return "".join(lines)
+
+def admin_dashboard_text(counts) -> str:
+    """Панель /admin по счетчикам статусов"""
+    return (
+        "👨‍💼 Панель администратора\n\n"
+        f"📊 Статистика:\n"
+        f"• Всего отправок: {sum(counts.values())}\n"
+        f"• ⏳ Ожидают: {counts.get('pending', 0)}\n"
+        f"• ✅ Одобрено: {counts.get('approved', 0)}\n"
+        f"• ❌ Отклонено: {counts.get('rejected', 0)}\n\n"
+        + ADMIN_COMMANDS
+    )
+
+# Ключи кэша: панель админа одна на всех, "Мои отправки" - на пользователя
+ADMIN_DASHBOARD = 'admin'
+
+def my_submissions_key(telegram_id: int) -> Tuple[str, int]:
+    return 'my', telegram_id
+
+class RenderCache:
+    """LRU-кэш готовых текстов со сроком жизни.
+
+    Записи сбрасываются при изменении данных (invalidate из подписки на
+    repository); ttl ограничивает устаревание, если данные поменял другой процесс.
+    generation растет с каждым invalidate: текст, построенный по данным,
+    прочитанным до сброса, в кэш уже не попадет.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._items: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._items.get(key)
+        if item is None or item[0] <= self.clock():
+            if item is not None:
+                del self._items[key]
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """generation - значение self.generation до чтения данных для value"""
+        if generation is not None and generation != self.generation:
+            return
+        self._items[key] = (self.clock() + self.ttl, value)
+        self._items.move_to_end(key)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def invalidate(self, *keys: Hashable) -> None:
+        self.generation += 1
+        for key in keys:
+            self._items.pop(key, None)
+
+    def invalidate_users(self, telegram_ids: Iterable[int]) -> None:
+        """Отправки этих пользователей изменились: их "Мои отправки" и счетчики панели устарели"""
+        self.invalidate(ADMIN_DASHBOARD, *(my_submissions_key(telegram_id) for telegram_id in telegram_ids))
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
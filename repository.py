@@ -0,0 +1,553 @@
+import re
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, func, insert as sql_insert, or_, select, text, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from authors import parse_user_info
+from database import (
+    Admin, get_async_session, OutboxMessage, SEARCH_VECTOR_PG, Submission, SubmissionCounter, SubmissionMedia
+)
+
+# Все обращения хендлеров к таблице submissions идут через этот модуль.
+# Функции открывают собственную асинхронную сессию, поэтому запросы к базе
+# не блокируют event loop. База - SQLite или PostgreSQL (DATABASE_URL); где SQL
+# различается, ветка выбирается по _dialect(session).
+#
+# Агрегаты для /admin и /stats читаются из submission_counters, а не через
+# COUNT(*) по всей таблице. Любая запись в submissions обязана обновлять
+# счетчики в той же сессии через _bump_counters.
+
+# Подписчики на изменения отправок: вызываются после commit со списком
+# telegram_id авторов, чьи отправки создались или сменили статус (сброс кэшей)
+_change_listeners: List[Callable[[Iterable[int]], None]] = []
+
+def subscribe_changes(listener: Callable[[Iterable[int]], None]) -> None:
+    _change_listeners.append(listener)
+
+def _changed(telegram_ids: Iterable[int]) -> None:
+    telegram_ids = set(telegram_ids)
+    for listener in _change_listeners:
+        listener(telegram_ids)
+
+def _dialect(session) -> str:
+    return session.get_bind().dialect.name
+
+# INSERT ... ON CONFLICT у каждого диалекта свой
+_UPSERT = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+def _day_key(date: datetime) -> str:
+    return f"day:{date.strftime('%Y-%m-%d')}"
+
+async def _bump_counters(session, deltas: Dict[str, int]) -> None:
+    """Изменяет счетчики на указанные приращения (в текущей транзакции)"""
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+        stmt = _UPSERT[_dialect(session)](SubmissionCounter).values(name=name, value=delta)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SubmissionCounter.name],
+            set_={'value': SubmissionCounter.value + delta}
+        )
+        await session.execute(stmt)
+
+async def _read_counters(prefix: str) -> Dict[str, int]:
+    async with get_async_session() as session:
+        result = await session.execute(
+            select(SubmissionCounter.name, SubmissionCounter.value)
+            .where(SubmissionCounter.name.startswith(prefix))
+        )
+        return {name[len(prefix):]: value for name, value in result.all()}
+
+async def count_by_status() -> Dict[str, int]:
+    """Количество отправок по статусам"""
+    return await _read_counters('status:')
+
+async def count_total() -> int:
+    """Общее количество отправок"""
+    return (await _read_counters('total')).get('', 0)
+
+async def get_submission(submission_id: int) -> Optional[Submission]:
+    """Отправка по ID"""
+    async with get_async_session() as session:
+        return await session.get(Submission, submission_id)
+
+class Page(NamedTuple):
+    """Страница списка отправок и наличие соседних страниц"""
+    items: List[Submission]
+    has_prev: bool
+    has_next: bool
+
+PAGE_SIZE = 20
+
+async def _keyset_page(stmt, descending: bool, cursor: Optional[Tuple[datetime, int]],
+                       backwards: bool, limit: int) -> Page:
+    """Страница по ключу (submission_date, id) без OFFSET.
+
+    cursor - ключ последней строки текущей страницы (первой, если backwards).
+    Запрос читает не больше limit + 1 строк по индексу, сколько бы их ни было в таблице.
+    """
+    key = tuple_(Submission.submission_date, Submission.id)
+    # При движении назад идем в обратном порядке и разворачиваем результат
+    sql_descending = descending != backwards
+    if cursor:
+        bound = tuple_(*cursor)
+        stmt = stmt.where(key < bound if sql_descending else key > bound)
+    if sql_descending:
+        stmt = stmt.order_by(Submission.submission_date.desc(), Submission.id.desc())
+    else:
+        stmt = stmt.order_by(Submission.submission_date.asc(), Submission.id.asc())
+
+    async with get_async_session() as session:
+        items = list(await session.scalars(stmt.limit(limit + 1)))
+
+    has_more = len(items) > limit
+    items = items[:limit]
+    if backwards:
+        items.reverse()
+        return Page(items, has_prev=has_more, has_next=True)
+    return Page(items, has_prev=cursor is not None, has_next=has_more)
+
+async def page_pending(cursor: Optional[Tuple[datetime, int]] = None, backwards: bool = False,
+                       limit: int = PAGE_SIZE) -> Page:
+    """Страница очереди модерации (от старых к новым)"""
+    stmt = select(Submission).where(Submission.status == 'pending')
+    return await _keyset_page(stmt, False, cursor, backwards, limit)
+
+async def next_pending(cursor: Optional[Tuple[datetime, int]] = None) -> Optional[Submission]:
+    """Следующая ожидающая модерации отправка после ключа cursor (или первая)"""
+    stmt = select(Submission).where(Submission.status == 'pending')
+    if cursor:
+        stmt = stmt.where(tuple_(Submission.submission_date, Submission.id) > tuple_(*cursor))
+    stmt = stmt.order_by(Submission.submission_date.asc(), Submission.id.asc()).limit(1)
+    async with get_async_session() as session:
+        return await session.scalar(stmt)
+
+async def page_submissions(cursor: Optional[Tuple[datetime, int]] = None, backwards: bool = False,
+                           limit: int = PAGE_SIZE) -> Page:
+    """Страница всех отправок (от новых к старым)"""
+    return await _keyset_page(select(Submission), True, cursor, backwards, limit)
+
+# Слова запроса; "_" токенизатор FTS5 считает разделителем
+_WORD = re.compile(r"[^\W_]+")
+
+# Сколько самых новых совпадений ранжируется по bm25. bm25 считается для каждой
+# найденной строки: по слову из половины архива это сотни миллисекунд, а окно
+# держит любой запрос в десятках миллисекунд даже на миллионе строк
+SEARCH_WINDOW = 1000
+
+def _match_expression(query: str) -> Optional[str]:
+    """Запрос пользователя -> выражение FTS5 MATCH.
+
+    Каждое слово берется в кавычки (операторы и спецсимволы FTS5 из ввода не
+    действуют), слова объединяются через AND. По префиксу ищется только
+    последнее слово ("БПО Ноябрьск Иван" находит Иванова): префиксный запрос
+    собирает в памяти списки всех подходящих слов, и для частых слов вроде
+    "БПО" это в разы медленнее точного совпадения.
+    """
+    words = _WORD.findall(query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words) + "*"
+
+def _tsquery(query: str) -> Optional[str]:
+    """Запрос пользователя -> to_tsquery PostgreSQL по тем же правилам, что _match_expression.
+
+    В словах только буквы и цифры, поэтому операторы tsquery из ввода не проходят.
+    """
+    words = _WORD.findall(query)
+    if not words:
+        return None
+    return " & ".join(words) + ":*"
+
+# PostgreSQL: окно самых новых совпадений по GIN-индексу, затем ts_rank с весами
+# данных автора (A) вдвое больше описания (B), как bm25(2.0, 1.0) в SQLite
+_SEARCH_PG = text(
+    "SELECT submissions.* FROM ("
+    "  SELECT id, user_info, caption FROM submissions"
+    f"  WHERE {SEARCH_VECTOR_PG} @@ to_tsquery('simple', :query)"
+    "  ORDER BY id DESC LIMIT :window"
+    ") AS found JOIN submissions ON submissions.id = found.id "
+    "ORDER BY ts_rank(CAST('{0, 0, 0.5, 1}' AS float4[]), "
+    "  setweight(to_tsvector('simple', coalesce(found.user_info, '')), 'A') || "
+    "  setweight(to_tsvector('simple', coalesce(found.caption, '')), 'B'), "
+    "  to_tsquery('simple', :query)) DESC, submissions.id DESC "
+    "LIMIT :limit OFFSET :offset"
+)
+
+async def search_submissions(query: str, offset: int = 0, limit: int = PAGE_SIZE) -> Page:
+    """Полнотекстовый поиск по данным автора и описанию, лучшие совпадения (bm25) первыми.
+
+    Ранжируются SEARCH_WINDOW самых новых совпадений; если их больше, запрос
+    стоит уточнить. Индекс submissions_fts ведут триггеры (migrations.py),
+    в PostgreSQL - GIN-индекс по tsvector.
+    Страницы - через OFFSET внутри окна: ключа для keyset у bm25 нет.
+    """
+    async with get_async_session() as session:
+        if _dialect(session) == 'postgresql':
+            tsquery = _tsquery(query)
+            if tsquery is None:
+                return Page([], has_prev=False, has_next=False)
+            items = list(await session.scalars(select(Submission).from_statement(_SEARCH_PG.bindparams(
+                query=tsquery, window=SEARCH_WINDOW, limit=limit + 1, offset=offset
+            ))))
+            return Page(items[:limit], has_prev=offset > 0, has_next=len(items) > limit)
+
+    match = _match_expression(query)
+    if match is None:
+        return Page([], has_prev=False, has_next=False)
+
+    stmt = select(Submission).from_statement(text(
+        "SELECT submissions.* FROM ("
+        "  SELECT rowid, rank FROM ("
+        "    SELECT rowid, rank FROM submissions_fts WHERE submissions_fts MATCH :match"
+        "    ORDER BY rowid DESC LIMIT :window"
+        "  ) ORDER BY rank LIMIT :limit OFFSET :offset"
+        ") AS found JOIN submissions ON submissions.id = found.rowid "
+        "ORDER BY found.rank"
+    ).bindparams(match=match, window=SEARCH_WINDOW, limit=limit + 1, offset=offset))
+    async with get_async_session() as session:
+        items = list(await session.scalars(stmt))
+
+    return Page(items[:limit], has_prev=offset > 0, has_next=len(items) > limit)
+
+async def list_user_submissions(telegram_id: int, limit: int = 10) -> List[Submission]:
+    """Последние отправки пользователя"""
+    async with get_async_session() as session:
+        result = await session.scalars(
+            select(Submission)
+            .where(Submission.telegram_id == telegram_id)
+            .order_by(Submission.submission_date.desc())
+            .limit(limit)
+        )
+        return list(result)
+
+def _enqueue_notifications(session, chat_ids: Iterable[int], text: str) -> None:
+    """Кладет уведомления в outbox текущей транзакции"""
+    session.add_all([OutboxMessage(chat_id=chat_id, text=text) for chat_id in chat_ids])
+
+async def create_submission(telegram_id: int, user_info: str, content_type: str,
+                            caption: str = '', file_id: Optional[str] = None,
+                            notify_chat_ids: Iterable[int] = (),
+                            notify_text: Optional[Callable[[Submission], str]] = None,
+                            album: Sequence[Tuple[str, str]] = ()) -> Submission:
+    """Создает отправку со статусом pending.
+
+    notify_text(submission) - текст уведомления для notify_chat_ids; оно попадает
+    в outbox в той же транзакции, что и сама отправка.
+    album - (тип, file_id) файлов альбома по порядку; первый становится обложкой
+    (file_id отправки), все - строками submission_media одной вставкой.
+    """
+    if album:
+        file_id = album[0][1]
+    async with get_async_session() as session:
+        author = parse_user_info(user_info)
+        submission = Submission(
+            telegram_id=telegram_id,
+            user_info=user_info,
+            fleet=author.fleet,
+            base=author.base,
+            period=author.period,
+            role=author.role,
+            author_name=author.name,
+            content_type=content_type,
+            caption=caption,
+            file_id=file_id,
+            media_count=len(album) or None,
+            status='pending',
+            submission_date=datetime.utcnow()
+        )
+        session.add(submission)
+        if album:
+            await session.flush()
+            await session.execute(sql_insert(SubmissionMedia), [
+                {'submission_id': submission.id, 'position': position,
+                 'content_type': media_type, 'file_id': media_file_id}
+                for position, (media_type, media_file_id) in enumerate(album)
+            ])
+        await _bump_counters(session, {
+            'total': 1,
+            'status:pending': 1,
+            f'type:{content_type}': 1,
+            _day_key(submission.submission_date): 1,
+        })
+        if notify_text and notify_chat_ids:
+            if not album:
+                await session.flush()
+            _enqueue_notifications(session, notify_chat_ids, notify_text(submission))
+        await session.commit()
+        _changed([telegram_id])
+        return submission
+
+async def set_status(submission_id: int, status: str, comment: Optional[str] = None,
+                     notify_text: Optional[str] = None) -> Optional[Submission]:
+    """Меняет статус отправки. Возвращает None, если отправка не найдена.
+
+    notify_text - уведомление автору, записывается в outbox вместе со сменой статуса.
+    """
+    async with get_async_session() as session:
+        while True:
+            submission = await session.get(Submission, submission_id)
+            if not submission:
+                return None
+
+            old_status = submission.status
+            values = {'status': status}
+            if comment:
+                values['admin_comment'] = comment
+
+            # Условие на старый статус защищает счетчики от гонки двух модераторов:
+            # если статус успели поменять, перечитываем строку и пробуем снова
+            result = await session.execute(
+                update(Submission)
+                .where(Submission.id == submission_id, Submission.status == old_status)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                break
+            await session.rollback()
+
+        if old_status != status:
+            await _bump_counters(session, {f'status:{old_status}': -1, f'status:{status}': 1})
+        if notify_text:
+            _enqueue_notifications(session, [submission.telegram_id], notify_text)
+        await session.commit()
+        _changed([submission.telegram_id])
+        await session.refresh(submission)
+        return submission
+
+class Selection(NamedTuple):
+    """Набор отправок для пакетной модерации и экспорта.
+
+    ranges - список (с, по) включительно; одиночный ID - это (id, id).
+    status - менять только отправки в этом статусе. Без ranges по умолчанию
+    берутся только ожидающие модерации.
+    """
+    ranges: Tuple[Tuple[int, int], ...] = ()
+    content_type: Optional[str] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None  # не включительно
+    telegram_id: Optional[int] = None
+    status: Optional[str] = None
+    base: Optional[str] = None
+
+    def is_empty(self) -> bool:
+        return not any(self)
+
+    def conditions(self) -> list:
+        conditions = []
+        if self.ranges:
+            singles = [low for low, high in self.ranges if low == high]
+            spans = [Submission.id.between(low, high) for low, high in self.ranges if low != high]
+            if singles:
+                spans.append(Submission.id.in_(singles))
+            conditions.append(or_(*spans))
+        if self.status or not self.ranges:
+            conditions.append(Submission.status == (self.status or 'pending'))
+        if self.content_type:
+            conditions.append(Submission.content_type == self.content_type)
+        if self.date_from:
+            conditions.append(Submission.submission_date >= self.date_from)
+        if self.date_to:
+            conditions.append(Submission.submission_date < self.date_to)
+        if self.telegram_id:
+            conditions.append(Submission.telegram_id == self.telegram_id)
+        if self.base:
+            conditions.append(Submission.base == self.base)
+        return conditions
+
+STATUSES = ('pending', 'approved', 'rejected')
+
+async def set_status_many(selection: Selection, status: str, comment: Optional[str] = None,
+                          notify_text: Optional[Callable[[List[int]], str]] = None) -> List[int]:
+    """Меняет статус всех отправок выборки одной транзакцией. Возвращает измененные ID.
+
+    Отправки, уже имеющие этот статус, не трогаются. notify_text(ids) - текст
+    уведомления автору; каждый автор получает одно сообщение со всеми своими ID.
+    """
+    if selection.is_empty():
+        return []
+    values = {'status': status}
+    if comment:
+        values['admin_comment'] = comment
+
+    changed: List[Tuple[int, int]] = []
+    deltas: Dict[str, int] = {}
+    async with get_async_session() as session:
+        # По одному UPDATE ... RETURNING на каждый старый статус: так счетчики
+        # уменьшаются ровно на число строк, перешедших именно из этого статуса,
+        # без отдельного чтения, которое могло бы устареть до записи
+        for old_status in STATUSES:
+            if old_status == status:
+                continue
+            result = await session.execute(
+                update(Submission)
+                .where(and_(*selection.conditions()), Submission.status == old_status)
+                .values(**values)
+                .returning(Submission.id, Submission.telegram_id)
+                .execution_options(synchronize_session=False)
+            )
+            rows = result.all()
+            if rows:
+                changed.extend(rows)
+                deltas[f'status:{old_status}'] = -len(rows)
+        if not changed:
+            await session.rollback()
+            return []
+
+        deltas[f'status:{status}'] = len(changed)
+        await _bump_counters(session, deltas)
+
+        if notify_text:
+            by_author: Dict[int, List[int]] = {}
+            for submission_id, telegram_id in sorted(changed):
+                by_author.setdefault(telegram_id, []).append(submission_id)
+            await session.execute(sql_insert(OutboxMessage), [
+                {'chat_id': telegram_id, 'text': notify_text(ids)} for telegram_id, ids in by_author.items()
+            ])
+        await session.commit()
+    _changed(telegram_id for _, telegram_id in changed)
+    return sorted(submission_id for submission_id, _ in changed)
+
+async def set_media_path(submission_id: int, media_path: str) -> None:
+    """Записывает путь к скачанному файлу"""
+    async with get_async_session() as session:
+        await session.execute(
+            update(Submission).where(Submission.id == submission_id).values(media_path=media_path)
+        )
+        await session.commit()
+
+async def set_media_error(submission_id: int, error: str) -> None:
+    """Помечает файл отправки как нескачиваемый: при перезапуске он не ставится в очередь"""
+    async with get_async_session() as session:
+        await session.execute(
+            update(Submission).where(Submission.id == submission_id).values(media_error=error)
+        )
+        await session.commit()
+
+async def first_with_media(media_path: str, before_id: int) -> Optional[int]:
+    """Самая ранняя отправка раньше before_id с тем же файлом (файлы хранятся по хешу содержимого)"""
+    async with get_async_session() as session:
+        return await session.scalar(
+            select(Submission.id)
+            .where(Submission.media_path == media_path, Submission.id < before_id)
+            .order_by(Submission.id)
+            .limit(1)
+        )
+
+async def mark_duplicate(submission_id: int, original_id: int, notify_chat_ids: Iterable[int] = (),
+                         notify_text: Optional[str] = None) -> None:
+    """Отмечает отправку как возможный дубликат original_id; уведомление - в outbox той же транзакцией"""
+    async with get_async_session() as session:
+        await session.execute(
+            update(Submission).where(Submission.id == submission_id).values(duplicate_of=original_id)
+        )
+        if notify_text and notify_chat_ids:
+            _enqueue_notifications(session, notify_chat_ids, notify_text)
+        await session.commit()
+
+async def set_album_media_paths(submission_id: int, paths: Dict[int, str]) -> None:
+    """Пути скачанных файлов альбома ({позиция: путь}) одной транзакцией; путь позиции 0 - обложка"""
+    async with get_async_session() as session:
+        # UPDATE по первичному ключу (submission_id, position) одним executemany
+        await session.execute(update(SubmissionMedia), [
+            {'submission_id': submission_id, 'position': position, 'media_path': path}
+            for position, path in paths.items()
+        ])
+        if 0 in paths:
+            await session.execute(
+                update(Submission).where(Submission.id == submission_id).values(media_path=paths[0])
+            )
+        await session.commit()
+
+async def set_album_media_errors(submission_id: int, errors: Dict[int, str]) -> None:
+    """Помечает файлы альбома ({позиция: причина}) как нескачиваемые"""
+    async with get_async_session() as session:
+        await session.execute(update(SubmissionMedia), [
+            {'submission_id': submission_id, 'position': position, 'media_error': error}
+            for position, error in errors.items()
+        ])
+        await session.commit()
+
+async def list_album_media(submission_id: int) -> List[SubmissionMedia]:
+    """Файлы альбома по порядку"""
+    async with get_async_session() as session:
+        return list(await session.scalars(
+            select(SubmissionMedia)
+            .where(SubmissionMedia.submission_id == submission_id)
+            .order_by(SubmissionMedia.position)
+        ))
+
+async def list_missing_media(limit: int = 1000) -> List[Tuple[int, str, str]]:
+    """(id, file_id, content_type) одиночных фото/видео, файл которых еще не скачан"""
+    async with get_async_session() as session:
+        result = await session.execute(
+            select(Submission.id, Submission.file_id, Submission.content_type)
+            .where(Submission.file_id.is_not(None), Submission.media_path.is_(None),
+                   Submission.media_error.is_(None), Submission.media_count.is_(None))
+            .order_by(Submission.id)
+            .limit(limit)
+        )
+        return [tuple(row) for row in result.all()]
+
+async def list_missing_album_media(limit: int = 1000) -> Dict[int, List[Tuple[int, str, str]]]:
+    """{id отправки: [(позиция, file_id, тип), ...]} для еще не скачанных файлов альбомов"""
+    async with get_async_session() as session:
+        result = await session.execute(
+            select(SubmissionMedia.submission_id, SubmissionMedia.position,
+                   SubmissionMedia.file_id, SubmissionMedia.content_type)
+            .where(SubmissionMedia.media_path.is_(None), SubmissionMedia.media_error.is_(None))
+            .order_by(SubmissionMedia.submission_id, SubmissionMedia.position)
+            .limit(limit)
+        )
+        albums: Dict[int, List[Tuple[int, str, str]]] = {}
+        for submission_id, position, file_id, content_type in result.all():
+            albums.setdefault(submission_id, []).append((position, file_id, content_type))
+        return albums
+
+async def content_type_stats() -> List[Tuple[str, int]]:
+    """Количество отправок по типам контента"""
+    counters = await _read_counters('type:')
+    return sorted(counters.items())
+
+def _base_month_select(since: str):
+    return (
+        select(Submission.base, Submission.period, func.count())
+        .where(Submission.period >= since)
+        .group_by(Submission.period, Submission.base)
+        .order_by(Submission.base, Submission.period)
+    )
+
+async def base_month_stats(months: int = 3) -> List[Tuple[Optional[str], str, int]]:
+    """Отправки по БПО и месяцам из user_info (колонка period) за последние `months` месяцев.
+
+    Возвращает (БПО или None, 'ГГГГ-ММ', количество), отсортированные по БПО и месяцу.
+    Отправки без распознанного месяца не учитываются. Запрос читает только диапазон
+    покрывающего индекса ix_submissions_period_base: GROUP BY идет в порядке индекса,
+    сортируется лишь результат группировки.
+    """
+    now = datetime.utcnow()
+    month_index = now.year * 12 + now.month - 1 - (months - 1)
+    since = f"{month_index // 12:04d}-{month_index % 12 + 1:02d}"
+    async with get_async_session() as session:
+        result = await session.execute(_base_month_select(since))
+        return [tuple(row) for row in result.all()]
+
+async def count_last_days(days: int = 7) -> int:
+    """Количество отправок за последние `days` календарных дней (UTC), включая сегодня"""
+    since = datetime.utcnow() - timedelta(days=days - 1)
+    async with get_async_session() as session:
+        total = await session.scalar(
+            select(func.sum(SubmissionCounter.value)).where(
+                SubmissionCounter.name >= _day_key(since),
+                SubmissionCounter.name <= _day_key(datetime.utcnow()),
+            )
+        )
+        return total or 0
+
+async def list_admin_ids() -> List[int]:
+    """Telegram ID администраторов из таблицы admins (в дополнение к ADMIN_IDS из конфигурации)"""
+    async with get_async_session() as session:
+        return list(await session.scalars(select(Admin.telegram_id)))
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import aiosqlite
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Хранилища состояний FSM. Состояние многошаговой отправки (user_info, caption,
+# file_id) должно переживать перезапуск бота и быть общим для нескольких воркеров.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fsm_states (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data TEXT NOT NULL DEFAULT '{}',
+    expires_at REAL
+)
+"""
+
+class SQLiteStorage(BaseStorage):
+    """FSM-хранилище в отдельном файле SQLite (WAL).
+
+    Запись идет через буфер: изменения за flush_interval секунд сбрасываются
+    в базу одной транзакцией, а чтения сначала смотрят в буфер. Строка
+    живет state_ttl секунд с последнего изменения, брошенные на полпути
+    отправки периодически удаляются.
+    """
+
+    def __init__(self, path: str, state_ttl: Optional[float] = None, flush_interval: float = 0.05,
+                 cleanup_interval: float = 300, key_builder: Optional[KeyBuilder] = None):
+        self.path = path
+        self.state_ttl = state_ttl
+        self.flush_interval = flush_interval
+        self.cleanup_interval = cleanup_interval
+        self.key_builder = key_builder or DefaultKeyBuilder()
+        self._db: Optional[aiosqlite.Connection] = None
+        self._connect_lock = asyncio.Lock()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._flushing: Dict[str, Dict[str, Any]] = {}
+        self._dirty = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def _connection(self) -> aiosqlite.Connection:
+        if self._db is None:
+            async with self._connect_lock:
+                if self._db is None:
+                    db = await aiosqlite.connect(self.path)
+                    await db.execute("PRAGMA journal_mode=WAL")
+                    await db.execute("PRAGMA synchronous=NORMAL")
+                    await db.execute("PRAGMA busy_timeout=5000")
+                    await db.execute(_SCHEMA)
+                    await db.commit()
+                    self._db = db
+                    self._closing = False
+                    self._task = asyncio.create_task(self._run())
+        return self._db
+
+    def _expires_at(self) -> Optional[float]:
+        return time.time() + self.state_ttl if self.state_ttl else None
+
+    def _buffer(self, key: StorageKey, field: str, value: Any) -> None:
+        self._pending.setdefault(self.key_builder.build(key), {})[field] = value
+        self._dirty.set()
+
+    def _buffered(self, key: str, field: str):
+        """Значение из еще не сохраненных изменений: (найдено, значение)"""
+        for buffer in (self._pending, self._flushing):
+            changes = buffer.get(key)
+            if changes and field in changes:
+                return True, changes[field]
+        return False, None
+
+    async def _load(self, key: str) -> Dict[str, Any]:
+        db = await self._connection()
+        async with db.execute(
+            "SELECT state, data FROM fsm_states WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return {'state': None, 'data': {}}
+        return {'state': row[0], 'data': json.loads(row[1])}
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._connection()
+        self._buffer(key, 'state', state.state if isinstance(state, State) else state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        found, state = self._buffered(self.key_builder.build(key), 'state')
+        if found:
+            return state
+        return (await self._load(self.key_builder.build(key)))['state']
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._connection()
+        self._buffer(key, 'data', data.copy())
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        found, data = self._buffered(self.key_builder.build(key), 'data')
+        if found:
+            return data.copy()
+        return (await self._load(self.key_builder.build(key)))['data']
+
+    async def flush(self) -> None:
+        """Сбрасывает буфер изменений в базу одной транзакцией"""
+        if not self._pending or self._db is None:
+            return
+        # Пока идет запись, чтения видят пачку через self._flushing
+        batch, self._pending = self._pending, {}
+        self._flushing = batch
+        expires_at = self._expires_at()
+
+        full, state_only, data_only, maybe_empty = [], [], [], []
+        for key, changes in batch.items():
+            data = json.dumps(changes['data'], ensure_ascii=False) if 'data' in changes else None
+            if 'state' in changes and 'data' in changes:
+                full.append((key, changes['state'], data, expires_at))
+            elif 'state' in changes:
+                state_only.append((key, changes['state'], expires_at))
+            else:
+                data_only.append((key, data, expires_at))
+            if changes.get('state', '') is None or changes.get('data') == {}:
+                maybe_empty.append((key,))
+
+        try:
+            await self._db.executemany(
+                "INSERT INTO fsm_states (key, state, data, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET state = excluded.state, data = excluded.data, "
+                "expires_at = excluded.expires_at",
+                full
+            )
+            await self._db.executemany(
+                "INSERT INTO fsm_states (key, state, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET state = excluded.state, expires_at = excluded.expires_at",
+                state_only
+            )
+            await self._db.executemany(
+                "INSERT INTO fsm_states (key, data, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at",
+                data_only
+            )
+            # Завершенные или отмененные отправки не держим в базе
+            await self._db.executemany(
+                "DELETE FROM fsm_states WHERE key = ? AND state IS NULL AND data = '{}'",
+                maybe_empty
+            )
+            await self._db.commit()
+        except Exception:
+            logger.exception("Не удалось сохранить состояния FSM, повторим при следующем сбросе")
+            await self._db.rollback()
+            # Более новые изменения, пришедшие во время сброса, важнее старых
+            for key, changes in batch.items():
+                self._pending[key] = {**changes, **self._pending.get(key, {})}
+            self._dirty.set()
+        finally:
+            self._flushing = {}
+
+    async def delete_expired(self) -> int:
+        """Удаляет состояния, которые не менялись дольше state_ttl"""
+        db = await self._connection()
+        cursor = await db.execute(
+            "DELETE FROM fsm_states WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+        )
+        await db.commit()
+        return cursor.rowcount
+
+    async def _run(self) -> None:
+        last_cleanup = time.monotonic()
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._dirty.wait(), timeout=self.cleanup_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._closing:
+                return
+            if self._dirty.is_set():
+                # Небольшое окно, чтобы собрать изменения нескольких апдейтов в одну транзакцию
+                await asyncio.sleep(self.flush_interval)
+                self._dirty.clear()
+                await self.flush()
+            if self.state_ttl and time.monotonic() - last_cleanup >= self.cleanup_interval:
+                try:
+                    removed = await self.delete_expired()
+                    if removed:
+                        logger.info(f"Удалено просроченных состояний FSM: {removed}")
+                except Exception:
+                    logger.exception("Ошибка очистки просроченных состояний FSM")
+                last_cleanup = time.monotonic()
+
+    async def close(self) -> None:
+        if self._task:
+            # Не отменяем задачу: отмена посреди flush() теряла бы уже вынутую
+            # из буфера пачку. Задача доводит текущий сброс и выходит, остаток
+            # сбрасывается ниже
+            self._closing = True
+            self._dirty.set()
+            await self._task
+            self._task = None
+        if self._db is not None:
+            await self.flush()
+            await self._db.close()
+            self._db = None
+
+def create_storage() -> BaseStorage:
+    """Создает FSM-хранилище, выбранное в Config.FSM_STORAGE"""
+    if Config.FSM_STORAGE == "memory":
+        return MemoryStorage()
+    if Config.FSM_STORAGE == "redis":
+        # redis - необязательная зависимость, нужна только для этого режима
+        from aiogram.fsm.storage.redis import RedisStorage
+        ttl = Config.FSM_STATE_TTL or None
+        return RedisStorage.from_url(Config.REDIS_URL, state_ttl=ttl, data_ttl=ttl)
+    if Config.FSM_STORAGE == "sqlite":
+        return SQLiteStorage(Config.FSM_DB_PATH, state_ttl=Config.FSM_STATE_TTL or None)
+    raise ValueError(f"Неизвестное хранилище FSM: {Config.FSM_STORAGE}")
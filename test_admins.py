@@ -0,0 +1,158 @@
+# test_admins.py - права администратора: фильтр на роутере, ADMIN_IDS и таблица admins
+import asyncio
+import itertools
+import os
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import AnswerCallbackQuery, SendMessage
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+from sqlalchemy import delete, insert, select
+
+from admins import AdminRegistry
+import repository
+from database import Admin, OutboxMessage, get_async_session
+from keyboards import PageCallback
+from states import ContentSubmission
+
+ADMIN_ID = 555002501
+STORED_ADMIN_ID = 555002502
+USER_ID = 555002503
+_ids = itertools.count(1025001)
+
+
+def text_update(user_id, text):
+    update_id = next(_ids)
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(id=user_id, type="private"),
+        from_user=User(id=user_id, is_bot=False, first_name="Иван"), text=text,
+    ))
+
+
+def page_press(user_id):
+    update_id = next(_ids)
+    return Update(update_id=update_id, callback_query=CallbackQuery(
+        id=str(update_id), chat_instance="test",
+        data=PageCallback(view='pending', ts=0, id=0, backwards=False).pack(),
+        from_user=User(id=user_id, is_bot=False, first_name="Иван"),
+    ))
+
+
+async def store_admin(telegram_id):
+    async with get_async_session() as session:
+        await session.execute(insert(Admin).values(telegram_id=telegram_id))
+        await session.commit()
+
+
+async def remove_admin(telegram_id):
+    async with get_async_session() as session:
+        await session.execute(delete(Admin).where(Admin.telegram_id == telegram_id))
+        await session.commit()
+
+
+def test_registry_merges_config_and_table_with_ttl():
+    clock = [0.0]
+    configured = [ADMIN_ID]
+    registry = AdminRegistry(lambda: configured, ttl=60, clock=lambda: clock[0])
+
+    async def scenario():
+        await store_admin(STORED_ADMIN_ID)
+        try:
+            assert ADMIN_ID in registry and STORED_ADMIN_ID not in registry
+            # Первая проверка загружает таблицу
+            assert await registry.check(STORED_ADMIN_ID)
+            assert isinstance(registry.ids, frozenset)
+
+            # До истечения срока изменения таблицы не видны
+            await remove_admin(STORED_ADMIN_ID)
+            clock[0] = 59
+            assert await registry.check(STORED_ADMIN_ID)
+            clock[0] = 60
+            assert not await registry.check(STORED_ADMIN_ID)
+            assert await registry.check(ADMIN_ID)
+        finally:
+            await remove_admin(STORED_ADMIN_ID)
+
+    asyncio.run(scenario())
+
+
+def test_router_filter_gates_admin_handlers(app, monkeypatch, set_admins, stub_session):
+    set_admins(ADMIN_ID)
+    session = stub_session
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    dp = app.dp
+
+    async def scenario():
+        monkeypatch.setattr(dp.fsm, "storage", MemoryStorage())
+        # Не-админ: отказ на команду и на кнопку листания
+        await dp.feed_update(bot, text_update(USER_ID, "/pending"))
+        await dp.feed_update(bot, page_press(USER_ID))
+        # Админ из таблицы admins проходит тот же фильтр
+        await store_admin(STORED_ADMIN_ID)
+        app.admins.invalidate()
+        try:
+            await dp.feed_update(bot, text_update(STORED_ADMIN_ID, "/admin"))
+        finally:
+            await remove_admin(STORED_ADMIN_ID)
+            app.admins.invalidate()
+
+    asyncio.run(scenario())
+
+    denied, alert, dashboard = session.requests
+    assert isinstance(denied, SendMessage) and denied.text == "У вас нет прав администратора."
+    assert isinstance(alert, AnswerCallbackQuery) and alert.show_alert
+    assert isinstance(dashboard, SendMessage) and "нет прав" not in dashboard.text
+
+
+def test_menu_buttons_work_inside_the_form(app, monkeypatch, stub_session):
+    session = stub_session
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    dp = app.dp
+    key = StorageKey(bot_id=bot.id, chat_id=USER_ID, user_id=USER_ID)
+
+    async def scenario():
+        monkeypatch.setattr(dp.fsm, "storage", MemoryStorage())
+        await dp.fsm.storage.set_state(key, ContentSubmission.waiting_for_media)
+        # Раньше шаг формы забирал текст кнопки себе ("вы не прикрепили файл")
+        await dp.feed_update(bot, text_update(USER_ID, "🚫 Отменить отправку"))
+        return await dp.fsm.storage.get_state(key)
+
+    assert asyncio.run(scenario()) is None
+    assert session.requests[-1].text == "❌ Отправка отменена."
+
+
+def test_admins_from_table_get_notifications(app, monkeypatch, set_admins, stub_session):
+    """Уведомления о новой отправке и дубликате идут всем админам реестра, не только ADMIN_IDS"""
+    set_admins(ADMIN_ID)
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=stub_session)
+    dp = app.dp
+    key = StorageKey(bot_id=bot.id, chat_id=USER_ID, user_id=USER_ID)
+
+    async def scenario():
+        monkeypatch.setattr(dp.fsm, "storage", MemoryStorage())
+        await dp.fsm.storage.set_state(key, ContentSubmission.waiting_for_confirmation)
+        await dp.fsm.storage.set_data(key, {'user_info': "Флот 2, БПО Надым", 'content_type': 'text',
+                                            'caption': "Новости бригады"})
+        await store_admin(STORED_ADMIN_ID)
+        app.admins.invalidate()
+        try:
+            await dp.feed_update(bot, text_update(USER_ID, "✅ Да, отправить"))
+            [submission] = await repository.list_user_submissions(USER_ID, limit=1)
+            await app.duplicates.on_found(submission.id, submission.id - 1)
+        finally:
+            await remove_admin(STORED_ADMIN_ID)
+            app.admins.invalidate()
+        async with get_async_session() as session:
+            rows = (await session.execute(
+                select(OutboxMessage.chat_id, OutboxMessage.text)
+                .where(OutboxMessage.text.contains(f"{submission.id}"))
+            )).all()
+        return submission.id, rows
+
+    submission_id, rows = asyncio.run(scenario())
+    for chat_id in (ADMIN_ID, STORED_ADMIN_ID):
+        texts = [text for chat, text in rows if chat == chat_id]
+        assert any(text.startswith("🆕") and f"ID: {submission_id}" in text for text in texts)
+        assert any(text.startswith(f"♻️ Отправка #{submission_id}") for text in texts)
@@ -0,0 +1,152 @@
+# test_albums.py - альбомы (media group): одно превью, одна отправка, параллельная загрузка
+import asyncio
+import itertools
+import os
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import SendMediaGroup
+from aiogram.types import Chat, Message, PhotoSize, Update, User, Video
+from sqlalchemy import event, select
+
+import repository
+from config import Config
+from database import OutboxMessage, async_engine, get_async_session
+from media import MediaDownloader
+from states import ContentSubmission
+
+USER_ID = 555001021
+ADMIN_ID = 555001121
+_ids = itertools.count(1021001)
+
+
+def album_part(media_group_id, kind):
+    update_id = next(_ids)
+    media = {}
+    if kind == "photo":
+        media["photo"] = [PhotoSize(file_id=f"p{update_id}", file_unique_id=f"p{update_id}",
+                                    width=1280, height=960, file_size=300000)]
+    else:
+        media["video"] = Video(file_id=f"v{update_id}", file_unique_id=f"v{update_id}",
+                               width=1280, height=720, duration=20, file_size=2000000)
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(id=USER_ID, type="private"),
+        from_user=User(id=USER_ID, is_bot=False, first_name="Иван"), media_group_id=media_group_id, **media,
+    ))
+
+
+def text_update(text):
+    update_id = next(_ids)
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(id=USER_ID, type="private"),
+        from_user=User(id=USER_ID, is_bot=False, first_name="Иван"), text=text,
+    ))
+
+
+def test_album_is_one_preview_and_one_submission(app, set_admins, monkeypatch, stub_session, fake_bot):
+    set_admins(ADMIN_ID)
+    # Окно не истекает само: альбом отдается хендлеру явным flush(), без гонки с часами
+    monkeypatch.setattr(app.albums, "window", 3600)
+    session = stub_session
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    dp = app.dp
+    key = StorageKey(bot_id=bot.id, chat_id=USER_ID, user_id=USER_ID)
+    queued = []
+    monkeypatch.setattr(app.downloader, "enqueue_album", lambda *args: queued.append(args))
+
+    monkeypatch.setattr(dp.fsm, "storage", MemoryStorage())
+
+    async def scenario():
+        await dp.fsm.storage.set_state(key, ContentSubmission.waiting_for_media)
+        await dp.fsm.storage.set_data(key, {"content_type": "photo", "caption": "Смена на кусте",
+                                            "user_info": "Флот 4, БПО Губкинский, май 2025, мастер Орлов А.А."})
+        parts = [album_part("g1", "photo"), album_part("g1", "video"), album_part("g1", "photo")]
+
+        # Части приходят отдельными апдейтами вразнобой, как при polling. Апдейт
+        # первой пришедшей части ждет окно, остальные только добавляются к ней
+        deliveries = [asyncio.create_task(dp.feed_update(bot, update)) for update in (parts[2], parts[0], parts[1])]
+        while sum(delivery.done() for delivery in deliveries) < len(parts) - 1:
+            await asyncio.sleep(0.01)
+        assert not session.requests
+        app.albums.flush()
+        await asyncio.gather(*deliveries)
+
+        media_groups = [r for r in session.requests if isinstance(r, SendMediaGroup)]
+        assert len(media_groups) == 1 and len(session.requests) == 2
+        assert [type(item).__name__ for item in media_groups[0].media] == [
+            "InputMediaPhoto", "InputMediaVideo", "InputMediaPhoto"
+        ]
+        assert await dp.fsm.storage.get_state(key) == ContentSubmission.waiting_for_confirmation.state
+        data = await dp.fsm.storage.get_data(key)
+        assert [item[1] for item in data["album"]] == [
+            "p" + str(parts[0].update_id), "v" + str(parts[1].update_id), "p" + str(parts[2].update_id)
+        ]
+
+        transactions = []
+        listener = lambda *args: transactions.append(1)
+        event.listen(async_engine.sync_engine, "commit", listener)
+        try:
+            await dp.feed_update(bot, text_update("✅ Да, отправить"))
+        finally:
+            event.remove(async_engine.sync_engine, "commit", listener)
+        assert len(transactions) == 1
+
+        (submission_id, items), = queued
+        submission = await repository.get_submission(submission_id)
+        assert submission.media_count == 3 and submission.file_id == data["album"][0][1]
+        assert [(p.position, p.content_type) for p in await repository.list_album_media(submission_id)] == [
+            (0, "photo"), (1, "video"), (2, "photo")
+        ]
+        async with get_async_session() as db:
+            notices = list(await db.scalars(select(OutboxMessage.text).where(OutboxMessage.chat_id == ADMIN_ID)))
+        assert sum(f"ID: {submission_id}" in text for text in notices) == 1
+        assert "альбом (фото и видео: 3)" in notices[-1]
+        return submission_id, items
+
+    submission_id, items = asyncio.run(scenario())
+
+    # Скачивание альбома: файлы параллельно, пути одной транзакцией
+    files = {f"{file_id}.jpg": os.urandom(1000) for _, file_id, _ in items}
+    fake_bot = fake_bot(files)
+    downloader = MediaDownloader(fake_bot)
+    active = peak = 0
+    original_download = downloader.download
+
+    async def download(file_id, content_type):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.05)
+        try:
+            return await original_download(file_id, content_type)
+        finally:
+            active -= 1
+
+    downloader.download = download
+
+    async def fetch_all():
+        done = await downloader.process_album(submission_id, items)
+        return done, await repository.get_submission(submission_id), await repository.list_album_media(submission_id)
+
+    done, submission, parts = asyncio.run(fetch_all())
+    assert peak == 3 and sorted(done) == [0, 1, 2]
+    assert submission.media_path == done[0]
+    assert [part.media_path for part in parts] == [done[0], done[1], done[2]]
+
+
+def test_missing_album_files_are_listed_for_restart():
+    async def scenario():
+        album = [("photo", "ra"), ("photo", "rb")]
+        submission = await repository.create_submission(USER_ID, "Флот 4", "photo", "", album=album)
+        await repository.set_album_media_paths(submission.id, {0: "photos/ra.jpg"})
+        missing = await repository.list_missing_album_media()
+        singles = await repository.list_missing_media()
+        await repository.set_album_media_paths(submission.id, {1: "photos/rb.jpg"})
+        return submission.id, missing, singles
+
+    submission_id, missing, singles = asyncio.run(scenario())
+    assert missing[submission_id] == [(1, "rb", "photo")]
+    # Альбом не дозагружается как одиночный файл
+    assert submission_id not in [row[0] for row in singles]
@@ -0,0 +1,88 @@
+# test_authors.py - разбор user_info в поля автора, миграция и статистика по БПО
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import text
+
+import repository
+from authors import AuthorInfo, parse_user_info
+from database import engine, get_session, Submission
+from migrations import backfill_authors
+
+
+def test_parse_template():
+    assert parse_user_info("Флот 3, БПО Ноябрьск, июнь 2025, мастер КИПиА Иванов И.И.") == AuthorInfo(
+        fleet='3', base='Ноябрьск', period='2025-06', role='мастер КИПиА', name='Иванов И.И.'
+    )
+
+
+def test_parse_variations():
+    info = parse_user_info("флот №12 ,  бпо новый  уренгой, 06.2025, бурильщик, Петрова-Водкина А. Б.")
+    assert info == AuthorInfo('12', 'Новый Уренгой', '2025-06', 'бурильщик', 'Петрова-Водкина А. Б.')
+
+    # Порядок частей и падеж месяца не важны
+    info = parse_user_info("Сидоров, водитель, в мае 2024, БПО Сургут")
+    assert (info.base, info.name, info.role) == ('Сургут', 'Сидоров', 'водитель')
+    assert parse_user_info("мая 2024").period == '2024-05'
+
+    # Нераспознанное остается None, текст не теряется
+    assert parse_user_info("просто текст") == AuthorInfo(role='просто текст')
+    assert parse_user_info("") == AuthorInfo()
+    assert parse_user_info("Флот 1, 13.2025").period is None
+
+
+def test_create_fills_columns_and_backfill():
+    async def create():
+        return await repository.create_submission(10, "Флот 7, БПО Пурпе, май 2025, мастер Волков А.А.", "text", "")
+
+    created = asyncio.run(create())
+    assert (created.fleet, created.base, created.period, created.author_name) == ('7', 'Пурпе', '2025-05', 'Волков А.А.')
+
+    # Строка из старой базы: до миграции разобранных полей не было
+    legacy_id = asyncio.run(repository.create_submission(
+        11, "Флот 2, БПО ямбург, апрель 2025, помбур Смирнов", "text", ""
+    )).id
+    with engine.begin() as connection:
+        connection.execute(text(
+            "UPDATE submissions SET fleet = NULL, base = NULL, period = NULL, role = NULL, author_name = NULL "
+            "WHERE id = :id"
+        ), {"id": legacy_id})
+    with engine.begin() as connection:
+        assert backfill_authors(connection, batch_size=3) >= 2
+    with get_session() as session:
+        legacy = session.get(Submission, legacy_id)
+        assert (legacy.fleet, legacy.base, legacy.period, legacy.role, legacy.author_name) == (
+            '2', 'Ямбург', '2025-04', 'помбур', 'Смирнов'
+        )
+
+
+def test_base_month_stats():
+    now = datetime.utcnow()
+    month = now.strftime('%Y-%m')
+    # Месяц работы из user_info, а не дата отправки: старый месяц в отчет не попадает
+    old = f"{now.year - 2}-01"
+
+    async def scenario():
+        before = dict(((b, m), c) for b, m, c in await repository.base_month_stats())
+        for base, period in (("Муравленко", month), ("муравленко", month), ("Губкинский", month),
+                             ("Губкинский", old)):
+            year, number = period.split('-')
+            await repository.create_submission(12, f"Флот 1, БПО {base}, {number}.{year}, мастер Попов", "text", "")
+        await repository.create_submission(12, "Флот 1, БПО Губкинский, мастер Попов", "text", "")
+        after = dict(((b, m), c) for b, m, c in await repository.base_month_stats())
+        assert after[('Муравленко', month)] == before.get(('Муравленко', month), 0) + 2
+        assert after[('Губкинский', month)] == before.get(('Губкинский', month), 0) + 1
+        assert ('Губкинский', old) not in after
+        assert sum(after.values()) == sum(before.values()) + 3
+
+    asyncio.run(scenario())
+
+
+def test_base_month_stats_reads_covering_index():
+    if engine.dialect.name != 'sqlite':
+        return
+    query = repository._base_month_select('2025-01').compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.connect() as connection:
+        plan = " ".join(row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {query}")))
+    assert "COVERING INDEX ix_submissions_period_base (period>?)" in plan
+    assert "TEMP B-TREE FOR GROUP BY" not in plan
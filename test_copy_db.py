@@ -0,0 +1,124 @@
+# test_copy_db.py - DATABASE_URL для SQLite и PostgreSQL, перенос базы пачками
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, insert, select, text
+
+from copy_db import copy_database
+from database import SEARCH_VECTOR_PG, Admin, Base, OutboxMessage, Submission, SubmissionMedia, engine_urls
+from migrations import rebuild_counters, run_migrations, upgrade
+
+ROWS = 25
+
+
+def make_source(path):
+    """Файл SQLite как у работающего бота: отправки, альбом, счетчики, outbox"""
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    upgrade(engine)
+    start = datetime(2025, 6, 1)
+    with engine.begin() as connection:
+        connection.execute(insert(Submission), [
+            {"telegram_id": 1000 + i % 3, "user_info": f"Флот {i}, БПО Ноябрьск, июнь 2025, мастер Петров {i}",
+             "content_type": "photo" if i == 0 else "text", "caption": "Цементаж" if i % 5 == 0 else "Спуск",
+             "status": "approved" if i % 2 else "pending", "submission_date": start + timedelta(hours=i),
+             "media_count": 2 if i == 0 else None}
+            for i in range(ROWS)
+        ])
+        connection.execute(insert(SubmissionMedia), [
+            {"submission_id": 1, "position": position, "content_type": "photo", "file_id": f"f{position}",
+             "media_path": f"photos/aa/{position}.jpg"}
+            for position in range(2)
+        ])
+        connection.execute(insert(OutboxMessage), [{"chat_id": 1, "text": "Новая отправка #1"}])
+        rebuild_counters(connection)
+    engine.dispose()
+    return url
+
+
+def table_rows(url):
+    engine = create_engine(engine_urls(url)[0])
+    with engine.connect() as connection:
+        rows = {table.name: connection.execute(select(table).order_by(*table.primary_key.columns)).all()
+                for table in Base.metadata.sorted_tables}
+    engine.dispose()
+    return rows
+
+
+def test_database_url_picks_sync_and_async_drivers():
+    def drivers(url):
+        return tuple(u.drivername for u in engine_urls(url))
+
+    assert drivers("sqlite:////srv/bot/database.db") == ("sqlite+pysqlite", "sqlite+aiosqlite")
+    assert drivers("postgresql://bot:secret@db/inside_bot") == ("postgresql+psycopg", "postgresql+asyncpg")
+    assert drivers("postgresql+psycopg://bot@db/inside_bot") == ("postgresql+psycopg", "postgresql+psycopg")
+    assert drivers("postgresql+psycopg2://bot@db/inside_bot") == ("postgresql+psycopg2", "postgresql+asyncpg")
+    with pytest.raises(ValueError):
+        engine_urls("mysql://bot@db/inside_bot")
+
+
+def test_copy_to_sqlite_in_batches(tmp_path):
+    source = make_source(tmp_path / "database.db")
+    target = f"sqlite:///{tmp_path / 'copy.db'}"
+    batches = []
+
+    counts = copy_database(source, target, batch_size=7, progress=lambda table, copied: batches.append(table))
+
+    assert counts["submissions"] == ROWS and counts["submission_media"] == 2
+    assert batches.count("submissions") == 4  # 7 + 7 + 7 + 4
+    assert table_rows(target) == table_rows(source)
+    # Поисковый индекс целевой базы заполнен триггерами при вставке
+    engine = create_engine(target)
+    with engine.connect() as connection:
+        found = connection.execute(text(
+            "SELECT count(*) FROM submissions_fts WHERE submissions_fts MATCH '\"цементаж\"'"
+        )).scalar()
+    engine.dispose()
+    assert found == 5
+    # Повторный перенос в заполненную базу запрещен
+    with pytest.raises(ValueError):
+        copy_database(source, target)
+
+
+def test_copy_to_postgres(postgres, tmp_path):
+    source = make_source(tmp_path / "database.db")
+    target = postgres.create_database()
+
+    counts = copy_database(source, target, batch_size=7)
+
+    assert counts["submissions"] == ROWS
+    assert table_rows(target) == table_rows(source)
+    engine = create_engine(engine_urls(target)[0])
+    with engine.begin() as connection:
+        # Счетчик ID продолжает после перенесенных строк
+        new_id = connection.execute(insert(Submission).values(
+            telegram_id=1, user_info="Флот 1", content_type="text", submission_date=datetime.utcnow()
+        ).returning(Submission.id)).scalar()
+        assert new_id == ROWS + 1
+        assert connection.scalar(select(func.count()).select_from(Submission).where(
+            text(f"{SEARCH_VECTOR_PG} @@ to_tsquery('simple', 'цементаж')")
+        )) == 5
+    engine.dispose()
+
+
+def test_postgres_migration_widens_telegram_ids(postgres):
+    engine = create_engine(engine_urls(postgres.create_database())[0])
+    upgrade(engine)
+    # База, созданная до миграции 10: ID Telegram в 32-битном INTEGER
+    with engine.begin() as connection:
+        for table, column in (("submissions", "telegram_id"), ("outbox", "chat_id"), ("admins", "telegram_id")):
+            connection.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE INTEGER"))
+        connection.execute(text("DELETE FROM schema_migrations WHERE version = 10"))
+
+    assert run_migrations(engine) == [10]
+    big_id = 7_000_000_000
+    with engine.begin() as connection:
+        connection.execute(insert(Submission).values(
+            telegram_id=big_id, user_info="Флот 1", content_type="text", submission_date=datetime.utcnow()
+        ))
+        connection.execute(insert(OutboxMessage).values(chat_id=big_id, text="Новая отправка"))
+        connection.execute(insert(Admin).values(telegram_id=big_id))
+        assert connection.scalar(select(Submission.telegram_id)) == big_id
+        assert connection.scalar(select(OutboxMessage.chat_id)) == big_id
+        assert connection.scalar(select(Admin.telegram_id)) == big_id
+    engine.dispose()
@@ -0,0 +1,124 @@
+# test_duplicates.py - перцептивные хеши фото и поиск возможных дубликатов
+import asyncio
+import hashlib
+import io
+import os
+import random
+
+from PIL import Image, ImageDraw
+from sqlalchemy import select
+
+import repository
+from config import Config
+from database import OutboxMessage, get_async_session
+from duplicates import DuplicateDetector, HashIndex, hamming
+from images import ImageProcessor, dhash
+from media import content_path
+
+ADMIN_ID = 555001020
+
+
+def scene(seed, size=(1600, 1200)):
+    """Фото с крупными деталями: на однотонной картинке dHash ничего не различает"""
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        draw.rectangle((x, y, x + rng.randrange(100, 600), y + rng.randrange(100, 500)),
+                       fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    return image
+
+
+def store(image, quality=90):
+    """Кладет JPEG в хранилище медиа как MediaDownloader и возвращает media_path"""
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=quality)
+    payload = buffer.getvalue()
+    path = content_path("photo", hashlib.sha256(payload).hexdigest(), ".jpg")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(payload)
+    return os.path.relpath(path, Config.DATA_DIR)
+
+
+def test_dhash_survives_recompression_and_resize():
+    original = scene(1)
+    path = os.path.join(Config.DATA_DIR, store(original))
+    copy = os.path.join(Config.DATA_DIR, store(original.resize((800, 600)), quality=40))
+    other = os.path.join(Config.DATA_DIR, store(scene(2)))
+
+    assert hamming(dhash(path), dhash(copy)) <= Config.DUPLICATE_DISTANCE
+    assert hamming(dhash(path), dhash(other)) > 2 * Config.DUPLICATE_DISTANCE
+
+
+def test_index_finds_every_hash_within_distance(tmp_path):
+    rng = random.Random(7)
+    index = HashIndex(str(tmp_path / "phash.idx"), distance=6, bands=4)
+    stored = [rng.getrandbits(64) for _ in range(5000)]
+    for submission_id, value in enumerate(stored, start=1):
+        index.add(value, submission_id)
+
+    for _ in range(300):
+        target = rng.randrange(len(stored))
+        query = stored[target]
+        for bit in rng.sample(range(64), rng.randint(0, 6)):
+            query ^= 1 << bit
+        # Тот же ответ, что и у полного перебора
+        expected = min((hamming(query, value), submission_id)
+                       for submission_id, value in enumerate(stored, start=1))
+        assert index.nearest(query) == (expected[1], expected[0])
+
+    assert index.nearest(stored[0] ^ 0b1111111) is None
+    assert index.nearest(stored[0], before=1) is None
+
+    # Файл переживает перезапуск; недописанная запись отбрасывается
+    with open(index.path, "ab") as f:
+        f.write(b"\x01\x02\x03")
+    reloaded = HashIndex(index.path, distance=6, bands=4)
+    assert reloaded.load() == len(stored)
+    assert reloaded.nearest(stored[42] ^ 0b101) == (43, 2)
+    assert 43 in reloaded and 5001 not in reloaded
+
+
+def test_detector_flags_recompressed_photo_and_notifies_admins(app, set_admins, tmp_path):
+    set_admins(ADMIN_ID)
+    processor = ImageProcessor(workers=1)
+    detector = DuplicateDetector(HashIndex(str(tmp_path / "phash.idx")), processor,
+                                 on_found=app.duplicates.on_found)
+    original = scene(3)
+
+    async def scenario():
+        ids = []
+        for media_path in (store(original), store(original.resize((1200, 900)), quality=50), store(scene(4))):
+            sub = await repository.create_submission(ADMIN_ID, "Флот 1, БПО Ямбург", "photo", "Фото", file_id="f")
+            await repository.set_media_path(sub.id, media_path)
+            ids.append(sub.id)
+
+        assert await detector.check(ids[0], (await repository.get_submission(ids[0])).media_path, "photo") is None
+        assert await detector.check(ids[1], (await repository.get_submission(ids[1])).media_path, "photo") == ids[0]
+        assert await detector.check(ids[2], (await repository.get_submission(ids[2])).media_path, "photo") is None
+        # Повторная проверка после перезапуска загрузки: копии ищутся только среди более ранних
+        assert await detector.check(ids[0], (await repository.get_submission(ids[0])).media_path, "photo") is None
+        assert len(detector.index) == 3
+
+        assert (await repository.get_submission(ids[1])).duplicate_of == ids[0]
+        assert (await repository.get_submission(ids[2])).duplicate_of is None
+        async with get_async_session() as session:
+            texts = list(await session.scalars(
+                select(OutboxMessage.text).where(OutboxMessage.chat_id == ADMIN_ID)
+            ))
+        assert f"♻️ Отправка #{ids[1]} - возможный дубликат #{ids[0]}" in "\n".join(texts)
+
+        # Видео - по совпадению файла
+        video = os.path.join("videos", "dd", "same.mp4")
+        first = await repository.create_submission(ADMIN_ID, "Флот 1", "video", "", file_id="v")
+        second = await repository.create_submission(ADMIN_ID, "Флот 1", "video", "", file_id="v")
+        for sub in (first, second):
+            await repository.set_media_path(sub.id, video)
+        assert await detector.check(second.id, video, "video") == first.id
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        processor.close()
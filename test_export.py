@@ -0,0 +1,125 @@
+# test_export.py - выгрузка отправок в ZIP (export.py и /export)
+import asyncio
+import csv
+import io
+import itertools
+import json
+import os
+import zipfile
+from datetime import datetime
+
+import pytest
+from aiogram import Bot
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import SendDocument
+from aiogram.types import Chat, Message, Update, User
+
+import export
+import repository
+from config import Config
+from utils import parse_moderation_args
+
+ADMIN_ID = 555001019
+_ids = itertools.count(990001)
+
+
+def make_submissions(base):
+    """Три одобренных (две с общим файлом, одна без файла на диске) и одна ожидающая.
+
+    У каждого теста своя БПО, которой нет в других тестах: выборки по base= не пересекаются.
+    """
+    user_info = f"Флот 2, БПО {base}, июль 2025, оператор Кузнецов П.П."
+    photo = os.path.join("photos", "ex", "export-test.jpg")
+    os.makedirs(os.path.dirname(os.path.join(Config.DATA_DIR, photo)), exist_ok=True)
+    with open(os.path.join(Config.DATA_DIR, photo), "wb") as f:
+        f.write(b"\xff\xd8jpeg")
+
+    async def create():
+        ids = []
+        for content_type, caption, media_path in (
+            ("photo", "Рассвет, \"кавычки\"", photo),
+            ("photo", "Тот же файл", photo),
+            ("video", "Видео\nв две строки", os.path.join("videos", "ex", "missing.mp4")),
+            ("text", "Ожидает", None),
+        ):
+            sub = await repository.create_submission(ADMIN_ID, user_info, content_type, caption)
+            if media_path:
+                await repository.set_media_path(sub.id, media_path)
+            ids.append(sub.id)
+        await repository.set_status_many(repository.Selection(ranges=((ids[0], ids[2]),)), 'approved')
+        return ids
+
+    return asyncio.run(create())
+
+
+def test_export_csv_and_jsonl(tmp_path):
+    ids = make_submissions("Тарко-Сале")
+    selection, _ = parse_moderation_args(["base=тарко-сале"], allow_empty=True)
+
+    result = export.export_zip(selection, str(tmp_path / "out.zip"), "csv")
+    assert (result.rows, result.media, result.missing) == (3, 1, 1)
+    assert not os.path.exists(str(tmp_path / "out.zip.part"))
+    with zipfile.ZipFile(result.path) as archive:
+        assert sorted(archive.namelist()) == ["media/photos/ex/export-test.jpg", "submissions.csv"]
+        assert archive.read("media/photos/ex/export-test.jpg") == b"\xff\xd8jpeg"
+        rows = list(csv.DictReader(io.TextIOWrapper(archive.open("submissions.csv"), encoding="utf-8-sig")))
+    assert [int(row["id"]) for row in rows] == ids[:3]
+    assert rows[0]["caption"] == "Рассвет, \"кавычки\"" and rows[2]["caption"] == "Видео\nв две строки"
+    assert rows[0]["base"] == "Тарко-Сале" and rows[0]["author_name"] == "Кузнецов П.П."
+    assert rows[0]["media"] == "media/photos/ex/export-test.jpg"
+
+    pending, _ = parse_moderation_args(["status=pending", "base=Тарко-Сале"])
+    result = export.export_zip(pending, str(tmp_path / "pending.zip"), "jsonl", media=False)
+    with zipfile.ZipFile(result.path) as archive:
+        records = [json.loads(line) for line in archive.open("submissions.jsonl")]
+    assert [(r["id"], r["status"], r["media"]) for r in records] == [(ids[3], "pending", None)]
+
+
+def test_export_streams_rows_and_media_without_duplicates():
+    ids = make_submissions("Уренгой")
+    selection = export.export_selection(repository.Selection(base="Уренгой"))
+    assert [row[0] for row in export.iter_rows(selection, batch_size=2)] == ids[:3]
+    # Общий файл двух отправок - один раз
+    assert list(export.iter_media(selection, batch_size=1)) == [
+        os.path.join("photos", "ex", "export-test.jpg"), os.path.join("videos", "ex", "missing.mp4")
+    ]
+
+    with pytest.raises(ValueError):
+        export.export_zip(selection, os.path.join(Config.EXPORTS_DIR, "bad.zip"), "xlsx")
+
+
+def test_export_command_sends_small_archive(app, set_admins, monkeypatch, stub_session):
+    set_admins(ADMIN_ID)
+    make_submissions("Пурпе")
+    session = stub_session
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+
+    def command(text):
+        update_id = next(_ids)
+        return Update(update_id=update_id, message=Message(
+            message_id=update_id, date=datetime.now(), chat=Chat(id=ADMIN_ID, type="private"),
+            from_user=User(id=ADMIN_ID, is_bot=False, first_name="Админ"), text=text,
+        ))
+
+    async def scenario():
+        monkeypatch.setattr(app.dp.fsm, "storage", MemoryStorage())
+        await app.dp.feed_update(bot, command("/export jsonl base=Пурпе"))
+        document = session.requests[-1]
+        assert isinstance(document, SendDocument)
+        assert document.caption.startswith("📦 3 отправок, 1 файлов медиа")
+        # Отправленный архив на сервере не остается
+        assert not os.path.exists(document.document.path)
+
+        # Больше лимита - остается на диске
+        monkeypatch.setattr(Config, "EXPORT_SEND_LIMIT", 0)
+        await app.dp.feed_update(bot, command("/export csv base=Пурпе"))
+        text = session.requests[-1].text
+        assert "Сохранен на сервере" in text
+        path = text.rsplit(": ", 1)[1]
+        assert os.path.isfile(path)
+        os.remove(path)
+
+        await app.dp.feed_update(bot, command("/export type=audio"))
+        assert "Тип:" in session.requests[-1].text
+
+    asyncio.run(scenario())
@@ -0,0 +1,93 @@
+# test_images.py - миниатюры и веб-версии фото
+import asyncio
+import hashlib
+import io
+import os
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import SendPhoto
+from aiogram.types import Chat, Message, Update, User
+from PIL import Image
+
+import repository
+from config import Config
+from images import ImageProcessor, derivative_paths
+from media import content_path
+
+ADMIN_ID = 555000333
+
+
+def store_photo(size=(3000, 2000), color=(200, 40, 40)):
+    """Кладет JPEG с EXIF в хранилище медиа и возвращает media_path"""
+    exif = Image.Exif()
+    exif[0x0110] = "Test Camera"  # Model
+    exif[0x0112] = 6  # Orientation: повернуть на 90°
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "JPEG", exif=exif)
+    payload = buffer.getvalue()
+
+    path = content_path("photo", hashlib.sha256(payload).hexdigest(), ".jpg")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(payload)
+    return os.path.relpath(path, Config.DATA_DIR)
+
+
+def test_derivatives_are_downscaled_and_stripped():
+    media_path = store_photo()
+    processor = ImageProcessor(workers=1, thumbnail_size=320, web_size=1280)
+
+    async def scenario():
+        # Параллельные запросы одного файла - одна задача в пуле
+        first, second = await asyncio.gather(processor.derive(media_path), processor.derive(media_path))
+        assert first == second
+        return first
+
+    try:
+        paths = asyncio.run(scenario())
+    finally:
+        processor.close()
+
+    assert paths == derivative_paths(media_path)
+    with Image.open(paths["thumbnail"]) as thumb:
+        # Поворот из EXIF применен к пикселям: 3000x2000 стало портретным
+        assert thumb.height == 320 and thumb.width < thumb.height
+        assert not thumb.getexif()
+    with Image.open(paths["web_jpeg"]) as web:
+        assert web.height == 1280
+        assert not web.getexif()
+    with Image.open(paths["web_webp"]) as webp:
+        assert webp.format == "WEBP"
+
+    # Второй раз файлы берутся из кеша без пула процессов
+    assert ImageProcessor.cached(media_path) == paths
+
+
+def test_view_sends_thumbnail(app, monkeypatch, set_admins, stub_session):
+    set_admins(ADMIN_ID)
+    session = stub_session
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+
+    async def scenario():
+        monkeypatch.setattr(app.dp.fsm, "storage", MemoryStorage())
+        submission = await repository.create_submission(4101, "Флот 2, БПО Губкинский", "photo", "Вышка", file_id="f")
+        await repository.set_media_path(submission.id, store_photo(color=(10, 120, 10)))
+        submission = await repository.get_submission(submission.id)
+        update = Update(update_id=910001, message=Message(
+            message_id=910001, date=datetime.now(), chat=Chat(id=ADMIN_ID, type="private"),
+            from_user=User(id=ADMIN_ID, is_bot=False, first_name="Админ"), text=f"/view {submission.id}",
+        ))
+        await app.dp.feed_update(bot, update)
+        return submission
+
+    try:
+        submission = asyncio.run(scenario())
+    finally:
+        app.images.close()
+
+    assert [type(r) for r in session.requests] == [SendPhoto]
+    request = session.requests[0]
+    assert request.photo.path == derivative_paths(submission.media_path)["thumbnail"]
+    assert f"Отправка #{submission.id}" in request.caption
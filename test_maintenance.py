@@ -0,0 +1,87 @@
+# test_maintenance.py - SQLite в режиме WAL: настройки соединений, параллельная запись, checkpoint
+import asyncio
+import os
+import sqlite3
+import time
+
+import pytest
+
+import repository
+from config import Config
+from database import DB_PATH, async_engine, engine
+from maintenance import DatabaseMaintenance
+
+USER_ID = 555001022
+
+pytestmark = pytest.mark.skipif(engine.dialect.name != "sqlite", reason="настройки и WAL только для SQLite")
+
+
+def test_every_connection_gets_pragmas():
+    async def pragmas():
+        async with async_engine.connect() as connection:
+            return [(await connection.exec_driver_sql(f"PRAGMA {name}")).scalar()
+                    for name in ("journal_mode", "synchronous", "busy_timeout")]
+
+    assert asyncio.run(pragmas()) == ["wal", 1, Config.SQLITE_BUSY_TIMEOUT]
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA busy_timeout").scalar() == Config.SQLITE_BUSY_TIMEOUT
+
+
+def test_writes_do_not_wait_for_long_reader_and_checkpoint_truncates_wal():
+    # Долгое чтение (как /stats или /export) держит открытую транзакцию
+    reader = sqlite3.connect(DB_PATH, isolation_level=None)
+    reader.execute("BEGIN")
+    before = reader.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+    maintenance = DatabaseMaintenance(async_engine)
+
+    async def scenario():
+        started = time.perf_counter()
+        created = await asyncio.gather(*(
+            repository.create_submission(USER_ID, "Флот 2, БПО Муравленко", "text", f"Текст {i}")
+            for i in range(20)
+        ))
+        elapsed = time.perf_counter() - started
+        # Читатель мешает перенести свежие страницы, но PASSIVE его не ждет
+        passive = await maintenance.checkpoint()
+        return created, elapsed, passive
+
+    try:
+        created, elapsed, passive = asyncio.run(scenario())
+        # Снимок читателя не изменился, писатели его не ждали
+        assert reader.execute("SELECT COUNT(*) FROM submissions").fetchone()[0] == before
+    finally:
+        reader.execute("COMMIT")
+        reader.close()
+
+    assert len({sub.id for sub in created}) == 20
+    assert elapsed < 2
+    assert passive.busy == 0
+
+    async def shutdown():
+        await maintenance.start()
+        await maintenance.stop()
+        return await maintenance.checkpoint()
+
+    # После остановки WAL перенесен в основной файл и обрезан
+    assert asyncio.run(shutdown()).log == 0
+
+
+def test_stop_optimizes_before_final_checkpoint(monkeypatch):
+    """Статистика PRAGMA optimize пишется в WAL - последний TRUNCATE должен идти после нее"""
+    maintenance = DatabaseMaintenance(async_engine)
+    calls = []
+    checkpoint, optimize = maintenance.checkpoint, maintenance.optimize
+
+    async def record_checkpoint(mode='PASSIVE'):
+        calls.append(mode)
+        return await checkpoint(mode)
+
+    async def record_optimize():
+        calls.append('optimize')
+        await optimize()
+
+    monkeypatch.setattr(maintenance, "checkpoint", record_checkpoint)
+    monkeypatch.setattr(maintenance, "optimize", record_optimize)
+    asyncio.run(maintenance.stop())
+    assert calls == ['optimize', 'TRUNCATE']
+    assert os.path.getsize(DB_PATH + "-wal") == 0
@@ -0,0 +1,126 @@
+# test_media.py - тесты потокового скачивания медиа
+import asyncio
+import os
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import GetFile
+
+import repository
+from config import Config
+from media import MediaDownloader, media_abspath
+
+
+def test_streamed_download_is_content_addressed(fake_bot):
+    payload = os.urandom(300 * 1024)
+    bot = fake_bot({"a.jpg": payload, "b.jpg": payload, "c.jpg": os.urandom(1000)})
+
+    async def scenario():
+        first = await repository.create_submission(4001, "Флот 5, БПО Муравленко", "photo", "Фото", file_id="a")
+        second = await repository.create_submission(4001, "Флот 5, БПО Муравленко", "photo", "Фото", file_id="b")
+        third = await repository.create_submission(4001, "Флот 5, БПО Муравленко", "photo", "Фото", file_id="c")
+
+        downloader = MediaDownloader(bot, workers=2, chunk_size=64 * 1024)
+        await downloader.start()
+        for submission in (first, second, third):
+            downloader.enqueue(submission.id, submission.file_id, submission.content_type)
+        await asyncio.wait_for(downloader._queue.join(), timeout=5)
+        await downloader.stop()
+
+        paths = [(await repository.get_submission(s.id)).media_path for s in (first, second, third)]
+        return paths
+
+    first_path, second_path, third_path = asyncio.run(scenario())
+
+    # Одинаковое содержимое - один файл, путь по SHA-256
+    assert first_path == second_path != third_path
+    assert first_path.startswith("photos" + os.sep)
+    with open(media_abspath(first_path), 'rb') as f:
+        assert f.read() == payload
+    # Файл читался блоками, а не целиком
+    assert bot.session.max_chunk == 64 * 1024
+    assert os.listdir(Config.TMP_DIR) == []
+
+
+def test_missing_media_is_recovered_on_start(fake_bot):
+    bot = fake_bot({"late.jpg": b"late-photo"})
+
+    async def scenario():
+        submission = await repository.create_submission(4002, "Флот 5", "photo", "Фото", file_id="late")
+        downloader = MediaDownloader(bot)
+        await downloader.start()
+        await asyncio.wait_for(downloader._queue.join(), timeout=5)
+        await downloader.stop()
+        return (await repository.get_submission(submission.id)).media_path
+
+    assert asyncio.run(scenario()) is not None
+
+
+def test_oversized_file_is_not_downloaded(fake_bot):
+    limit = Config.MEDIA_LIMITS["photo"]["max_size"]
+    bot = fake_bot({"huge.jpg": b"x" * (limit + 1)})
+
+    async def scenario():
+        submission = await repository.create_submission(4003, "Флот 5", "photo", "Фото", file_id="huge")
+        downloader = MediaDownloader(bot, chunk_size=1024 * 1024)
+        assert await downloader.process(submission.id, "huge", "photo") is None
+        return await repository.get_submission(submission.id)
+
+    # Метаданные размера не пришли, поток прерван на лимите
+    submission = asyncio.run(scenario())
+    assert submission.media_path is None
+    assert submission.media_error
+    assert os.listdir(Config.TMP_DIR) == []
+
+
+def test_file_too_big_for_bot_api_is_not_retried(fake_bot):
+    bot = fake_bot({})
+    calls = []
+
+    async def get_file(file_id):
+        calls.append(file_id)
+        raise TelegramBadRequest(method=GetFile(file_id=file_id), message="Bad Request: file is too big")
+
+    bot.get_file = get_file
+
+    async def scenario():
+        submission = await repository.create_submission(4004, "Флот 5", "video", "Видео", file_id="big-video")
+        downloader = MediaDownloader(bot, max_attempts=3)
+        assert await downloader.process(submission.id, "big-video", "video") is None
+        missing = await repository.list_missing_media(limit=10 ** 6)
+        return submission.id, missing, await repository.get_submission(submission.id)
+
+    submission_id, missing, submission = asyncio.run(scenario())
+    # Одна попытка, без пауз между повторами; при перезапуске в очередь не попадет
+    assert calls == ["big-video"]
+    assert "file is too big" in submission.media_error
+    assert submission_id not in [row[0] for row in missing]
+
+
+def test_worker_survives_failed_job(fake_bot, caplog):
+    downloader = MediaDownloader(fake_bot({}), workers=1)
+    done = []
+
+    async def process(submission_id, file_id, content_type):
+        if file_id == "locked":
+            raise RuntimeError("database is locked")
+        done.append(submission_id)
+
+    async def process_album(submission_id, items):
+        done.append(submission_id)
+
+    downloader.process = process
+    downloader.process_album = process_album
+
+    async def scenario():
+        await downloader.start()
+        try:
+            downloader.enqueue(-1, "locked", "photo")
+            downloader.enqueue(-2, "next", "photo")
+            await asyncio.wait_for(downloader._queue.join(), timeout=5)
+        finally:
+            await downloader.stop()
+
+    asyncio.run(scenario())
+    # Единственный воркер пережил ошибку и взял следующую загрузку
+    assert -2 in done and -1 not in done
+    assert "database is locked" in caplog.text
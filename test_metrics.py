@@ -0,0 +1,87 @@
+# test_metrics.py - измерение хендлеров, базы и Bot API
+import asyncio
+import os
+import socket
+from datetime import datetime
+
+import aiohttp
+from aiogram import Bot
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Chat, Message, Update, User
+
+from metrics import ApiTimingMiddleware, Histogram, MetricsServer, InstrumentedStorage, perf_window, render_metrics
+
+ADMIN_ID = 555000555
+
+
+def text_update(update_id, user_id, text):
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(id=user_id, type="private"),
+        from_user=User(id=user_id, is_bot=False, first_name="Иван"), text=text,
+    ))
+
+
+def test_histogram_renders_prometheus_text():
+    histogram = Histogram("demo_seconds", "Пример", ("handler",), buckets=(0.1, 1))
+    histogram.observe(0.05, "a")
+    histogram.observe(0.5, "a")
+    histogram.observe(5, "a")
+
+    lines = histogram.render()
+    assert 'demo_seconds_bucket{handler="a",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{handler="a",le="1"} 2' in lines
+    assert 'demo_seconds_bucket{handler="a",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{handler="a"} 3' in lines
+
+
+def test_update_breakdown_and_perf_command(app, monkeypatch, set_admins, stub_session):
+    set_admins(ADMIN_ID)
+    session = stub_session
+    session.middleware(ApiTimingMiddleware())
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    dp = app.dp
+
+    async def scenario():
+        monkeypatch.setattr(dp.fsm, "storage", InstrumentedStorage(MemoryStorage()))
+        # Список админов загружается при запуске, а не в апдейтах ниже
+        await app.admins.reload()
+        await dp.feed_update(bot, text_update(930001, ADMIN_ID, "📊 Мои отправки"))
+        await dp.feed_update(bot, text_update(930002, ADMIN_ID, "📝 Отправить текст"))
+        await dp.feed_update(bot, text_update(930003, ADMIN_ID, "/perf"))
+
+    asyncio.run(scenario())
+
+    # Запросы к базе, вызовы API и FSM учтены в апдейте, который их сделал
+    slowest = {item['handler']: item for item in perf_window.slowest(100)}
+    assert slowest['my_submissions']['db_queries'] >= 1
+    assert slowest['my_submissions']['db_time'] > 0
+    assert slowest['my_submissions']['api_time'] > 0
+    assert slowest['start_text_submission']['fsm_time'] > 0
+    assert slowest['start_text_submission']['db_queries'] == 0
+
+    text = render_metrics()
+    assert 'bot_handler_seconds_count{handler="my_submissions"}' in text
+    assert 'bot_api_request_seconds_count{method="SendMessage"}' in text
+    assert 'bot_fsm_seconds_count{operation="set_state"}' in text
+
+    # /perf видит окно, включая предыдущие апдейты
+    assert "my_submissions" in session.requests[-1].text
+
+
+def test_metrics_endpoint():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    async def scenario():
+        server = MetricsServer("127.0.0.1", port)
+        await server.start()
+        try:
+            async with aiohttp.ClientSession() as client:
+                async with client.get(f"http://127.0.0.1:{port}/metrics") as response:
+                    assert response.status == 200
+                    return await response.text()
+        finally:
+            await server.stop()
+
+    assert "# TYPE bot_handler_seconds histogram" in asyncio.run(scenario())
@@ -0,0 +1,83 @@
+# test_moderation.py - модерация карточками с инлайн-кнопками
+import asyncio
+import itertools
+import os
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import AnswerCallbackQuery, EditMessageText, SendMessage
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+
+import repository
+from keyboards import ModerationCallback
+
+ADMIN_ID = 555000666
+_ids = itertools.count(940001)
+
+
+def admin_message(text):
+    update_id = next(_ids)
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(id=ADMIN_ID, type="private"),
+        from_user=User(id=ADMIN_ID, is_bot=False, first_name="Админ"), text=text,
+    ))
+
+
+def press(card, action):
+    """Нажатие кнопки на карточке card (отправленное ботом сообщение)"""
+    button = next(b for row in card.reply_markup.inline_keyboard for b in row
+                  if ModerationCallback.unpack(b.callback_data).a == action)
+    update_id = next(_ids)
+    return Update(update_id=update_id, callback_query=CallbackQuery(
+        id=str(update_id), chat_instance="test", data=button.callback_data,
+        from_user=User(id=ADMIN_ID, is_bot=False, first_name="Админ"),
+        message=Message(message_id=1, date=datetime.now(), chat=Chat(id=ADMIN_ID, type="private"),
+                        text=card.text, reply_markup=card.reply_markup),
+    ))
+
+
+def test_cards_approve_reject_skip_in_place(app, monkeypatch, set_admins, stub_session):
+    set_admins(ADMIN_ID)
+    session = stub_session
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    dp = app.dp
+
+    async def scenario():
+        monkeypatch.setattr(dp.fsm, "storage", MemoryStorage())
+        # Очередь только из отправок этого теста
+        await repository.set_status_many(repository.Selection(status='pending'), 'rejected')
+        subs = [await repository.create_submission(777, f"Флот 6, #{i}", "text", f"Текст {i}") for i in range(4)]
+
+        await dp.feed_update(bot, admin_message("/moderate"))
+        card = session.requests[-1]
+        assert isinstance(card, SendMessage)
+        assert f"Отправка #{subs[0].id}" in card.text
+
+        # Одобрить: статус меняется, следующая карточка - на месте этой
+        await dp.feed_update(bot, press(card, "a"))
+        answer, card = session.requests[-2:]
+        assert isinstance(answer, AnswerCallbackQuery) and "одобрена" in answer.text
+        assert isinstance(card, EditMessageText) and f"Отправка #{subs[1].id}" in card.text
+        assert (await repository.get_submission(subs[0].id)).status == 'approved'
+
+        # Отклонить, пропустить
+        await dp.feed_update(bot, press(card, "r"))
+        card = session.requests[-1]
+        assert (await repository.get_submission(subs[1].id)).status == 'rejected'
+        await dp.feed_update(bot, press(card, "s"))
+        skipped_card, card = card, session.requests[-1]
+        assert (await repository.get_submission(subs[2].id)).status == 'pending'
+        assert f"Отправка #{subs[3].id}" in card.text
+
+        # Повторное нажатие на устаревшей карточке не меняет уже принятое решение
+        await repository.set_status(subs[2].id, 'approved')
+        await dp.feed_update(bot, press(skipped_card, "r"))
+        assert "уже обработана" in session.requests[-2].text
+        assert (await repository.get_submission(subs[2].id)).status == 'approved'
+
+        # Последняя карточка - очередь пройдена
+        await dp.feed_update(bot, press(card, "a"))
+        assert "Очередь пройдена" in session.requests[-1].text
+
+    asyncio.run(scenario())
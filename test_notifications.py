@@ -0,0 +1,60 @@
+# test_notifications.py - тесты лимитов скорости отправки уведомлений
+import asyncio
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from notifications import NotificationDispatcher
+
+
+class FakeBot:
+    """Записывает отправки; первый вызов в чат flood_chat падает с RetryAfter"""
+
+    def __init__(self, flood_chat=None, delay=0.0):
+        self.sent = []
+        self.flood_chat = flood_chat
+        self.delay = delay
+
+    async def send_message(self, chat_id, text, **kwargs):
+        loop = asyncio.get_running_loop()
+        if chat_id == self.flood_chat:
+            self.flood_chat = None
+            raise TelegramRetryAfter(SendMessage(chat_id=chat_id, text=text), "Flood control", 0.05)
+        await asyncio.sleep(self.delay)
+        self.sent.append((chat_id, text, loop.time()))
+
+
+def test_global_rate_limit():
+    async def scenario():
+        bot = FakeBot(delay=0.05)
+        notifier = NotificationDispatcher(bot, concurrency=4, global_rate=100, chat_interval=0.1)
+
+        await asyncio.gather(*(notifier.deliver(chat_id, "🆕 Новая отправка") for chat_id in range(20)))
+
+        assert sorted(chat for chat, _, _ in bot.sent) == list(range(20))
+        # Глобальный лимит: 20 сообщений при 100/с занимают не меньше ~0.19 с
+        times = sorted(t for _, _, t in bot.sent)
+        assert times[-1] - times[0] >= 0.18
+
+    asyncio.run(scenario())
+
+
+def test_per_chat_interval_and_retry_after():
+    async def scenario():
+        bot = FakeBot(flood_chat=7)
+        notifier = NotificationDispatcher(bot, global_rate=1000, chat_interval=0.05)
+
+        # Флуд-лимит пробрасывается (повтор - забота outbox) и сдвигает следующий слот чата
+        with pytest.raises(TelegramRetryAfter):
+            await notifier.deliver(7, "сообщение 0")
+        loop = asyncio.get_running_loop()
+        flooded_at = loop.time()
+        await asyncio.gather(*(notifier.deliver(7, f"сообщение {i}") for i in range(1, 4)))
+
+        assert [text for _, text, _ in bot.sent] == ["сообщение 1", "сообщение 2", "сообщение 3"]
+        times = [t for _, _, t in bot.sent]
+        assert times[0] - flooded_at >= 0.045
+        assert all(b - a >= 0.045 for a, b in zip(times, times[1:]))
+
+    asyncio.run(scenario())
@@ -0,0 +1,178 @@
+# test_outbox.py - тесты transactional outbox
+import asyncio
+from datetime import datetime, timedelta
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramServerError
+from aiogram.methods import SendMessage
+from sqlalchemy import delete, select, update
+
+import repository
+from database import get_async_session, OutboxMessage
+from notifications import NotificationDispatcher
+from outbox import OutboxWorker
+
+
+class FakeNotifier(NotificationDispatcher):
+    """deliver() падает для чатов из failures столько раз, сколько там указано; лимитов скорости нет"""
+
+    def __init__(self, failures=None):
+        super().__init__(bot=None, global_rate=10 ** 6, chat_interval=0)
+        self.failures = dict(failures or {})
+        self.delivered = []
+
+    async def deliver(self, chat_id, text, slot=None, **kwargs):
+        error = self.failures.get(chat_id)
+        if error:
+            exc_type, left = error
+            if left:
+                self.failures[chat_id] = (exc_type, left - 1)
+                raise exc_type(SendMessage(chat_id=chat_id, text=text), "ошибка")
+        self.delivered.append((chat_id, text))
+
+
+async def _outbox_rows():
+    async with get_async_session() as session:
+        return {row.chat_id: row for row in await session.scalars(select(OutboxMessage))}
+
+
+async def _all_rows():
+    async with get_async_session() as session:
+        return list(await session.scalars(select(OutboxMessage)))
+
+
+async def _clear_outbox():
+    async with get_async_session() as session:
+        await session.execute(delete(OutboxMessage))
+        await session.commit()
+
+
+def test_notification_is_written_with_status_change():
+    async def scenario():
+        await _clear_outbox()
+        submission = await repository.create_submission(
+            3001, "Флот 2, БПО Губкинский", "text", "История",
+            notify_chat_ids=[1, 2], notify_text=lambda sub: f"🆕 ID: {sub.id}"
+        )
+        await repository.set_status(submission.id, 'approved', notify_text="✅ одобрена")
+
+        rows = await _outbox_rows()
+        assert rows[1].text == rows[2].text == f"🆕 ID: {submission.id}"
+        assert rows[3001].text == "✅ одобрена"
+        assert all(row.status == 'pending' for row in rows.values())
+
+    asyncio.run(scenario())
+
+
+def test_worker_retries_and_dead_letters():
+    async def scenario():
+        await _clear_outbox()
+        async with get_async_session() as session:
+            session.add_all([
+                OutboxMessage(chat_id=10, text="доставится сразу"),
+                OutboxMessage(chat_id=11, text="со второй попытки"),
+                OutboxMessage(chat_id=12, text="бот заблокирован"),
+                OutboxMessage(chat_id=13, text="сервер всегда падает"),
+            ])
+            await session.commit()
+
+        notifier = FakeNotifier({
+            11: (TelegramServerError, 1),
+            12: (TelegramForbiddenError, 1),
+            13: (TelegramServerError, 100),
+        })
+        worker = OutboxWorker(notifier, batch_size=10, max_attempts=3, base_backoff=0)
+        for _ in range(5):
+            await worker.process_batch()
+
+        rows = await _outbox_rows()
+        assert rows[10].status == 'sent' and rows[10].attempts == 1
+        assert rows[11].status == 'sent' and rows[11].attempts == 2
+        assert rows[12].status == 'dead' and rows[12].attempts == 1
+        assert rows[13].status == 'dead' and rows[13].attempts == 3
+        assert sorted(chat for chat, _ in notifier.delivered) == [10, 11]
+
+    asyncio.run(scenario())
+
+
+def test_worker_pool_drains_in_background():
+    async def scenario():
+        await _clear_outbox()
+        notifier = FakeNotifier()
+        worker = OutboxWorker(notifier, workers=2, batch_size=5, poll_interval=0.05)
+        await worker.start()
+
+        async with get_async_session() as session:
+            session.add_all([OutboxMessage(chat_id=100 + i, text="🆕") for i in range(12)])
+            await session.commit()
+        worker.wake()
+
+        for _ in range(50):
+            if len(notifier.delivered) == 12:
+                break
+            await asyncio.sleep(0.05)
+        await worker.stop()
+
+        # Каждое уведомление доставлено ровно один раз
+        assert sorted(chat for chat, _ in notifier.delivered) == [100 + i for i in range(12)]
+        assert all(row.status == 'sent' for row in (await _outbox_rows()).values())
+
+    asyncio.run(scenario())
+
+
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+
+
+def test_lease_covers_wait_for_chat_slot():
+    """Очередь в один чат дольше аренды: строки не забирает второй воркер и не шлет повторно"""
+    async def scenario():
+        await _clear_outbox()
+        async with get_async_session() as session:
+            session.add_all([OutboxMessage(chat_id=500, text=f"🆕 {i}") for i in range(10)])
+            await session.commit()
+        bot = RecordingBot()
+        notifier = NotificationDispatcher(bot, global_rate=1000, chat_interval=0.1)
+        worker = OutboxWorker(notifier, workers=2, batch_size=50, poll_interval=0.05, lease=0.5)
+        await worker.start()
+        worker.wake()
+        for _ in range(100):
+            if len(bot.sent) >= 10 and all(row.status == 'sent' for row in await _all_rows()):
+                break
+            await asyncio.sleep(0.05)
+        # Еще немного времени: повтор проявился бы после истечения аренды
+        await asyncio.sleep(0.3)
+        await worker.stop()
+        return bot.sent
+
+    sent = asyncio.run(scenario())
+    assert sorted(text for _, text in sent) == sorted(f"🆕 {i}" for i in range(10))
+
+
+def test_result_is_not_written_over_a_new_claim():
+    """Итог отправки пишется, только пока строка в аренде этого воркера"""
+    taken_over = datetime.utcnow() + timedelta(minutes=5)
+
+    class TakeoverNotifier(FakeNotifier):
+        async def deliver(self, chat_id, text, slot=None, **kwargs):
+            # Пока шла отправка, аренда истекла и строку захватил другой воркер
+            async with get_async_session() as session:
+                await session.execute(update(OutboxMessage).values(next_attempt_at=taken_over))
+                await session.commit()
+            await super().deliver(chat_id, text, slot)
+
+    async def scenario():
+        await _clear_outbox()
+        async with get_async_session() as session:
+            session.add(OutboxMessage(chat_id=600, text="🆕"))
+            await session.commit()
+        worker = OutboxWorker(TakeoverNotifier(), batch_size=10)
+        assert await worker.process_batch() == 1
+        return (await _outbox_rows())[600]
+
+    row = asyncio.run(scenario())
+    assert row.status == 'sending' and row.attempts == 0
+    assert row.next_attempt_at == taken_over
@@ -0,0 +1,105 @@
+# test_rendering.py - таблицы подписей, постоянные клавиатуры и кэш готовых текстов
+import asyncio
+import itertools
+import os
+from datetime import datetime
+
+import pytest
+from aiogram import Bot
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Chat, Message, Update, User
+from sqlalchemy import event
+
+import repository
+from database import async_engine
+from keyboards import get_cancel_keyboard, get_main_menu
+from rendering import STATUS_EMOJI, RenderCache, my_submissions_key
+
+USER_ID = 555000999
+_ids = itertools.count(970001)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_tables_and_keyboards_are_shared_and_immutable():
+    assert get_main_menu() is get_main_menu()
+    assert get_cancel_keyboard() is get_cancel_keyboard()
+    with pytest.raises(TypeError):
+        STATUS_EMOJI['pending'] = '?'
+    with pytest.raises(Exception):
+        get_main_menu().resize_keyboard = False
+    # Ряды и кнопки тоже не правятся на месте
+    with pytest.raises(AttributeError):
+        get_main_menu().keyboard[0].append(None)
+    with pytest.raises(Exception):
+        get_main_menu().keyboard[0][0].text = "🚫"
+    assert get_main_menu().keyboard[0][0].text == "📸 Отправить фото"
+
+
+def test_cache_ttl_lru_and_generation():
+    clock = FakeClock()
+    cache = RenderCache(maxsize=2, ttl=10, clock=clock)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)  # вытесняет 'b' - к нему обращались раньше всех
+    assert cache.get('b') is None and cache.get('a') == 1 and cache.get('c') == 3
+
+    clock.now = 11
+    assert cache.get('a') is None
+
+    # Текст, построенный до сброса, в кэш не попадает
+    generation = cache.generation
+    cache.invalidate_users([1])
+    cache.set(my_submissions_key(1), "устаревший", generation)
+    assert cache.get(my_submissions_key(1)) is None
+
+
+def test_my_submissions_cached_until_status_changes(app, monkeypatch, stub_session):
+    session = stub_session
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    queries = []
+
+    def count(*args):
+        queries.append(1)
+
+    def tap():
+        update_id = next(_ids)
+        return Update(update_id=update_id, message=Message(
+            message_id=update_id, date=datetime.now(), chat=Chat(id=USER_ID, type="private"),
+            from_user=User(id=USER_ID, is_bot=False, first_name="Сотрудник"), text="📊 Мои отправки",
+        ))
+
+    async def scenario():
+        monkeypatch.setattr(app.dp.fsm, "storage", MemoryStorage())
+        app.render_cache.clear()
+        submission = await repository.create_submission(USER_ID, "Флот 1, БПО Ханымей", "text", "Текст")
+
+        event.listen(async_engine.sync_engine, "after_cursor_execute", count)
+        try:
+            await app.dp.feed_update(bot, tap())
+            first_queries = len(queries)
+            assert first_queries >= 1
+            assert f"⏳📝 #{submission.id}" in session.requests[-1].text
+
+            # Повторное нажатие - из кэша, без запросов к базе
+            await app.dp.feed_update(bot, tap())
+            assert len(queries) == first_queries
+            assert f"⏳📝 #{submission.id}" in session.requests[-1].text
+
+            # Смена статуса сбрасывает кэш автора
+            await repository.set_status(submission.id, 'approved')
+            before = len(queries)
+            await app.dp.feed_update(bot, tap())
+            assert len(queries) > before
+            assert f"✅📝 #{submission.id}" in session.requests[-1].text
+        finally:
+            event.remove(async_engine.sync_engine, "after_cursor_execute", count)
+
+    asyncio.run(scenario())
@@ -0,0 +1,178 @@
+# test_repository.py - тесты асинхронного репозитория и счетчиков
+import asyncio
+
+from sqlalchemy import func, select
+
+import repository
+from database import get_async_session, Admin, OutboxMessage, Submission
+
+
+async def _counts_from_table():
+    async with get_async_session() as session:
+        result = await session.execute(
+            select(Submission.status, func.count(Submission.id)).group_by(Submission.status)
+        )
+        return dict(result.all())
+
+
+def test_counters_follow_inserts_and_status_changes():
+    async def scenario():
+        before_status = await repository.count_by_status()
+        before_total = await repository.count_total()
+        before_week = await repository.count_last_days(7)
+
+        first = await repository.create_submission(111, "Флот 3, БПО Ноябрьск", "photo", "Вышка")
+        second = await repository.create_submission(111, "Флот 3, БПО Ноябрьск", "text", "История")
+        await repository.set_status(first.id, 'approved', "Отлично")
+        await repository.set_status(second.id, 'rejected', "Не по теме")
+        # Повторная смена на тот же статус не должна менять счетчики
+        await repository.set_status(second.id, 'rejected')
+
+        status = await repository.count_by_status()
+        assert status.get('approved', 0) == before_status.get('approved', 0) + 1
+        assert status.get('rejected', 0) == before_status.get('rejected', 0) + 1
+        assert status.get('pending', 0) == before_status.get('pending', 0)
+        assert await repository.count_total() == before_total + 2
+        assert await repository.count_last_days(7) == before_week + 2
+
+        # Счетчики совпадают с честным подсчетом по таблице
+        assert {k: v for k, v in status.items() if v} == await _counts_from_table()
+
+        approved = await repository.get_submission(first.id)
+        assert approved.status == 'approved'
+        assert approved.admin_comment == "Отлично"
+
+    asyncio.run(scenario())
+
+
+def test_submission_round_trip_and_user_history():
+    async def scenario():
+        before_types = dict(await repository.content_type_stats())
+        created = [
+            await repository.create_submission(112, "Флот 2, БПО Губкинский", content_type, f"Подпись {i}",
+                                               file_id=f"file-{i}" if content_type != "text" else None)
+            for i, content_type in enumerate(("photo", "video", "text"))
+        ]
+        await repository.create_submission(113, "Флот 2", "text", "Чужая отправка")
+
+        stored = await repository.get_submission(created[0].id)
+        assert (stored.telegram_id, stored.user_info, stored.content_type) == (112, "Флот 2, БПО Губкинский", "photo")
+        assert (stored.caption, stored.file_id, stored.status) == ("Подпись 0", "file-0", "pending")
+        assert await repository.get_submission(10 ** 9) is None
+
+        # История автора: только его отправки, новые первыми, не больше limit
+        history = await repository.list_user_submissions(112, limit=2)
+        assert [sub.id for sub in history] == [created[2].id, created[1].id]
+        assert len(await repository.list_user_submissions(112)) >= 3
+
+        types = dict(await repository.content_type_stats())
+        assert types["photo"] == before_types.get("photo", 0) + 1
+        assert types["video"] == before_types.get("video", 0) + 1
+        assert types["text"] == before_types.get("text", 0) + 2
+
+    asyncio.run(scenario())
+
+
+def test_set_status_unknown_id():
+    assert asyncio.run(repository.set_status(10 ** 9, 'approved')) is None
+
+
+def test_keyset_pagination_walks_both_directions():
+    async def scenario():
+        for i in range(45):
+            await repository.create_submission(222, f"Флот 1, БПО {i}", "text", "Текст")
+
+        # Вперед до конца очереди
+        pages = []
+        page = await repository.page_pending(limit=10)
+        assert not page.has_prev
+        pages.append(page)
+        while page.has_next:
+            last = page.items[-1]
+            page = await repository.page_pending((last.submission_date, last.id), limit=10)
+            assert page.has_prev
+            pages.append(page)
+
+        keys = [(sub.submission_date, sub.id) for p in pages for sub in p.items]
+        assert keys == sorted(keys)
+        assert len(set(keys)) == len(keys)
+        assert len(keys) == (await repository.count_by_status())['pending']
+        assert all(len(p.items) <= 10 for p in pages)
+
+        # Назад от последней страницы получаем те же страницы
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            first = page.items[0]
+            page = await repository.page_pending((first.submission_date, first.id), backwards=True, limit=10)
+            assert [sub.id for sub in page.items] == [sub.id for sub in expected.items]
+        assert not page.has_prev
+
+    asyncio.run(scenario())
+
+
+def test_batch_moderation_by_ranges_and_filters():
+    async def scenario():
+        before = await repository.count_by_status()
+        first = await repository.create_submission(333, "Флот 4", "text", "Текст")
+        ids = [first.id] + [
+            (await repository.create_submission(333 if i % 2 else 334, "Флот 4", "photo" if i % 3 else "text", "x")).id
+            for i in range(1, 20)
+        ]
+        # Одна уже одобрена - ее статус не меняется и счетчики не двигаются дважды
+        await repository.set_status(ids[5], 'approved')
+
+        selection = repository.Selection(ranges=((ids[0], ids[9]), (ids[15], ids[15])))
+        changed = await repository.set_status_many(
+            selection, 'rejected', "Не по теме", notify_text=lambda sub_ids: ",".join(map(str, sub_ids))
+        )
+        assert changed == ids[:10] + [ids[15]]
+        # Повтор ничего не меняет
+        assert await repository.set_status_many(selection, 'rejected') == []
+
+        # Фильтры без ID трогают только ожидающие: оставшиеся текстовые пользователя 334
+        by_filter = await repository.set_status_many(
+            repository.Selection(content_type='text', telegram_id=334), 'approved'
+        )
+        expected = [
+            sub_id for i, sub_id in enumerate(ids)
+            if i > 9 and i != 15 and i % 2 == 0 and i % 3 == 0
+        ]
+        assert by_filter == expected
+
+        status = await repository.count_by_status()
+        assert status['rejected'] - before.get('rejected', 0) == 11
+        # ids[5] была одобрена, но попала в диапазон отклоненных
+        assert status['approved'] - before.get('approved', 0) == len(expected)
+        assert {k: v for k, v in status.items() if v} == await _counts_from_table()
+
+        # Одно уведомление на автора со всеми его ID
+        async with get_async_session() as session:
+            texts = dict((await session.execute(
+                select(OutboxMessage.chat_id, OutboxMessage.text)
+                .where(OutboxMessage.chat_id.in_((333, 334)))
+            )).all())
+        assert sorted(map(int, texts[333].split(',') + texts[334].split(','))) == changed
+
+    asyncio.run(scenario())
+
+
+def test_telegram_ids_above_int32():
+    """ID пользователей и чатов Telegram бывают больше 2^31 - колонки BIGINT"""
+    big_id = 7_000_000_000
+
+    async def scenario():
+        submission = await repository.create_submission(
+            big_id, "Флот 5, БПО Губкинский", "text", "Большой ID",
+            notify_chat_ids=[big_id + 1], notify_text=lambda sub: f"Новая отправка #{sub.id}"
+        )
+        async with get_async_session() as session:
+            session.add(Admin(telegram_id=big_id + 2))
+            await session.commit()
+            chat_ids = list(await session.scalars(
+                select(OutboxMessage.chat_id).where(OutboxMessage.text == f"Новая отправка #{submission.id}")
+            ))
+        assert [sub.id for sub in await repository.list_user_submissions(big_id)] == [submission.id]
+        assert chat_ids == [big_id + 1]
+        assert big_id + 2 in await repository.list_admin_ids()
+
+    asyncio.run(scenario())
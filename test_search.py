@@ -0,0 +1,93 @@
+# test_search.py - полнотекстовый поиск /search (FTS5)
+import asyncio
+import itertools
+import os
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import EditMessageText, SendMessage
+from aiogram.types import CallbackQuery, Chat, Message, Update, User
+from sqlalchemy import text
+
+import repository
+from database import engine
+from keyboards import SearchCallback
+from migrations import rebuild_search_index
+
+ADMIN_ID = 555000777
+_ids = itertools.count(950001)
+
+
+def test_search_ranks_and_follows_changes():
+    async def scenario():
+        weak = await repository.create_submission(1, "Флот 2, БПО Уренгой, мастер Петров", "text",
+                                                  "Разговор про Кварцит на планерке")
+        strong = await repository.create_submission(1, "Флот 4, БПО Кварцит, мастер Кварцитов", "photo",
+                                                    "Вышка")
+        other = await repository.create_submission(1, "Флот 5, БПО Сургут, мастер Сидоров", "text", "Смена")
+
+        # Совпадение в данных автора важнее совпадения в описании
+        page = await repository.search_submissions("кварцит")
+        assert [s.id for s in page.items] == [strong.id, weak.id]
+
+        # Все слова обязательны, последнее - по началу слова
+        assert not (await repository.search_submissions("Кварц Уренгой")).items
+        page = await repository.search_submissions("Кварцит Уренг")
+        assert [s.id for s in page.items] == [weak.id]
+
+        # Триггеры: изменение и удаление строки сразу видны в поиске
+        with engine.begin() as connection:
+            connection.execute(text("UPDATE submissions SET caption = 'Кварцит' WHERE id = :id"), {"id": other.id})
+        assert other.id in [s.id for s in (await repository.search_submissions("кварцит")).items]
+        with engine.begin() as connection:
+            connection.execute(text("DELETE FROM submissions WHERE id = :id"), {"id": weak.id})
+        assert weak.id not in [s.id for s in (await repository.search_submissions("кварцит")).items]
+
+        # Синтаксис FTS5 из ввода не ломает запрос
+        assert (await repository.search_submissions('кварцит" * (')).items
+        assert not (await repository.search_submissions('"*')).items
+
+        # Пересборка индекса дает тот же результат
+        before = [s.id for s in (await repository.search_submissions("кварцит")).items]
+        with engine.begin() as connection:
+            rebuild_search_index(connection)
+        assert [s.id for s in (await repository.search_submissions("кварцит")).items] == before
+
+    asyncio.run(scenario())
+
+
+def test_search_command_pages(app, monkeypatch, set_admins, stub_session):
+    set_admins(ADMIN_ID)
+    session = stub_session
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    dp = app.dp
+    admin = User(id=ADMIN_ID, is_bot=False, first_name="Админ")
+    chat = Chat(id=ADMIN_ID, type="private")
+
+    async def scenario():
+        monkeypatch.setattr(dp.fsm, "storage", MemoryStorage())
+        for i in range(repository.PAGE_SIZE + 5):
+            await repository.create_submission(2, f"Флот 1, БПО Пурпе, мастер Ёлкин {i}", "text", "Текст")
+
+        update_id = next(_ids)
+        await dp.feed_update(bot, Update(update_id=update_id, message=Message(
+            message_id=update_id, date=datetime.now(), chat=chat, from_user=admin, text="/search пурпе",
+        )))
+        first = session.requests[-1]
+        assert isinstance(first, SendMessage)
+        assert first.text.startswith("🔍 Поиск: пурпе") and first.text.count("\n⏳") == repository.PAGE_SIZE
+
+        # Кнопка "Вперед" берет запрос из текста сообщения
+        button = first.reply_markup.inline_keyboard[0][-1]
+        assert SearchCallback.unpack(button.callback_data).offset == repository.PAGE_SIZE
+        update_id = next(_ids)
+        await dp.feed_update(bot, Update(update_id=update_id, callback_query=CallbackQuery(
+            id=str(update_id), chat_instance="test", from_user=admin, data=button.callback_data,
+            message=Message(message_id=1, date=datetime.now(), chat=chat, from_user=admin, text=first.text),
+        )))
+        second = next(r for r in reversed(session.requests) if isinstance(r, EditMessageText))
+        assert second.text.startswith("🔍 Поиск: пурпе") and second.text.count("\n⏳") == 5
+        assert set(second.text.splitlines()).isdisjoint(first.text.splitlines()[2:-2])
+
+    asyncio.run(scenario())
@@ -0,0 +1,35 @@
+# test_startup.py - импорт без побочных эффектов, приложение создает create_app
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+PROBE = r"""
+import json, os, sys
+import bot
+import database
+result = {"data_dir": os.path.exists(os.environ["DATA_DIR"]), "engine": "engine" in vars(database)}
+app = bot.create_app(token="123456789:AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA")
+result["photos_dir"] = os.path.isdir(os.path.join(os.environ["DATA_DIR"], "photos"))
+result["engine_after"] = "engine" in vars(database)
+result["services"] = sorted(key for key in app.dp.workflow_data if key != "dispatcher")
+print(json.dumps(result))
+"""
+
+
+def test_import_creates_nothing_until_create_app(tmp_path):
+    data_dir = tmp_path / "data"
+    env = {key: value for key, value in os.environ.items() if key not in ("BOT_TOKEN", "DATABASE_URL")}
+    env.update(DATA_DIR=str(data_dir), FSM_STORAGE="memory")
+    output = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+
+    result = json.loads(output.splitlines()[-1])
+    # Без BOT_TOKEN импорт проходит: ни каталогов, ни движков
+    assert result["data_dir"] is False
+    assert result["engine"] is False
+    assert result["photos_dir"] is True
+    assert result["engine_after"] is True
+    assert result["services"] == ["admins", "downloader", "images", "outbox", "render_cache"]
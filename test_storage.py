@@ -0,0 +1,126 @@
+# test_storage.py - тесты постоянного FSM-хранилища
+import asyncio
+import itertools
+import os
+import tempfile
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.types import Chat, Message, Update, User
+
+import repository
+from states import ContentSubmission
+from storage import SQLiteStorage
+
+USER_ID = 555000111
+_ids = itertools.count(1)
+
+
+def make_update(text):
+    update_id = next(_ids)
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=update_id,
+            date=datetime.now(),
+            chat=Chat(id=USER_ID, type="private"),
+            from_user=User(id=USER_ID, is_bot=False, first_name="Иван"),
+            text=text,
+        ),
+    )
+
+
+def storage_key(bot):
+    return StorageKey(bot_id=bot.id, chat_id=USER_ID, user_id=USER_ID)
+
+
+def test_flow_survives_dispatcher_restart(app, monkeypatch, stub_session):
+    path = os.path.join(tempfile.mkdtemp(), "fsm.db")
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=stub_session)
+    dp = app.dp
+
+    async def scenario():
+        # Первый "процесс": пользователь начал отправку и рассказал о себе
+        monkeypatch.setattr(dp.fsm, "storage", SQLiteStorage(path))
+        await dp.feed_update(bot, make_update("📝 Отправить текст"))
+        await dp.feed_update(bot, make_update("Флот 3, БПО Ноябрьск, июнь 2025, мастер Иванов И.И."))
+        assert await dp.fsm.storage.get_state(storage_key(bot)) == ContentSubmission.waiting_for_caption.state
+        await dp.fsm.storage.close()
+
+        # Перезапуск: новое хранилище поверх того же файла
+        monkeypatch.setattr(dp.fsm, "storage", SQLiteStorage(path))
+        assert await dp.fsm.storage.get_state(storage_key(bot)) == ContentSubmission.waiting_for_caption.state
+        await dp.feed_update(bot, make_update("Утренняя планерка на буровой"))
+        assert await dp.fsm.storage.get_state(storage_key(bot)) == ContentSubmission.waiting_for_confirmation.state
+
+        await dp.feed_update(bot, make_update("✅ Да, отправить"))
+        assert await dp.fsm.storage.get_state(storage_key(bot)) is None
+
+        # В отправку попали данные, введенные до перезапуска
+        page = await repository.page_submissions(limit=1)
+        submission = page.items[0]
+        assert submission.telegram_id == USER_ID
+        assert submission.user_info.startswith("Флот 3, БПО Ноябрьск")
+        assert submission.caption == "Утренняя планерка на буровой"
+
+        # Завершенный поток удаляется из базы
+        await dp.fsm.storage.close()
+        storage = SQLiteStorage(path)
+        db = await storage._connection()
+        async with db.execute("SELECT COUNT(*) FROM fsm_states") as cursor:
+            assert (await cursor.fetchone())[0] == 0
+        await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_state_expires():
+    path = os.path.join(tempfile.mkdtemp(), "fsm.db")
+    key = StorageKey(bot_id=1, chat_id=2, user_id=2)
+
+    async def scenario():
+        storage = SQLiteStorage(path, state_ttl=0.2, flush_interval=0.01)
+        await storage.set_state(key, ContentSubmission.waiting_for_caption)
+        await storage.update_data(key, {"user_info": "Флот 1"})
+        await storage.flush()
+        assert await storage.get_data(key) == {"user_info": "Флот 1"}
+
+        await asyncio.sleep(0.3)
+        assert await storage.get_state(key) is None
+        assert await storage.get_data(key) == {}
+        assert await storage.delete_expired() == 1
+        await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_close_during_flush_keeps_batch():
+    path = os.path.join(tempfile.mkdtemp(), "fsm.db")
+    key = StorageKey(bot_id=1, chat_id=3, user_id=3)
+
+    async def scenario():
+        storage = SQLiteStorage(path, flush_interval=0)
+        await storage.set_state(key, ContentSubmission.waiting_for_caption)
+        await storage.update_data(key, {"user_info": "Флот 2"})
+
+        # Фоновый сброс уже забрал пачку из буфера и пишет ее, когда вызывают close()
+        writing = asyncio.Event()
+        db = storage._db
+        executemany = db.executemany
+
+        async def slow_executemany(*args):
+            writing.set()
+            await asyncio.sleep(0.05)
+            return await executemany(*args)
+
+        db.executemany = slow_executemany
+        await writing.wait()
+        await asyncio.wait_for(storage.close(), timeout=5)
+
+        reopened = SQLiteStorage(path)
+        assert await reopened.get_state(key) == ContentSubmission.waiting_for_caption.state
+        assert await reopened.get_data(key) == {"user_info": "Флот 2"}
+        await reopened.close()
+
+    asyncio.run(scenario())
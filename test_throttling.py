@@ -0,0 +1,149 @@
+# test_throttling.py - антифлуд: 1000 апдейтов подряд от одного пользователя
+import asyncio
+import itertools
+import os
+from datetime import datetime
+
+from aiogram import Bot, Dispatcher, F
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import SendMessage
+from aiogram.types import Chat, Message, Update, User
+from sqlalchemy import event
+
+from database import async_engine
+from throttling import ThrottlingMiddleware, setup_throttling
+
+USER_ID = 555000888
+_ids = itertools.count(960001)
+LIMITS = {'update': (3, 30), 'message': (1, 10), 'my_submissions': (0.2, 3)}
+
+
+def text_update(text, user_id=USER_ID, update_id=None):
+    update_id = update_id or next(_ids)
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(id=user_id, type="private"),
+        from_user=User(id=user_id, is_bot=False, first_name="Сотрудник"), text=text,
+    ))
+
+
+class CountingStorage(MemoryStorage):
+    """MemoryStorage, считающая обращения FSMContextMiddleware"""
+
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+
+    async def get_state(self, key):
+        self.reads += 1
+        return await super().get_state(key)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_dispatcher(clock):
+    storage = CountingStorage()
+    dp = Dispatcher(storage=storage)
+    throttling = ThrottlingMiddleware(LIMITS, menu_classes={"📊 Мои отправки": 'my_submissions'},
+                                      exempt=lambda user_id: user_id == 1, clock=clock)
+    setup_throttling(dp, throttling)
+    handled = []
+
+    @dp.message(F.text)
+    async def record(message: Message):
+        handled.append(message.text)
+
+    return dp, storage, throttling, handled
+
+
+def test_burst_of_1000_from_one_user(stub_session):
+    clock = FakeClock()
+    dp, storage, throttling, handled = make_dispatcher(clock)
+    session = stub_session
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+
+    async def scenario():
+        for _ in range(1000):
+            await dp.feed_update(bot, text_update("📊 Мои отправки"))
+        # Проходит только запас ведра; отклоненные не читают FSM-хранилище
+        assert len(handled) == 3
+        assert storage.reads == 3
+        assert throttling.dropped['my_submissions'] == 997
+        # Одно предупреждение на всю очередь
+        assert [type(r) for r in session.requests] == [SendMessage]
+
+        # Лимит по классу не мешает другим шагам, пока есть общий запас
+        for _ in range(20):
+            await dp.feed_update(bot, text_update("Флот 3, БПО Ноябрьск"))
+        assert handled.count("Флот 3, БПО Ноябрьск") == 10
+
+        # Через 5 секунд ведро "Мои отправки" пополнилось на один токен
+        clock.now += 5
+        for _ in range(10):
+            await dp.feed_update(bot, text_update("📊 Мои отправки"))
+        assert handled.count("📊 Мои отправки") == 4
+
+        # Другого пользователя и исключенных (админов) лимит не касается
+        await dp.feed_update(bot, text_update("📊 Мои отправки", user_id=USER_ID + 1))
+        for _ in range(50):
+            await dp.feed_update(bot, text_update("📊 Мои отправки", user_id=1))
+        assert handled.count("📊 Мои отправки") == 4 + 1 + 50
+
+    asyncio.run(scenario())
+
+
+def test_duplicate_update_ids_dropped(stub_session):
+    dp, storage, throttling, handled = make_dispatcher(FakeClock())
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=stub_session)
+
+    async def scenario():
+        # Зависший клиент повторяет один и тот же апдейт
+        update = text_update("✅ Да, отправить", user_id=1)
+        for _ in range(1000):
+            await dp.feed_update(bot, update)
+        assert handled == ["✅ Да, отправить"]
+        assert throttling.dropped['duplicate'] == 999
+        assert storage.reads == 1
+
+    asyncio.run(scenario())
+
+
+def test_burst_does_not_reach_database(app, monkeypatch, stub_session):
+    """Тот же поток через настоящий диспетчер бота: запросов к SQLite - только на пропущенные"""
+    session = stub_session
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    queries = []
+
+    def count(*args):
+        queries.append(1)
+
+    async def scenario():
+        monkeypatch.setattr(app.dp.fsm, "storage", MemoryStorage())
+        event.listen(async_engine.sync_engine, "after_cursor_execute", count)
+        try:
+            for _ in range(1000):
+                await app.dp.feed_update(bot, text_update("📊 Мои отправки", user_id=USER_ID + 2))
+        finally:
+            event.remove(async_engine.sync_engine, "after_cursor_execute", count)
+        answered = [r for r in session.requests if isinstance(r, SendMessage) and "⏳" not in r.text]
+        # Запас по умолчанию - 3 нажатия (+1, если тест шел дольше 5 секунд)
+        assert 3 <= len(answered) <= 4
+        assert len(queries) <= len(answered) * 2
+
+    asyncio.run(scenario())
+
+
+def test_rejected_update_keeps_class_token():
+    """Апдейт, отклоненный общим лимитом, не списывает токен из ведра класса"""
+    throttling = ThrottlingMiddleware({'update': (1, 1), 'message': (1, 5)})
+    now = 1000.0
+    assert throttling._take(USER_ID, 'message', now)
+    for _ in range(10):
+        assert not throttling._take(USER_ID, 'message', now)
+    assert throttling._buckets[(USER_ID, 'message')].tokens == 4
+    assert throttling._buckets[(USER_ID, 'update')].tokens == 0
@@ -0,0 +1,106 @@
+# test_validation.py - проверка лимитов медиа до скачивания и пересылки
+import asyncio
+import itertools
+import os
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import SendMessage, SendPhoto, SendVideo
+from aiogram.types import Chat, Message, PhotoSize, Update, User, Video
+
+from config import Config
+from states import ContentSubmission
+from utils import check_media_limits
+
+USER_ID = 555000222
+MB = 1024 * 1024
+_ids = itertools.count(1000)
+
+
+def photo_update(file_size):
+    update_id = next(_ids)
+    sizes = [
+        PhotoSize(file_id="small", file_unique_id="small", width=90, height=60, file_size=2000),
+        PhotoSize(file_id=f"big{update_id}", file_unique_id=f"big{update_id}", width=2560, height=1706,
+                  file_size=file_size),
+    ]
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(id=USER_ID, type="private"),
+        from_user=User(id=USER_ID, is_bot=False, first_name="Иван"), photo=sizes,
+    ))
+
+
+def video_update(file_size, duration):
+    update_id = next(_ids)
+    video = Video(file_id=f"v{update_id}", file_unique_id=f"v{update_id}", width=1280, height=720,
+                  duration=duration, file_size=file_size)
+    return Update(update_id=update_id, message=Message(
+        message_id=update_id, date=datetime.now(), chat=Chat(id=USER_ID, type="private"),
+        from_user=User(id=USER_ID, is_bot=False, first_name="Иван"), video=video,
+    ))
+
+
+def run_media_step(app, monkeypatch, session, content_type, update):
+    """Прогоняет один апдейт в состоянии waiting_for_media, возвращает (вызовы API, состояние, данные)"""
+    session.requests.clear()
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    dp = app.dp
+    key = StorageKey(bot_id=bot.id, chat_id=USER_ID, user_id=USER_ID)
+    # После теста monkeypatch вернет диспетчеру его хранилище
+    monkeypatch.setattr(dp.fsm, "storage", MemoryStorage())
+
+    async def scenario():
+        await dp.fsm.storage.set_state(key, ContentSubmission.waiting_for_media)
+        await dp.fsm.storage.set_data(key, {"content_type": content_type, "user_info": "Флот 3", "caption": "Тест"})
+        await dp.feed_update(bot, update)
+        return (
+            list(session.requests),
+            await dp.fsm.storage.get_state(key),
+            await dp.fsm.storage.get_data(key),
+        )
+
+    return asyncio.run(scenario())
+
+
+def test_check_media_limits():
+    assert check_media_limits("photo", Config.MAX_PHOTO_SIZE) is None
+    assert "слишком большой" in check_media_limits("photo", Config.MAX_PHOTO_SIZE + 1)
+    assert check_media_limits("video", 5 * MB, Config.MAX_VIDEO_DURATION) is None
+    assert "слишком длинное" in check_media_limits("video", 5 * MB, Config.MAX_VIDEO_DURATION + 1)
+    # Telegram не всегда присылает размер - решает загрузчик
+    assert check_media_limits("photo", None) is None
+    assert check_media_limits("text", 10 ** 12) is None
+
+
+def test_oversized_photo_is_rejected_before_preview(app, monkeypatch, stub_session):
+    requests, state, data = run_media_step(app, monkeypatch, stub_session, "photo", photo_update(Config.MAX_PHOTO_SIZE + 1))
+
+    # Ни пересылки превью, ни file_id для загрузчика - только сообщение об ошибке
+    assert [type(r) for r in requests] == [SendMessage]
+    assert "слишком большой" in requests[0].text
+    assert state == ContentSubmission.waiting_for_media.state
+    assert "file_id" not in data
+
+
+def test_photo_within_limit_gets_preview(app, monkeypatch, stub_session):
+    requests, state, data = run_media_step(app, monkeypatch, stub_session, "photo", photo_update(3 * MB))
+
+    assert [type(r) for r in requests] == [SendPhoto]
+    assert state == ContentSubmission.waiting_for_confirmation.state
+    assert data["file_id"].startswith("big")
+
+
+def test_video_limits_size_and_duration(app, monkeypatch, stub_session):
+    requests, state, _ = run_media_step(app, monkeypatch, stub_session, "video", video_update(Config.MAX_VIDEO_SIZE + MB, 30))
+    assert [type(r) for r in requests] == [SendMessage]
+    assert state == ContentSubmission.waiting_for_media.state
+
+    requests, state, _ = run_media_step(app, monkeypatch, stub_session, "video", video_update(5 * MB, Config.MAX_VIDEO_DURATION + 1))
+    assert [type(r) for r in requests] == [SendMessage]
+    assert "слишком длинное" in requests[0].text
+
+    requests, state, _ = run_media_step(app, monkeypatch, stub_session, "video", video_update(5 * MB, 30))
+    assert [type(r) for r in requests] == [SendVideo]
+    assert state == ContentSubmission.waiting_for_confirmation.state
@@ -0,0 +1,78 @@
+# test_webhook.py - режим webhook: секретный токен и переход на polling
+import asyncio
+import os
+import re
+from datetime import datetime
+
+from aiogram import Bot
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import SendMessage
+from aiogram.types import Chat, Message, Update, User
+from aiohttp import test_utils
+
+from config import Config
+from webhook import create_webhook_app, run_webhook, webhook_secret
+
+USER_ID = 555000444
+SECRET = "test-secret"
+
+
+def start_update():
+    return Update(update_id=920001, message=Message(
+        message_id=920001, date=datetime.now(), chat=Chat(id=USER_ID, type="private"),
+        from_user=User(id=USER_ID, is_bot=False, first_name="Иван"), text="/start",
+    ))
+
+
+def test_webhook_checks_secret_and_handles_update(app, monkeypatch, stub_session):
+    session = stub_session
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+    dp = app.dp
+    payload = start_update().model_dump_json(exclude_none=True)
+
+    async def scenario():
+        monkeypatch.setattr(dp.fsm, "storage", MemoryStorage())
+        # Без setup_application: запуск outbox и загрузчика здесь не нужен
+        app = create_webhook_app(dp, bot, "/webhook", SECRET, handle_in_background=False)
+        app.on_startup.clear()
+        app.on_shutdown.clear()
+        async with test_utils.TestClient(test_utils.TestServer(app)) as client:
+            headers = {"Content-Type": "application/json"}
+            response = await client.post("/webhook", data=payload, headers=headers)
+            assert response.status == 401
+
+            response = await client.post("/webhook", data=payload, headers={
+                **headers, "X-Telegram-Bot-Api-Secret-Token": SECRET
+            })
+            assert response.status == 200
+
+            response = await client.get("/healthz")
+            assert response.status == 200
+
+    asyncio.run(scenario())
+    assert [type(r) for r in session.requests] == [SendMessage]
+    assert session.requests[0].chat_id == USER_ID
+
+
+def test_run_webhook_falls_back_without_url(app, monkeypatch, stub_session):
+    monkeypatch.setattr(Config, "WEBHOOK_URL", "")
+    session = stub_session
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=session)
+
+    assert asyncio.run(run_webhook(app.dp, bot)) is False
+    # setWebhook даже не вызывался
+    assert session.requests == []
+
+
+def test_secret_is_shared_by_all_processes(monkeypatch):
+    monkeypatch.setattr(Config, "WEBHOOK_SECRET", "")
+    token = os.environ["BOT_TOKEN"]
+    # Без WEBHOOK_SECRET секрет выводится из токена: одинаков в каждом воркере и после рестарта
+    assert webhook_secret(token) == webhook_secret(token)
+    assert webhook_secret(token) != webhook_secret("987654321:BBBB")
+    # Допустимые для secret_token символы и длина (1-256)
+    assert re.fullmatch(r"[A-Za-z0-9_-]{1,256}", webhook_secret(token))
+    assert token not in webhook_secret(token)
+
+    monkeypatch.setattr(Config, "WEBHOOK_SECRET", SECRET)
+    assert webhook_secret(token) == SECRET
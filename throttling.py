@@ -0,0 +1,168 @@
+import logging
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+# Защита от флуда: один пользователь или зависший клиент, повторяющий апдейты,
+# не должен засыпать бота запросами к базе и дублями отправок.
+#
+# ThrottlingMiddleware стоит в outer-middleware апдейтов раньше FSMContextMiddleware
+# (тот читает состояние из SQLite), поэтому отклоненный апдейт не доходит ни до
+# хранилища, ни до хендлеров: все проверки - словари в памяти.
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше burst накопленных"""
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready(self, now: float) -> bool:
+        """Есть ли токен - без списания"""
+        self._refill(now)
+        return self.tokens >= 1
+
+    def take(self, now: float) -> bool:
+        if self.ready(now):
+            self.tokens -= 1
+            return True
+        return False
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst
+
+def classify(update: Update, menu_classes: Dict[str, str]) -> Tuple[Optional[int], str]:
+    """ID пользователя и класс хендлера апдейта - без FSM и базы.
+
+    Классы: callback (инлайн-кнопки), command (/команды), кнопки меню из
+    menu_classes (например "📊 Мои отправки" -> my_submissions) и message -
+    все остальное, то есть шаги ContentSubmission (текст, фото, видео).
+    """
+    if update.callback_query:
+        return update.callback_query.from_user.id, 'callback'
+    message = update.message
+    if message is None or message.from_user is None:
+        return None, 'other'
+    text = message.text
+    if text:
+        if text.startswith('/'):
+            return message.from_user.id, 'command'
+        menu_class = menu_classes.get(text)
+        if menu_class:
+            return message.from_user.id, menu_class
+    return message.from_user.id, 'message'
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Outer-middleware апдейтов: дубли update_id и лимиты частоты на пользователя.
+
+    limits - {класс: (токенов в секунду, запас)}; ключ 'update' - общий лимит на
+    все апдейты пользователя. Апдейт проходит, только если есть токен и в общем
+    ведре, и в ведре его класса. exempt(user_id) - True для тех, кого не
+    ограничиваем (админы).
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[float, int]], menu_classes: Dict[str, str] = None,
+                 exempt: Callable[[int], bool] = lambda user_id: False, notice_interval: float = 10,
+                 seen_updates: int = 10000, sweep_every: int = 10000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.limits = limits
+        self.menu_classes = menu_classes or {}
+        self.exempt = exempt
+        self.notice_interval = notice_interval
+        self.seen_updates = seen_updates
+        self.sweep_every = sweep_every
+        self.clock = clock
+        self._buckets: Dict[Tuple[int, str], TokenBucket] = {}
+        self._seen: 'OrderedDict[int, None]' = OrderedDict()
+        self._noticed: Dict[int, float] = {}
+        self._calls = 0
+        self.dropped = Counter()  # причина -> число отброшенных апдейтов
+
+    def _duplicate(self, update_id: int) -> bool:
+        if update_id in self._seen:
+            return True
+        self._seen[update_id] = None
+        if len(self._seen) > self.seen_updates:
+            self._seen.popitem(last=False)
+        return False
+
+    def _take(self, user_id: int, handler_class: str, now: float) -> bool:
+        # Токен списывается, только если он есть в обоих ведрах: апдейт, отклоненный
+        # одним лимитом, не тратит запас другого (флуд одной кнопкой не съедает общий
+        # запас, а упор в общий лимит - запас класса)
+        buckets = []
+        for key in (handler_class, 'update'):
+            limit = self.limits.get(key)
+            if limit is None:
+                continue
+            bucket = self._buckets.get((user_id, key))
+            if bucket is None:
+                bucket = self._buckets[(user_id, key)] = TokenBucket(limit[0], limit[1], now)
+            if not bucket.ready(now):
+                return False
+            buckets.append(bucket)
+        for bucket in buckets:
+            bucket.take(now)
+        return True
+
+    def _sweep(self, now: float) -> None:
+        """Удаляет полные ведра: новое ведро создается полным, так что они ничего не хранят"""
+        for key in [key for key, bucket in self._buckets.items() if bucket.full(now)]:
+            del self._buckets[key]
+        for user_id in [u for u, at in self._noticed.items() if now - at >= self.notice_interval]:
+            del self._noticed[user_id]
+
+    async def _notice(self, bot: Bot, update: Update, user_id: int, now: float) -> None:
+        """Одно предупреждение за notice_interval, остальные отклоненные апдейты - молча"""
+        if now - self._noticed.get(user_id, float('-inf')) < self.notice_interval:
+            return
+        self._noticed[user_id] = now
+        try:
+            if update.callback_query:
+                await bot.answer_callback_query(update.callback_query.id, "⏳ Слишком часто, подождите немного.")
+            else:
+                await bot.send_message(user_id, "⏳ Слишком много сообщений подряд. Подождите несколько секунд.")
+        except Exception as e:
+            logger.warning(f"Не удалось предупредить {user_id} о лимите: {e}")
+
+    async def __call__(self, handler: Callable[..., Awaitable[Any]], event: Update, data: Dict[str, Any]) -> Any:
+        if self._duplicate(event.update_id):
+            self.dropped['duplicate'] += 1
+            return None
+
+        user_id, handler_class = classify(event, self.menu_classes)
+        if user_id is None or self.exempt(user_id):
+            return await handler(event, data)
+
+        now = self.clock()
+        self._calls += 1
+        if self._calls % self.sweep_every == 0:
+            self._sweep(now)
+
+        if not self._take(user_id, handler_class, now):
+            self.dropped[handler_class] += 1
+            await self._notice(data['bot'], event, user_id, now)
+            return None
+        return await handler(event, data)
+
+def setup_throttling(dp: Dispatcher, middleware: ThrottlingMiddleware) -> None:
+    """Ставит middleware перед FSMContextMiddleware, чтобы отклоненные апдейты не читали состояние"""
+    fsm_registered = dp.fsm in dp.update.outer_middleware
+    if fsm_registered:
+        dp.update.outer_middleware.unregister(dp.fsm)
+    dp.update.outer_middleware(middleware)
+    if fsm_registered:
+        dp.update.outer_middleware(dp.fsm)
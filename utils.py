@@ -1,4 +1,127 @@
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
 from config import Config
+from authors import normalize_base
+from repository import STATUSES, Selection
+
+def format_size(size: int) -> str:
+    """Размер файла в мегабайтах для сообщений пользователю"""
+    megabytes = size / 1024 / 1024
+    return f"{megabytes:.0f} МБ" if megabytes == int(megabytes) else f"{megabytes:.1f} МБ"
+
+def format_duration(seconds: int) -> str:
+    minutes, seconds = divmod(seconds, 60)
+    return f"{minutes}:{seconds:02d}"
+
+def check_media_limits(content_type: str, file_size: Optional[int],
+                       duration: Optional[int] = None) -> Optional[str]:
+    """Проверяет медиа по метаданным из Telegram. Возвращает текст ошибки или None"""
+    limits = Config.MEDIA_LIMITS.get(content_type)
+    if not limits:
+        return None
+    
+    max_size = limits.get('max_size')
+    if max_size and file_size is not None and file_size > max_size:
+        return (
+            f"❌ Файл слишком большой: {format_size(file_size)}.\n"
+            f"Максимальный размер: {format_size(max_size)}."
+        )
+    
+    max_duration = limits.get('max_duration')
+    if max_duration and duration is not None and duration > max_duration:
+        return (
+            f"❌ Видео слишком длинное: {format_duration(duration)}.\n"
+            f"Максимальная длительность: {format_duration(max_duration)}."
+        )
+    return None
+
+_CONTENT_TYPES = {'photo': 'photo', 'фото': 'photo', 'video': 'video', 'видео': 'video',
+                  'text': 'text', 'текст': 'text'}
+
+def parse_id_ranges(text: str) -> Tuple[Tuple[int, int], ...]:
+    """'10-57,63' -> ((10, 57), (63, 63)). ValueError при неверном формате"""
+    ranges = []
+    for part in text.split(','):
+        low, _, high = part.partition('-')
+        low, high = int(low), int(high or low)
+        if low <= 0 or high < low:
+            raise ValueError(part)
+        ranges.append((low, high))
+    return tuple(ranges)
+
+def _parse_date(value: str) -> datetime:
+    for fmt in ('%Y-%m-%d', '%d.%m.%Y'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise ValueError(f"Неверная дата: {value}. Формат: 2025-06-01 или 01.06.2025")
+
+def parse_moderation_args(args: List[str], allow_empty: bool = False) -> Tuple[Selection, str]:
+    """Разбирает аргументы /approve, /reject и /export: ID или диапазоны, фильтры, затем комментарий.
+
+    /approve 10-57,63 Отлично
+    /approve type=text date=2025-06-01 Спасибо
+    Фильтры: type=photo|video|text, date=, from=, to= (даты включительно), user=<telegram_id>,
+    status=pending|approved|rejected, base=<БПО>
+    allow_empty - без ID и фильтров вернуть пустую выборку, а не ошибку.
+    ValueError содержит текст ошибки для пользователя.
+    """
+    ranges = ()
+    filters = {}
+    rest = list(args)
+    if rest and rest[0][0].isdigit():
+        try:
+            ranges = parse_id_ranges(rest.pop(0))
+        except ValueError:
+            raise ValueError("ID должен быть числом или списком диапазонов, например 10-57,63")
+
+    while rest and '=' in rest[0]:
+        key, _, value = rest.pop(0).partition('=')
+        key = key.lower()
+        if key == 'type':
+            if value.lower() not in _CONTENT_TYPES:
+                raise ValueError("Тип: photo, video или text")
+            filters['content_type'] = _CONTENT_TYPES[value.lower()]
+        elif key == 'date':
+            day = _parse_date(value)
+            filters['date_from'], filters['date_to'] = day, day + timedelta(days=1)
+        elif key == 'from':
+            filters['date_from'] = _parse_date(value)
+        elif key == 'to':
+            filters['date_to'] = _parse_date(value) + timedelta(days=1)
+        elif key == 'user':
+            try:
+                filters['telegram_id'] = int(value)
+            except ValueError:
+                raise ValueError("user= должен быть Telegram ID")
+        elif key == 'status':
+            if value.lower() not in STATUSES:
+                raise ValueError("Статус: pending, approved или rejected")
+            filters['status'] = value.lower()
+        elif key == 'base':
+            if not value:
+                raise ValueError("Укажите БПО: base=Ноябрьск")
+            # Несколько слов - через подчеркивание: base=Новый_Уренгой
+            filters['base'] = normalize_base(value.replace('_', ' '))
+        else:
+            raise ValueError(f"Неизвестный фильтр: {key}. Доступны: type, date, from, to, user, status, base")
+
+    selection = Selection(ranges=ranges, **filters)
+    if selection.is_empty() and not allow_empty:
+        raise ValueError("Укажите ID, диапазон ID или фильтр")
+    return selection, ' '.join(rest)
 
-async def is_admin(user_id: int) -> bool:
-    return user_id in Config.ADMIN_IDS
\ No newline at end of file
+def format_id_ranges(ids: List[int], limit: int = 50) -> str:
+    """[10, 11, 12, 63] -> '#10–#12, #63' (не больше limit групп)"""
+    groups = []
+    for submission_id in sorted(ids):
+        if groups and submission_id == groups[-1][1] + 1:
+            groups[-1][1] = submission_id
+        else:
+            groups.append([submission_id, submission_id])
+    text = ', '.join(f"#{low}" if low == high else f"#{low}–#{high}" for low, high in groups[:limit])
+    if len(groups) > limit:
+        text += f" и еще {len(groups) - limit}"
+    return text
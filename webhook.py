@@ -0,0 +1,97 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import signal
+from contextlib import suppress
+from typing import List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Режим webhook: Telegram сам присылает апдейты POST-запросами на наш
+# aiohttp-сервер, поэтому нет долгого getUpdates, а несколько процессов можно
+# поставить за балансировщик (FSM_STORAGE общий для всех, см. storage.py).
+# Запросы без правильного X-Telegram-Bot-Api-Secret-Token получают 401.
+
+def webhook_secret(token: str) -> str:
+    """Секрет для X-Telegram-Bot-Api-Secret-Token: WEBHOOK_SECRET или производный от токена.
+
+    Производный секрет одинаков во всех процессах и после перезапуска: каждый
+    setWebhook заменяет секрет у Telegram, и случайный секрет на процесс
+    оставлял бы с 401 все воркеры, кроме последнего запущенного.
+    """
+    if Config.WEBHOOK_SECRET:
+        return Config.WEBHOOK_SECRET
+    return hmac.new(token.encode(), b"inside-bot-webhook", hashlib.sha256).hexdigest()
+
+async def healthz(request: web.Request) -> web.Response:
+    """Проверка живости для балансировщика"""
+    return web.Response(text="ok")
+
+def create_webhook_app(dp: Dispatcher, bot: Bot, path: str, secret_token: str,
+                       handle_in_background: bool = True) -> web.Application:
+    """aiohttp-приложение с обработчиком webhook и запуском/остановкой диспетчера.
+
+    handle_in_background=True - сразу отвечаем 200, а апдейт обрабатываем в фоне,
+    чтобы Telegram не ждал медленные хендлеры и не слал повторы.
+    """
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=secret_token,
+        handle_in_background=handle_in_background,
+    ).register(app, path=path)
+    app.router.add_get("/healthz", healthz)
+    # dp.startup/dp.shutdown (outbox, загрузчик медиа) привязываются к жизненному циклу приложения
+    setup_application(app, dp, bot=bot)
+    return app
+
+async def run_webhook(dp: Dispatcher, bot: Bot, allowed_updates: Optional[List[str]] = None) -> bool:
+    """Запускает бота в режиме webhook до SIGINT/SIGTERM.
+
+    Возвращает False, если webhook не удалось зарегистрировать - тогда
+    вызывающий код может перейти на polling.
+    """
+    if not Config.WEBHOOK_URL:
+        logger.error("RUN_MODE=webhook, но WEBHOOK_URL не задан")
+        return False
+
+    secret_token = webhook_secret(bot.token)
+    url = Config.WEBHOOK_URL.rstrip('/') + Config.WEBHOOK_PATH
+    try:
+        await bot.set_webhook(
+            url,
+            secret_token=secret_token,
+            allowed_updates=allowed_updates,
+            max_connections=Config.WEBHOOK_MAX_CONNECTIONS,
+        )
+    except Exception as e:
+        logger.error(f"Не удалось зарегистрировать webhook {url}: {e}")
+        return False
+
+    app = create_webhook_app(dp, bot, Config.WEBHOOK_PATH, secret_token)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, Config.WEBAPP_HOST, Config.WEBAPP_PORT)
+    await site.start()
+    logger.info(f"Webhook {url} слушает {Config.WEBAPP_HOST}:{Config.WEBAPP_PORT}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    with suppress(NotImplementedError):  # на Windows сигналы не поддерживаются
+        loop.add_signal_handler(signal.SIGTERM, stop.set)
+        loop.add_signal_handler(signal.SIGINT, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        # cleanup дожидается запросов в обработке и вызывает dp.shutdown
+        await runner.cleanup()
+        await bot.session.close()
+    return True